@@ -1,35 +1,66 @@
-from dotenv import load_dotenv
-load_dotenv()
-
-import sys
-sys.path.insert(0, "/Users/george.li/as-slack-bot")
-import intent
-print("DEBUG app.py importing intent from:", intent.__file__)
-
-import ssl
-import certifi
-ssl._create_default_https_context = lambda *args, **kwargs: ssl.create_default_context(cafile=certifi.where())
+import config
 
 import json
 import os
 import re
 from slack_bolt import App
+from slack_sdk import WebClient
 from slack_bolt.adapter.flask import SlackRequestHandler
-from flask import Flask, request
+from flask import Flask, Response, request
 
 import assetsonar as AS
+import deadline as DL
+import dedupe as DD
+import export as EX
+import fields as FL
 import formatting as FX
-from slack_upload import upload_csv_to_slack
-
-# Load env
-load_dotenv()
+import intent
+import log
+import metrics as M
+import prewarm
+import profiling as PF
+import query_plan as QP
+import snapshots as SN
+import usermap as UM
+import webhooks as WH
+from progress import slack_progress
+from slack_upload import SLACK_API_URL, upload_csv_to_slack
 
 app = App(
-    token=os.getenv("SLACK_BOT_TOKEN"),
-    signing_secret=os.getenv("SLACK_SIGNING_SECRET"),
+    client=WebClient(token=config.SLACK_BOT_TOKEN, base_url=SLACK_API_URL, ssl=config.ssl_context()),
+    signing_secret=config.SLACK_SIGNING_SECRET,
 )
 handler = SlackRequestHandler(app)
 flask_app = Flask(__name__)
+slog = log.get_logger("app")
+prewarm.start()
+
+
+def _post_csv(client, csv_path, channel_id, thread_ts, title="Results CSV"):
+    permalink = upload_csv_to_slack(csv_path, channel_id, title=title, thread_ts=thread_ts)
+    if permalink:
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"📎 [Download CSV here]({permalink})"
+        )
+
+
+def _post_profile(client, profile, channel_id, thread_ts):
+    """Summary + downloadable .pstats for `/asset profile`."""
+    try:
+        client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=profile.summary())
+        path = profile.dump()
+        try:
+            upload_csv_to_slack(path, channel_id, title="Profile stats (.pstats)", thread_ts=thread_ts)
+        finally:
+            os.remove(path)
+    except Exception as e:
+        slog.exception("profile_report_failed", error=str(e))
+
+
+def _noop_ack(*args, **kwargs):
+    return None
 
 
 @app.command("/asset")
@@ -40,12 +71,26 @@ def handle_asset_command(ack, body, client, logger):
     text = (body.get("text") or "").strip()
     channel_id = body.get("channel_id")
 
+    # Slack redelivery of a command we already took: attach, don't rerun
+    delivery = DD.delivery_key(body)
+    job, is_new = DD.REGISTRY.claim(delivery)
+    if not is_new:
+        M.SLACK_DUPLICATES.inc(layer="handler", state=job.state)
+        slog.info("duplicate_delivery", key=delivery, state=job.state, thread_ts=job.thread_ts)
+        return
+
     # anchor message for the thread
     searching_msg = client.chat_postMessage(
         channel=channel_id,
-        text=":mag: Searching, please wait..."
+        text=(f":hourglass_flowing_sand: Continuing in background: {text}" if body.get("background")
+              else ":mag: Searching, please wait...")
     )
     thread_ts = searching_msg["ts"]
+    job.channel_id, job.thread_ts = channel_id, thread_ts
+    profile = None
+    intent_data, fields = {}, None
+    # every stage below checks this budget; see deadline.py
+    deadline_token = DL.start(DL.budget_for(body))
 
     try:
         # --- Debug path (kept) ---
@@ -65,13 +110,7 @@ def handle_asset_command(ack, body, client, logger):
                     break
                 page += 1
 
-            rows = []
-            for a in all_assets:
-                name = (a.get("name") or "")
-                pd_raw = a.get("purchased_on")
-                pd = AS.parse_date(pd_raw)
-                if any(b in name.lower() for b in ["apple", "lenovo", "dell", "hp"]):
-                    rows.append([name, pd_raw or "-", str(pd or "-"), str(cutoff)])
+            rows = FX.debug_olddevices_rows(all_assets, cutoff)
 
             if not rows:
                 client.chat_postMessage(
@@ -81,7 +120,7 @@ def handle_asset_command(ack, body, client, logger):
                 )
             else:
                 csv_path = FX.write_csv(
-                    ["Asset Name", "Purchased On (raw)", "Parsed", "Cutoff"],
+                    FX.DEBUG_OLDDEVICES_HEADERS,
                     rows,
                     prefix="debug_olddevices"
                 )
@@ -94,19 +133,61 @@ def handle_asset_command(ack, body, client, logger):
                     )
             return
 
+        # --- Full inventory export: "export [csv|parquet]" ---
+        if text.lower().split()[:1] == ["export"]:
+            fmt = (text.split()[1:2] or ["csv"])[0]
+            summary = EX.export_inventory(channel_id, thread_ts, fmt=fmt)
+            client.chat_update(
+                channel=channel_id,
+                ts=thread_ts,
+                text="✅ Export completed. See files in thread"
+            )
+            client.chat_postMessage(
+                channel=channel_id,
+                thread_ts=thread_ts,
+                text=EX.summary_text(summary)
+            )
+            return
+
+        # --- Profiling: "profile <query>" runs the normal flow under cProfile ---
+        profile_query = PF.parse_command(text)
+        if profile_query is not None:
+            if not PF.allowed(body.get("user_id")):
+                client.chat_update(channel=channel_id, ts=thread_ts, text=":no_entry: Profiling is restricted to PROFILE_USERS.")
+                return
+            if not profile_query:
+                client.chat_update(channel=channel_id, ts=thread_ts, text="Usage: `/asset profile <query>`")
+                return
+            session = PF.ProfileSession(profile_query)
+            if not session.start():
+                client.chat_update(channel=channel_id, ts=thread_ts, text=":hourglass: Another profile is running, try again shortly.")
+                return
+            profile, text = session, profile_query
+
         # --- Normal intent flow ---
-        intent_data = intent.parse_intent(text)
+        # "mine" / "<@U123>" skip the parser: Slack user -> member via usermap
+        slack_user = UM.parse_command(text, body.get("user_id"))
+        period = SN.parse_command(text)
+        if slack_user is not None:
+            intent_data = {"intent": "slack_user_assets", "slack_user": slack_user}
+        elif period is not None:
+            intent_data = {"intent": "asset_changes", "period": period}
+        else:
+            intent_data = intent.parse_intent(text)
         itype = intent_data.get("intent")
-        fields = intent_data.get("fields")
+        fields = AS.resolve_fields(intent_data.get("fields"))
+        M.COMMANDS.inc(intent=itype or "unknown")
 
         blocks, csv_path = None, None
+        # full scans report "page x/y, n matches" on the anchor and post a first screen early
+        progress = slack_progress(client, channel_id, thread_ts, f"Results for your query: {text}", fields)
 
         if itype == "user_or_asset_lookup":
             q = (intent_data.get("query") or text or "").strip()
 
             # A) Email → server-side lookup
             if "@" in q:
-                data = AS.find_user_assets(q)
+                data = AS.find_user_assets(q, progress=progress, fields=fields)
                 assets = data.get("assets", [])
                 blocks, csv_path = FX.format_assets_list(
                     f"Results for your query: *{text}*",
@@ -119,7 +200,7 @@ def handle_asset_command(ack, body, client, logger):
                 is_ain = re.match(r"^[A-Za-z]{2}\d{3,}$", q)
                 is_serial = len(q) > 6 and q.isalnum()
                 if is_ain or is_serial:
-                    data = AS.find_user_assets(q)
+                    data = AS.find_user_assets(q, progress=progress, fields=fields)
                     assets = data.get("assets", [])
                     blocks, csv_path = FX.format_assets_list(
                         f"Results for your query: *{text}*",
@@ -128,7 +209,7 @@ def handle_asset_command(ack, body, client, logger):
                     )
                 else:
                     # C) Name → disambiguation (name + email only)
-                    res = AS.find_assets_by_person_name(q, include_custom_fields=False)
+                    res = AS.find_assets_by_person_name(q, include_custom_fields=FL.needs_custom_fields(fields))
 
                     if res.get("assets"):  # unique member found
                         m = res.get("member") or {}
@@ -143,24 +224,6 @@ def handle_asset_command(ack, body, client, logger):
                     else:
                         candidates = res.get("candidates") or []
                         if candidates:
-                            # build static_select with name — email only
-                            options = []
-                            for c in candidates:
-                                full_name = ("{} {}".format(c.get("first_name") or "", c.get("last_name") or "")).strip() or "(no name)"
-                                label = full_name + (f" — {c.get('email')}" if c.get("email") else "")
-                                # ✅ Pass channel_id & thread_ts into value to avoid reading Slack body later
-                                value = json.dumps({
-                                    "uid": c["id"],
-                                    "name": full_name,
-                                    "email": c.get("email"),
-                                    "channel_id": channel_id,
-                                    "thread_ts": thread_ts,
-                                })
-                                options.append({
-                                    "text": {"type": "plain_text", "text": label[:75]},
-                                    "value": value
-                                })
-
                             client.chat_update(
                                 channel=channel_id,
                                 ts=thread_ts,
@@ -170,23 +233,7 @@ def handle_asset_command(ack, body, client, logger):
                                 channel=channel_id,
                                 thread_ts=thread_ts,
                                 text=f"Found multiple matches for *{q}*. Please choose the correct person:",
-                                blocks=[
-                                    {
-                                        "type": "section",
-                                        "text": {"type": "mrkdwn", "text": f"Found multiple matches for *{q}*. Please choose the correct person (name + email only):"}
-                                    },
-                                    {
-                                        "type": "actions",
-                                        "elements": [
-                                            {
-                                                "type": "static_select",
-                                                "action_id": "pick_member_for_assets",
-                                                "placeholder": {"type": "plain_text", "text": "Choose a person"},
-                                                "options": options
-                                            }
-                                        ]
-                                    }
-                                ]
+                                blocks=FX.member_picker_blocks(q, candidates, channel_id, thread_ts)
                             )
                             return
                         else:
@@ -197,24 +244,53 @@ def handle_asset_command(ack, body, client, logger):
                                           "text": f'No people or assets found related to "{q}". Try an email, serial number, or AIN instead.'}}
                             ]
 
+        elif itype == "slack_user_assets":
+            who = intent_data["slack_user"]
+            email, member_id = UM.resolve(client, who, AS.get_member_by_email)
+            if member_id:
+                assets = AS.get_assets_possessions_of_user(int(member_id))
+                blocks, csv_path = FX.format_assets_list(
+                    f"Results for your query: *{text}* ({email})",
+                    assets,
+                    fields=fields
+                )
+            else:
+                reason = f"no AssetSonar member with {email}" if email else "no email on their Slack profile"
+                blocks = [
+                    {"type": "section",
+                     "text": {"type": "mrkdwn", "text": f"No assets found for <@{who}>: {reason}."}}
+                ]
+
+        elif itype == "asset_changes":
+            # "changes [period]": net changes between catalog snapshots, see snapshots.py
+            try:
+                since = SN.period_start(intent_data["period"])
+            except ValueError as e:
+                blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": f"{e}. Usage: `/asset changes <period>`"}}]
+            else:
+                if SN.STORE.last_ts() is None:
+                    blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": SN.NO_SNAPSHOTS}}]
+                else:
+                    blocks, csv_path = FX.format_changes(f"Results for your query: {text}", SN.STORE.changes_since(since))
+
         elif itype == "license_expiry":
             days = int(intent_data.get("days", 30))
-            items = AS.licenses_expiring_within(days)
+            items = AS.licenses_expiring_within(days, fields=fields)
             blocks, csv_path = FX.format_licenses_expiring(days, items)
             if blocks and len(blocks) > 0:
                 blocks[0]["text"]["text"] = f"Results for your query: *{text}* (licenses expiring in {days} days)"
 
         elif itype == "old_laptops":
             years = int(intent_data.get("years", 3))
-            items = AS.laptops_older_than(years)
+            items = AS.laptops_older_than(years, progress=progress, fields=fields)
             blocks, csv_path = FX.format_old_laptops(years, items, fields=fields)
             if blocks and len(blocks) > 0:
                 blocks[0]["text"]["text"] = f"Results for your query: *{text}* (laptops older than {years} years)"
 
         elif itype == "location_assets":
             loc = intent_data.get("location")
-            items = AS.find_assets_by_location(loc)
-            print(f"DEBUG location_assets: location={loc}, results={len(items)}")
+            items = AS.find_assets_by_location(loc, progress=progress, fields=fields)
+            slog.debug("location_assets", location=loc, results=len(items))
             blocks, csv_path = FX.format_assets_list(
                 f"Results for your query: *{text}* (location={loc})",
                 items,
@@ -223,16 +299,26 @@ def handle_asset_command(ack, body, client, logger):
 
         elif itype == "age_assets":
             yrs = int(intent_data.get("years", 3))
-            items = AS.devices_older_than(yrs)
-            print("DEBUG devices_older_than returned:", len(items))
+            items = AS.devices_older_than(yrs, progress=progress, fields=fields)
+            slog.debug("devices_older_than", years=yrs, results=len(items))
             for dev in items:
-                print("DEBUG match:", dev.get("name"), dev.get("purchased_on"))
+                slog.debug_sampled("age_match", 0.01, name=dev.get("name"), purchased_on=dev.get("purchased_on"))
             blocks, csv_path = FX.format_assets_list(
                 f"Results for your query: *{text}*",
                 items,
                 fields=fields
             )
 
+        elif itype in ("asset_query", "vendor_assets", "group_assets"):
+            # compound filters -> one fused pass (or index lookup)
+            plan = QP.plan_from_intent(intent_data)
+            items = AS.run_plan(plan, progress=progress, fields=fields)
+            blocks, csv_path = FX.format_assets_list(
+                f"Results for your query: *{text}* ({plan.describe()})",
+                items,
+                fields=fields
+            )
+
         else:
             blocks = [
                 {"type": "section",
@@ -240,18 +326,19 @@ def handle_asset_command(ack, body, client, logger):
             ]
 
         # finalize
-        client.chat_update(
-            channel=channel_id,
-            ts=thread_ts,
-            text="✅ Search completed. See results in thread"
-        )
+        with M.span("reply"):
+            client.chat_update(
+                channel=channel_id,
+                ts=thread_ts,
+                text="✅ Search completed. See results in thread"
+            )
 
-        client.chat_postMessage(
-            channel=channel_id,
-            thread_ts=thread_ts,
-            text="Search results",
-            blocks=blocks
-        )
+            client.chat_postMessage(
+                channel=channel_id,
+                thread_ts=thread_ts,
+                text="Search results",
+                blocks=blocks
+            )
 
         if csv_path:
             permalink = upload_csv_to_slack(csv_path, channel_id, title="Results CSV", thread_ts=thread_ts)
@@ -262,19 +349,80 @@ def handle_asset_command(ack, body, client, logger):
                     text=f"📎 [Download CSV here]({permalink})"
                 )
 
+    except DL.DeadlineExceeded as e:
+        # out of time: hand back what we have, offer to finish without the budget
+        M.COMMANDS.inc(intent="truncated")
+        slog.warning("deadline_exceeded", stage=e.stage, pages_done=e.pages_done,
+                     total_pages=e.total_pages, partial=len(e.partial or []))
+        blocks, csv_path = FX.format_partial(e, text, intent_data, fields, channel_id)
+        client.chat_update(
+            channel=channel_id,
+            ts=thread_ts,
+            text="⏳ Time budget reached. Partial results in thread"
+        )
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text="Partial results",
+            blocks=blocks
+        )
+        if csv_path:
+            _post_csv(client, csv_path, channel_id, thread_ts, title="Partial results CSV")
+
+    except QP.MissingSlot as e:
+        # e.g. "location_assets" parsed without a location: ask rather than list every asset
+        M.COMMANDS.inc(intent="incomplete")
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"❓ Sorry, I could not understand: {text} ({e})"
+        )
+
     except Exception as e:
         logger.exception(e)
+        M.COMMANDS.inc(intent="error")
         client.chat_postMessage(
             channel=channel_id,
             thread_ts=thread_ts,
             text=f":x: Query failed: {e}"
         )
+    finally:
+        DL.reset(deadline_token)
+        if profile is not None:
+            profile.stop()
+            _post_profile(client, profile, channel_id, thread_ts)
+        DD.REGISTRY.finish(delivery)
+
+
+@app.action("continue_in_background")
+def handle_continue_in_background(ack, body, client, logger):
+    """Rerun a truncated command with BACKGROUND_BUDGET; results go to a new thread."""
+    ack()
+    data = json.loads(body["actions"][0]["value"])
+    handle_asset_command(
+        ack=_noop_ack,
+        body={
+            "text": data.get("text") or "",
+            "channel_id": data.get("channel_id") or (body.get("channel") or {}).get("id"),
+            "user_id": (body.get("user") or {}).get("id"),
+            "trigger_id": body.get("trigger_id"),
+            "background": True,
+        },
+        client=client,
+        logger=logger,
+    )
 
 
 # === Disambiguation action (name + email only) ===
 @app.action("pick_member_for_assets")
 def handle_pick_member_for_assets(ack, body, client, logger):
     ack()
+    delivery = DD.delivery_key(body)
+    job, is_new = DD.REGISTRY.claim(delivery)
+    if not is_new:
+        M.SLACK_DUPLICATES.inc(layer="handler", state=job.state)
+        slog.info("duplicate_delivery", key=delivery, state=job.state)
+        return
     try:
         # 1) parse selection payload
         sel = body["actions"][0]["selected_option"]["value"]
@@ -331,6 +479,8 @@ def handle_pick_member_for_assets(ack, body, client, logger):
                 )
         except Exception:
             pass
+    finally:
+        DD.REGISTRY.finish(delivery)
 
 
 @flask_app.route("/slack/events", methods=["POST"])
@@ -338,17 +488,33 @@ def slack_events():
     data = request.get_json(silent=True)
     if data and data.get("type") == "url_verification":
         return {"challenge": data.get("challenge")}, 200
+    # a retry of something we already started: ack it here, before Bolt (and a new anchor)
+    if request.headers.get("X-Slack-Retry-Num") and DD.REGISTRY.seen(DD.key_from_raw(request.get_data(as_text=True))):
+        M.SLACK_DUPLICATES.inc(layer="route", state="acked")
+        return "", 200, {"X-Slack-No-Retry": "1"}
     return handler.handle(request)
 
+@flask_app.route("/assetsonar/webhook", methods=["POST"])
+def assetsonar_webhook():
+    try:
+        return WH.handle(request.headers, request.get_data()), 200
+    except WH.WebhookError as e:
+        M.WEBHOOK_EVENTS.inc(kind="unknown", action="unknown", outcome="rejected")
+        slog.warning("webhook_rejected", error=str(e), status=e.status)
+        return {"ok": False, "error": str(e)}, e.status
+
 # --- Health checks ---
 @flask_app.route("/healthz", methods=["GET"])
 def healthz():
     return "ok", 200
 
+@flask_app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(M.render(), content_type=M.CONTENT_TYPE)
+
 @flask_app.route("/", methods=["GET"])
 def root():
     return "running", 200
 
 if __name__ == "__main__":
-    port = int(os.getenv("PORT", 3000))
-    flask_app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+    flask_app.run(host="0.0.0.0", port=config.PORT)
\ No newline at end of file
@@ -0,0 +1,455 @@
+"""
+Async runtime: Bolt AsyncApp on aiohttp, with the async AssetSonar client,
+AsyncOpenAI and AsyncWebClient. One process serves many concurrent /asset
+commands with overlapping I/O. Select with BOT_RUNTIME=async (see server.py).
+"""
+import config
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+
+from aiohttp import web
+from slack_bolt.async_app import AsyncApp
+from slack_sdk.web.async_client import AsyncWebClient
+
+import assetsonar as AS
+import assetsonar_async as ASA
+import deadline as DL
+import dedupe as DD
+import export as EX
+import fields as FL
+import formatting as FX
+import intent
+import log
+import metrics as M
+import prewarm
+import profiling as PF
+import query_plan as QP
+import snapshots as SN
+import usermap as UM
+import webhooks as WH
+from progress import async_slack_progress
+from slack_upload import SLACK_API_URL, upload_csv_to_slack_async
+
+app = AsyncApp(
+    client=AsyncWebClient(token=config.SLACK_BOT_TOKEN, base_url=SLACK_API_URL, ssl=config.ssl_context()),
+    signing_secret=config.SLACK_SIGNING_SECRET,
+)
+slog = log.get_logger("app_async")
+
+
+async def _slack_user_assets(text, who, fields, client):
+    """'mine' / '<@U123>': Slack user -> email -> member (cached in usermap) -> possessions."""
+    email, member_id = await UM.resolve_async(client, who, ASA.get_member_by_email)
+    if member_id:
+        assets = await ASA.get_assets_possessions_of_user(int(member_id))
+        return FX.format_assets_list(f"Results for your query: *{text}* ({email})", assets, fields=fields)
+    reason = f"no AssetSonar member with {email}" if email else "no email on their Slack profile"
+    return [
+        {"type": "section",
+         "text": {"type": "mrkdwn", "text": f"No assets found for <@{who}>: {reason}."}}
+    ], None
+
+
+async def _asset_changes(text, period):
+    """'changes [period]': net changes between catalog snapshots (file I/O, so off the loop)."""
+    try:
+        since = SN.period_start(period)
+    except ValueError as e:
+        return [{"type": "section", "text": {"type": "mrkdwn", "text": f"{e}. Usage: `/asset changes <period>`"}}], None
+    if SN.STORE.last_ts() is None:
+        return [{"type": "section", "text": {"type": "mrkdwn", "text": SN.NO_SNAPSHOTS}}], None
+    report = await asyncio.to_thread(SN.STORE.changes_since, since)
+    return FX.format_changes(f"Results for your query: {text}", report)
+
+
+async def _lookup(text, q, fields, channel_id, thread_ts, client, progress=None):
+    """user_or_asset_lookup; returns blocks/csv, or (None, None) once the picker is posted."""
+    if "@" in q or AS._looks_like_ain(q) or AS._looks_like_serial(q):
+        data = await ASA.find_user_assets(q, progress=progress, fields=fields)
+        return FX.format_assets_list(f"Results for your query: *{text}*", data.get("assets", []), fields=fields)
+
+    res = await ASA.find_assets_by_person_name(q, include_custom_fields=FL.needs_custom_fields(fields))
+    if res.get("assets"):
+        m = res.get("member") or {}
+        full_name = ("{} {}".format(m.get("first_name") or "", m.get("last_name") or "")).strip()
+        return FX.format_assets_list(
+            f"Results for your query: *{text}* (member: {full_name} <{m.get('email') or ''}>)",
+            res["assets"],
+            fields=fields
+        )
+
+    candidates = res.get("candidates") or []
+    if candidates:
+        await client.chat_update(
+            channel=channel_id,
+            ts=thread_ts,
+            text="🔎 Multiple matches found. Please pick one below."
+        )
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"Found multiple matches for *{q}*. Please choose the correct person:",
+            blocks=FX.member_picker_blocks(q, candidates, channel_id, thread_ts)
+        )
+        return None, None
+
+    return [
+        {"type": "section",
+         "text": {"type": "mrkdwn",
+                  "text": f'No people or assets found related to "{q}". Try an email, serial number, or AIN instead.'}}
+    ], None
+
+
+async def _post_csv(client, csv_path, channel_id, thread_ts, title="Results CSV"):
+    permalink = await upload_csv_to_slack_async(csv_path, channel_id, title=title, thread_ts=thread_ts)
+    if permalink:
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"📎 [Download CSV here]({permalink})"
+        )
+
+
+async def _post_profile(client, profile, channel_id, thread_ts):
+    """Summary + downloadable .pstats for `/asset profile`."""
+    try:
+        await client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=profile.summary())
+        path = profile.dump()
+        try:
+            await upload_csv_to_slack_async(path, channel_id, title="Profile stats (.pstats)", thread_ts=thread_ts)
+        finally:
+            os.remove(path)
+    except Exception as e:
+        slog.exception("profile_report_failed", error=str(e))
+
+
+async def _noop_ack(*args, **kwargs):
+    return None
+
+
+@app.command("/asset")
+async def handle_asset_command(ack, body, client, logger):
+    await ack()
+
+    text = (body.get("text") or "").strip()
+    channel_id = body.get("channel_id")
+
+    # Slack redelivery of a command we already took: attach, don't rerun
+    delivery = DD.delivery_key(body)
+    # sqlite (SLACK_DEDUPE_PATH) stays off the event loop
+    job, is_new = await asyncio.to_thread(DD.REGISTRY.claim, delivery)
+    if not is_new:
+        M.SLACK_DUPLICATES.inc(layer="handler", state=job.state)
+        slog.info("duplicate_delivery", key=delivery, state=job.state, thread_ts=job.thread_ts)
+        return
+
+    searching_msg = await client.chat_postMessage(
+        channel=channel_id,
+        text=(f":hourglass_flowing_sand: Continuing in background: {text}" if body.get("background")
+              else ":mag: Searching, please wait...")
+    )
+    thread_ts = searching_msg["ts"]
+    job.channel_id, job.thread_ts = channel_id, thread_ts
+    profile = progress = None
+    intent_data, fields = {}, None
+    # every stage below checks this budget; see deadline.py
+    deadline_token = DL.start(DL.budget_for(body))
+
+    try:
+        if text.lower().startswith("debug olddevices"):
+            cutoff = datetime.utcnow().date() - timedelta(days=365 * 3)
+            rows = FX.debug_olddevices_rows(await ASA.all_assets(), cutoff)
+            if not rows:
+                await client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text="No candidate devices found.")
+            else:
+                csv_path = FX.write_csv(FX.DEBUG_OLDDEVICES_HEADERS, rows, prefix="debug_olddevices")
+                await _post_csv(client, csv_path, channel_id, thread_ts, title="Debug Old Devices")
+            return
+
+        if text.lower().split()[:1] == ["export"]:
+            # thread-pool based exporter; keep it off the event loop
+            fmt = (text.split()[1:2] or ["csv"])[0]
+            summary = await asyncio.to_thread(EX.export_inventory, channel_id, thread_ts, fmt)
+            await client.chat_update(channel=channel_id, ts=thread_ts, text="✅ Export completed. See files in thread")
+            await client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=EX.summary_text(summary))
+            return
+
+        # --- Profiling: "profile <query>" runs the normal flow under cProfile ---
+        profile_query = PF.parse_command(text)
+        if profile_query is not None:
+            if not PF.allowed(body.get("user_id")):
+                await client.chat_update(channel=channel_id, ts=thread_ts, text=":no_entry: Profiling is restricted to PROFILE_USERS.")
+                return
+            if not profile_query:
+                await client.chat_update(channel=channel_id, ts=thread_ts, text="Usage: `/asset profile <query>`")
+                return
+            session = PF.ProfileSession(profile_query)
+            if not session.start():
+                await client.chat_update(channel=channel_id, ts=thread_ts, text=":hourglass: Another profile is running, try again shortly.")
+                return
+            profile, text = session, profile_query
+
+        # "mine" / "<@U123>" skip the parser: Slack user -> member via usermap
+        slack_user = UM.parse_command(text, body.get("user_id"))
+        period = SN.parse_command(text)
+        if slack_user is not None:
+            intent_data = {"intent": "slack_user_assets", "slack_user": slack_user}
+        elif period is not None:
+            intent_data = {"intent": "asset_changes", "period": period}
+        else:
+            intent_data = await intent.parse_intent_async(text)
+        itype = intent_data.get("intent")
+        fields = await ASA.resolve_fields(intent_data.get("fields"))
+        M.COMMANDS.inc(intent=itype or "unknown")
+        progress = async_slack_progress(client, channel_id, thread_ts, f"Results for your query: {text}", fields)
+
+        if itype == "user_or_asset_lookup":
+            q = (intent_data.get("query") or text or "").strip()
+            blocks, csv_path = await _lookup(text, q, fields, channel_id, thread_ts, client, progress)
+            if blocks is None:
+                return
+
+        elif itype == "slack_user_assets":
+            blocks, csv_path = await _slack_user_assets(text, intent_data["slack_user"], fields, client)
+
+        elif itype == "asset_changes":
+            blocks, csv_path = await _asset_changes(text, intent_data["period"])
+
+        elif itype == "license_expiry":
+            days = int(intent_data.get("days", 30))
+            blocks, csv_path = FX.format_licenses_expiring(days, await ASA.licenses_expiring_within(days, fields=fields))
+            if blocks:
+                blocks[0]["text"]["text"] = f"Results for your query: *{text}* (licenses expiring in {days} days)"
+
+        elif itype == "old_laptops":
+            years = int(intent_data.get("years", 3))
+            blocks, csv_path = FX.format_old_laptops(years, await ASA.laptops_older_than(years, progress=progress, fields=fields), fields=fields)
+            if blocks:
+                blocks[0]["text"]["text"] = f"Results for your query: *{text}* (laptops older than {years} years)"
+
+        elif itype == "location_assets":
+            loc = intent_data.get("location")
+            blocks, csv_path = FX.format_assets_list(
+                f"Results for your query: *{text}* (location={loc})",
+                await ASA.find_assets_by_location(loc, progress=progress, fields=fields),
+                fields=fields
+            )
+
+        elif itype in ("age_assets", "asset_query", "vendor_assets", "group_assets"):
+            plan = QP.plan_from_intent(intent_data)
+            blocks, csv_path = FX.format_assets_list(
+                f"Results for your query: *{text}* ({plan.describe()})",
+                await ASA.run_plan(plan, progress=progress, fields=fields),
+                fields=fields
+            )
+
+        else:
+            blocks, csv_path = [
+                {"type": "section",
+                 "text": {"type": "mrkdwn", "text": f"❓ Sorry, I could not understand: {text}"}}
+            ], None
+
+        # a progress update still in flight would overwrite the final one
+        await progress.settle()
+        await client.chat_update(
+            channel=channel_id,
+            ts=thread_ts,
+            text="✅ Search completed. See results in thread"
+        )
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text="Search results",
+            blocks=blocks
+        )
+        if csv_path:
+            await _post_csv(client, csv_path, channel_id, thread_ts)
+
+    except DL.DeadlineExceeded as e:
+        # out of time: hand back what we have, offer to finish without the budget
+        M.COMMANDS.inc(intent="truncated")
+        slog.warning("deadline_exceeded", stage=e.stage, pages_done=e.pages_done,
+                     total_pages=e.total_pages, partial=len(e.partial or []))
+        blocks, csv_path = FX.format_partial(e, text, intent_data, fields, channel_id)
+        if progress is not None:
+            await progress.settle()
+        await client.chat_update(
+            channel=channel_id,
+            ts=thread_ts,
+            text="⏳ Time budget reached. Partial results in thread"
+        )
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text="Partial results",
+            blocks=blocks
+        )
+        if csv_path:
+            await _post_csv(client, csv_path, channel_id, thread_ts, title="Partial results CSV")
+
+    except QP.MissingSlot as e:
+        # e.g. "location_assets" parsed without a location: ask rather than list every asset
+        M.COMMANDS.inc(intent="incomplete")
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"❓ Sorry, I could not understand: {text} ({e})"
+        )
+
+    except Exception as e:
+        logger.exception(e)
+        M.COMMANDS.inc(intent="error")
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f":x: Query failed: {e}"
+        )
+    finally:
+        DL.reset(deadline_token)
+        if progress is not None:
+            await progress.settle()
+        if profile is not None:
+            profile.stop()
+            await _post_profile(client, profile, channel_id, thread_ts)
+        await asyncio.to_thread(DD.REGISTRY.finish, delivery)
+
+
+@app.action("continue_in_background")
+async def handle_continue_in_background(ack, body, client, logger):
+    """Rerun a truncated command with BACKGROUND_BUDGET; results go to a new thread."""
+    await ack()
+    data = json.loads(body["actions"][0]["value"])
+    await handle_asset_command(
+        ack=_noop_ack,
+        body={
+            "text": data.get("text") or "",
+            "channel_id": data.get("channel_id") or (body.get("channel") or {}).get("id"),
+            "user_id": (body.get("user") or {}).get("id"),
+            "trigger_id": body.get("trigger_id"),
+            "background": True,
+        },
+        client=client,
+        logger=logger,
+    )
+
+
+@app.action("pick_member_for_assets")
+async def handle_pick_member_for_assets(ack, body, client, logger):
+    await ack()
+    delivery = DD.delivery_key(body)
+    job, is_new = await asyncio.to_thread(DD.REGISTRY.claim, delivery)
+    if not is_new:
+        M.SLACK_DUPLICATES.inc(layer="handler", state=job.state)
+        slog.info("duplicate_delivery", key=delivery, state=job.state)
+        return
+    data = None
+    try:
+        data = json.loads(body["actions"][0]["selected_option"]["value"])
+        uid = int(data["uid"])
+        full_name = data.get("name") or ""
+        email = data.get("email") or ""
+        channel_id = data.get("channel_id")
+        thread_ts = data.get("thread_ts")
+
+        assets = await ASA.get_assets_possessions_of_user(uid, include_custom_fields=False, max_pages=10)
+        if not assets:
+            await client.chat_postMessage(
+                channel=channel_id,
+                thread_ts=thread_ts,
+                text=f"No assets found for {full_name} <{email}>."
+            )
+            return
+
+        blocks, csv_path = FX.format_assets_list(
+            f"Assets for *{full_name}* <{email}>",
+            assets,
+            fields=["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"]
+        )
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"Found {len(assets)} assets for *{full_name}* <{email}>",
+            blocks=blocks
+        )
+        if csv_path:
+            await _post_csv(client, csv_path, channel_id, thread_ts)
+
+    except Exception as e:
+        logger.exception("pick_member_for_assets failed")
+        if isinstance(data, dict) and data.get("channel_id"):
+            try:
+                await client.chat_postMessage(
+                    channel=data["channel_id"],
+                    thread_ts=data.get("thread_ts"),
+                    text=f"Sorry, something went wrong handling your selection: {e}"
+                )
+            except Exception:
+                pass
+    finally:
+        await asyncio.to_thread(DD.REGISTRY.finish, delivery)
+
+
+@web.middleware
+async def ack_known_retries(request, handler):
+    """Ack a Slack retry of a delivery already claimed before it reaches Bolt, as the sync route does."""
+    if request.path == "/slack/events" and request.method == "POST" and request.headers.get("X-Slack-Retry-Num"):
+        # the body is cached on the request, so Bolt can still read it
+        raw = await request.text()
+        if await asyncio.to_thread(DD.REGISTRY.seen, DD.key_from_raw(raw)):
+            M.SLACK_DUPLICATES.inc(layer="route", state="acked")
+            return web.Response(status=200, headers={"X-Slack-No-Retry": "1"})
+    return await handler(request)
+
+
+async def assetsonar_webhook(request):
+    body = await request.read()
+    try:
+        # asset upserts may fetch the record with the sync client; keep it off the loop
+        result = await asyncio.to_thread(WH.handle, request.headers, body)
+        return web.json_response(result)
+    except WH.WebhookError as e:
+        M.WEBHOOK_EVENTS.inc(kind="unknown", action="unknown", outcome="rejected")
+        slog.warning("webhook_rejected", error=str(e), status=e.status)
+        return web.json_response({"ok": False, "error": str(e)}, status=e.status)
+
+
+# --- Health checks ---
+async def healthz(_request):
+    return web.Response(text="ok")
+
+
+async def metrics(_request):
+    resp = web.Response(text=M.render())
+    resp.headers["Content-Type"] = M.CONTENT_TYPE
+    return resp
+
+
+async def root(_request):
+    return web.Response(text="running")
+
+
+async def _close_clients(_web_app):
+    await ASA.close()
+
+
+def create_web_app():
+    web_app = app.web_app(path="/slack/events")
+    web_app.middlewares.append(ack_known_retries)
+    web_app.router.add_get("/healthz", healthz)
+    web_app.router.add_get("/metrics", metrics)
+    web_app.router.add_post("/assetsonar/webhook", assetsonar_webhook)
+    web_app.router.add_get("/", root)
+    web_app.on_startup.append(prewarm.on_startup)
+    web_app.on_cleanup.append(_close_clients)
+    return web_app
+
+
+def main():
+    web.run_app(create_web_app(), host="0.0.0.0", port=config.PORT)
+
+
+if __name__ == "__main__":
+    main()
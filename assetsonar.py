@@ -1,18 +1,29 @@
-print("DEBUG assetsonar.py loaded from:", __file__)
-
-import os
+import contextvars
 import re
+import threading
 import time
 import requests
 from datetime import datetime, timedelta
 from dateutil import parser as dtparser
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
-AS_SECRET = os.getenv("AS_SECRET_KEY")
-AS_SUBDOMAIN = os.getenv("AS_SUBDOMAIN", "shopback")
-BASE_URL = f"https://{AS_SUBDOMAIN}.assetsonar.com"
+import catalog
+import config
+import deadline as DL
+import log
+import metrics as M
+import fields as FL
+import idcache as IDC
+import query_plan as QP
+from name_index import NameIndex
+
+AS_SECRET = config.AS_SECRET_KEY
+AS_SUBDOMAIN = config.AS_SUBDOMAIN
+# AS_BASE_URL overrides the tenant URL (e.g. fake_services.py for benchmarks)
+BASE_URL = config.AS_BASE_URL
 HEADERS = {"token": AS_SECRET or "65c020957ea3152a3267ec4b30240192"}
 
 PAGE_SIZE = 25
@@ -20,21 +31,65 @@ EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 
 # --- Session with retry/timeout ---
 _session = requests.Session()
-_session.mount("https://", HTTPAdapter(max_retries=Retry(
+_adapter = HTTPAdapter(max_retries=Retry(
     total=3, connect=3, read=3,
     backoff_factor=0.4,
-    status_forcelist=(429, 500, 502, 503, 504),
+    # 429 is handled in _get, where Retry-After sleeps are bounded by the command deadline
+    status_forcelist=(500, 502, 503, 504),
     allowed_methods=("GET", "POST", "PUT", "PATCH")
-)))
+))
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
 DEFAULT_TIMEOUT = (5, 20)
 
+slog = log.get_logger("assetsonar")
+_ID_SEGMENT_RE = re.compile(r"/\d+(?=[./]|$)")
+
+def _endpoint(path):
+    """Metric label for a path: assets/123.api -> assets/:id.api"""
+    return _ID_SEGMENT_RE.sub("/:id", path)
+
+MAX_429_RETRIES = 3
+
+def _timed_get(url, endpoint, params):
+    DL.check(endpoint, DL.MIN_REQUEST_SECONDS)
+    timeout = tuple(DL.clamp(t) for t in DEFAULT_TIMEOUT)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        r = _session.get(url, headers=HEADERS, params=params or {}, timeout=timeout)
+        status = str(r.status_code)
+        return r
+    except requests.Timeout:
+        if DL.expired():
+            status = "deadline"
+            raise DL.DeadlineExceeded(endpoint) from None
+        raise
+    finally:
+        M.AS_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        M.AS_REQUESTS.inc(endpoint=endpoint, status=status)
+
+def _rate_limit_wait(r, endpoint):
+    """Seconds to honour a 429 for; DeadlineExceeded if that outlives the budget."""
+    retry_after = int(r.headers.get("Retry-After", "60"))
+    M.AS_RATE_LIMITED.inc(endpoint=endpoint)
+    wait = min(retry_after, 120)
+    left = DL.remaining()
+    slog.warning("rate_limited", endpoint=endpoint, retry_after=retry_after,
+                 budget_left=None if left is None else round(left, 1))
+    if left is not None and wait >= left:
+        raise DL.DeadlineExceeded(endpoint)
+    return wait
+
 def _get(path, params=None):
     url = f"{BASE_URL}/{path}"
-    r = _session.get(url, headers=HEADERS, params=params or {}, timeout=DEFAULT_TIMEOUT)
-    if r.status_code == 429:
-        retry_after = int(r.headers.get("Retry-After", "60"))
-        time.sleep(min(retry_after, 120))
-        r = _session.get(url, headers=HEADERS, params=params or {}, timeout=DEFAULT_TIMEOUT)
+    endpoint = _endpoint(path)
+    r = _timed_get(url, endpoint, params)
+    for _ in range(MAX_429_RETRIES):
+        if r.status_code != 429:
+            break
+        time.sleep(_rate_limit_wait(r, endpoint))
+        r = _timed_get(url, endpoint, params)
     r.raise_for_status()
     return r.json()
 
@@ -46,24 +101,152 @@ def parse_date(value):
     except Exception:
         return None
 
-def quick_search(query: str):
+def _search_params(query: str, include_custom_fields=False):
+    params = {"search": query, "facet": "FixedAsset"}
+    if include_custom_fields:
+        params["include_custom_fields"] = "true"
+    return params
+
+def quick_search(query: str, include_custom_fields=False):
     """Fast search by AIN/Serial using search.api"""
     try:
-        data = _get("search.api", params={
-            "search": query,
-            "facet": "FixedAsset",
-            "include_custom_fields": "true"
-        })
+        data = _get("search.api", params=_search_params(query, include_custom_fields))
         return data.get("assets", [])
     except Exception as e:
-        print(f"Quick search error: {e}")
+        slog.warning("quick_search_failed", error=str(e))
         return []
 
+def get_asset(asset_id):
+    """Full asset record (with custom fields) by id, or None."""
+    data = _get(f"assets/{asset_id}.api", params={"include_custom_fields": "true"})
+    if isinstance(data, dict):
+        asset = data.get("asset") if isinstance(data.get("asset"), dict) else data
+        return asset if asset.get("id") is not None else None
+    return None
+
+HYDRATE_WORKERS = 4
+# one assets/<id>.api call per row: above this many rows, custom fields are left out
+HYDRATE_MAX_ROWS = 200
+
+_custom_field_names = None
+
+def _custom_field_names_of(data):
+    """Custom field names seen on an assets.api page fetched with include_custom_fields."""
+    names = set()
+    for a in (data or {}).get("assets") or []:
+        cf = a.get("custom_fields")
+        if isinstance(cf, dict):
+            names.update(str(k) for k in cf)
+        else:
+            names.update(str(item["name"]) for item in cf or [] if isinstance(item, dict) and item.get("name"))
+    return names
+
+def custom_field_names():
+    """The account's asset custom field names, fetched once from one assets.api page."""
+    global _custom_field_names
+    if _custom_field_names is None:
+        data = _get("assets.api", params={"page": 1, "limit": PAGE_SIZE, "include_custom_fields": "true"})
+        _custom_field_names = _custom_field_names_of(data)
+    return _custom_field_names
+
+def refresh_custom_field_names():
+    global _custom_field_names
+    _custom_field_names = None
+
+def _resolved(fields, names):
+    resolved = FL.resolve(fields, names)
+    if len(resolved) < len(fields):
+        slog.info("fields_dropped", requested=fields, resolved=resolved)
+    return resolved
+
+def resolve_fields(fields):
+    """
+    Intent fields with custom field names checked against the account (see
+    fields.resolve); the name list is only fetched when a field is not built-in.
+    """
+    if not FL.needs_custom_fields(fields):
+        return fields
+    try:
+        names = custom_field_names()
+    except DL.DeadlineExceeded:
+        raise
+    except Exception as e:
+        slog.warning("custom_field_names_failed", error=str(e))
+        names = ()
+    return _resolved(fields, names)
+
+def _with_custom_fields(asset):
+    # a copy: the row may be shared with the lookup cache or the catalog index
+    data = _get(f"assets/{asset['id']}.api", params={"include_custom_fields": "true"})
+    full = (data.get("asset") if isinstance(data.get("asset"), dict) else data) if isinstance(data, dict) else {}
+    return {**asset, "custom_fields": full.get("custom_fields") or []}
+
+def hydrate_custom_fields(assets, fields):
+    """
+    Lazily fetch custom fields for just these (matched) rows, and only when a
+    requested field needs them; rows that already carry custom_fields are skipped.
+    Returns a new list with hydrated copies; input rows are never modified.
+    More than HYDRATE_MAX_ROWS rows are returned without them, and a row whose
+    fetch fails is kept without them. The fetches run under the command
+    deadline; when it runs out the rows are attached as partial.
+    """
+    if not FL.needs_custom_fields(fields):
+        return assets
+    missing = [i for i, a in enumerate(assets) if not FL.has_custom_fields(a) and a.get("id")]
+    if len(missing) > HYDRATE_MAX_ROWS:
+        slog.warning("hydrate_skipped", rows=len(missing), max_rows=HYDRATE_MAX_ROWS)
+        return assets
+    out = list(assets)
+    if missing:
+        with ThreadPoolExecutor(max_workers=HYDRATE_WORKERS) as pool:
+            # pool threads see the deadline contextvar only through a copy
+            futures = {i: pool.submit(contextvars.copy_context().run, _with_custom_fields, assets[i]) for i in missing}
+        late = None
+        for i, f in futures.items():
+            try:
+                out[i] = f.result()
+            except DL.DeadlineExceeded as e:
+                late = late or e
+            except Exception as e:
+                slog.warning("hydrate_failed", asset_id=assets[i].get("id"), error=str(e))
+        if late is not None:
+            raise late.attach(out)
+    return out
+
 # -------- email -> assets (fast path) --------
 def get_member_by_email(email: str):
     """Fetch member record by email."""
     params = {"page": 1, "filter": "email", "filter_val": email}
     data = _get("members.api", params=params)
+    return _pick_member_by_email(data, email)
+
+def _extract_assets_payload(data):
+    """Normalize assets/filter.api payload shape into a list of asset dicts."""
+    # ✅ Normalize payload shape:
+    # - list -> use as-is
+    # - dict with "assets"/"rows"/"data" -> extract list
+    # - anything else -> empty list
+    if isinstance(data, list):
+        items = data
+    elif isinstance(data, dict):
+        items = data.get("assets") or data.get("rows") or data.get("data") or []
+    else:
+        items = []
+
+    # ✅ Keep only dict items to avoid `'str'.get` downstream
+    return [x for x in items if isinstance(x, dict)]
+
+def _possessions_params(user_id: int, page: int, include_custom_fields=False):
+    params = {
+        "status": "possessions_of",
+        "filter_param_val": str(user_id),
+        "page": page,
+    }
+    if include_custom_fields:
+        params["include_custom_fields"] = "true"
+    return params
+
+def _pick_member_by_email(data, email: str):
     members = []
     if isinstance(data, list):
         members = data
@@ -80,37 +263,19 @@ def get_assets_possessions_of_user(user_id: int, include_custom_fields=False, ma
     """Use assets/filter.api possessions_of to list user assets quickly."""
     results = []
     page = 1
-    while page <= max_pages:
-        params = {
-            "status": "possessions_of",
-            "filter_param_val": str(user_id),
-            "page": page,
-        }
-        if include_custom_fields:
-            params["include_custom_fields"] = "true"
-
-        data = _get("assets/filter.api", params=params)
-
-        # ✅ Normalize payload shape:
-        # - list -> use as-is
-        # - dict with "assets"/"rows"/"data" -> extract list
-        # - anything else -> empty list
-        if isinstance(data, list):
-            items = data
-        elif isinstance(data, dict):
-            items = data.get("assets") or data.get("rows") or data.get("data") or []
-        else:
-            items = []
-
-        # ✅ Keep only dict items to avoid `'str'.get` downstream
-        items = [x for x in items if isinstance(x, dict)]
-
-        results.extend(items)
+    try:
+        while page <= max_pages:
+            params = _possessions_params(user_id, page, include_custom_fields)
+            data = _get("assets/filter.api", params=params)
+            items = _extract_assets_payload(data)
+            results.extend(items)
 
-        # pagination heuristic: stop if this page has fewer than 25 items
-        if len(items) < 25:
-            break
-        page += 1
+            # pagination heuristic: stop if this page has fewer than 25 items
+            if len(items) < 25:
+                break
+            page += 1
+    except DL.DeadlineExceeded as e:
+        raise e.attach(results, page - 1)
 
     return results
 
@@ -126,51 +291,130 @@ def find_assets_by_assignee_email_fast(email: str, include_custom_fields=False,
         return []
     return get_assets_possessions_of_user(int(user_id), include_custom_fields, max_pages)
 
-def find_user_assets(query: str, limit=200):
+def _asset_pages(limit=200):
+    """Yield (page, total_pages, assets) from assets.api."""
+    page = 1
+    while True:
+        data = _get("assets.api", params={"page": page, "limit": limit})
+        assets = data.get("assets", [])
+        if not assets:
+            break
+        total_pages = data.get("total_pages", 1)
+        yield page, total_pages, assets
+        if page >= total_pages:
+            break
+        page += 1
+
+def iter_asset_pages(limit=200):
+    """Yield assets.api pages (lists of asset dicts) until total_pages."""
+    for _, _, assets in _asset_pages(limit):
+        yield assets
+
+def scan_assets(predicate, limit=200, progress=None):
+    """
+    One pass over assets.api keeping assets where predicate(a) is true.
+    progress(page, total_pages, matched) is called after every page.
+    """
+    results = []
+    pages_done, total = 0, None
+    try:
+        for page, total_pages, assets in _asset_pages(limit):
+            with M.span("scan_page"):
+                matched = [a for a in assets if predicate(a)]
+            M.AS_PAGES.inc()
+            results.extend(matched)
+            pages_done, total = page, total_pages
+            slog.debug_sampled("scan_page", 0.1, page=page, total_pages=total_pages, matched=len(matched))
+            if progress is not None:
+                progress(page, total_pages, matched)
+    except DL.DeadlineExceeded as e:
+        raise e.attach(results, pages_done, total)
+    return results
+
+def run_plan(plan, progress=None, fields=None):
+    """Evaluate a QueryPlan: from the catalog index if installed, else one assets.api pass."""
+    index = catalog.get_index()
+    if index is not None:
+        results = plan.execute_index(index)
+    else:
+        results = scan_assets(plan.match, progress=progress)
+    return hydrate_custom_fields(results, fields)
+
+def _looks_like_ain(query: str):
+    return re.match(r"^[A-Za-z]{2}\d{3,}$", query)
+
+def _looks_like_serial(query: str):
+    return len(query) > 6 and query.isalnum()
+
+def _asset_matches_query(a, query_lower: str):
+    fields = [
+        a.get("identifier"),
+        a.get("bios_serial_number"),
+        a.get("assigned_to_user_name"),
+        a.get("assigned_to_user_email"),
+    ]
+    return any(query_lower in str(f).lower() for f in fields if f)
+
+def _known_identifier(query: str):
+    """
+    Answer an AIN/serial query without the API when we can: from the lookup
+    cache, else from an exact hit in the catalog snapshot's identifier index.
+    None means search.api has to be asked: an index miss proves nothing for
+    partial serials, names that look like serials ("Jonathan") or assets
+    created since the snapshot.
+    """
+    cached = IDC.CACHE.get(query)
+    if cached is not None:
+        M.ID_LOOKUPS.inc(source="cache_hit" if cached else "cache_miss")
+        return cached
+    index = catalog.get_index()
+    if index is None:
+        return None
+    found = index.find_identifier(query)
+    if not found:
+        return None
+    M.ID_LOOKUPS.inc(source="catalog")
+    IDC.CACHE.put(query, found)
+    return found
+
+def find_user_assets(query: str, limit=200, progress=None, fields=None):
     """
     Search assets by user email, name, AIN, or serial.
     Email/name → server-side if possible; AIN/Serial → quick_search fallback.
     (If you need name disambiguation, call find_assets_by_person_name().)
     """
     query_lower = query.lower()
+    need_cf = FL.needs_custom_fields(fields)
     is_email = "@" in query
-    is_ain = re.match(r"^[A-Za-z]{2}\d{3,}$", query)
-    is_serial = len(query) > 6 and query.isalnum()
+    is_ain = _looks_like_ain(query)
+    is_serial = _looks_like_serial(query)
 
     # Fast path for email
     m = EMAIL_RE.search(query)
     if m:
         email = m.group(0)
-        fast_assets = find_assets_by_assignee_email_fast(email)
+        fast_assets = find_assets_by_assignee_email_fast(email, include_custom_fields=need_cf)
         if fast_assets:
-            return {"user": {"name": email}, "assets": fast_assets}
+            return {"user": {"name": email}, "assets": hydrate_custom_fields(fast_assets, fields)}
 
-    matched = []
     # Quick path for AIN/Serial
     if is_ain or is_serial:
-        quick = quick_search(query)
+        known = _known_identifier(query)
+        if known is not None:
+            return {"user": None, "assets": hydrate_custom_fields(known, fields)}
+        quick = quick_search(query, include_custom_fields=need_cf)
         if quick:
-            return {"user": None, "assets": quick}
+            M.ID_LOOKUPS.inc(source="search")
+            IDC.CACHE.put(query, quick)
+            return {"user": None, "assets": hydrate_custom_fields(quick, fields)}
 
     # Fallback full scan by fields
-    page = 1
-    while True:
-        data = _get("assets.api", params={"page": page, "limit": limit})
-        assets = data.get("assets", [])
-        if not assets:
-            break
-        for a in assets:
-            fields = [
-                a.get("identifier"),
-                a.get("bios_serial_number"),
-                a.get("assigned_to_user_name"),
-                a.get("assigned_to_user_email"),
-            ]
-            if any(query_lower in str(f).lower() for f in fields if f):
-                matched.append(a)
-        if page >= data.get("total_pages", 1):
-            break
-        page += 1
+    matched = scan_assets(lambda a: _asset_matches_query(a, query_lower), limit=limit, progress=progress)
+    if is_ain or is_serial:
+        # a complete scan is authoritative, including "not found"
+        M.ID_LOOKUPS.inc(source="scan")
+        IDC.CACHE.put(query, matched)
+    matched = hydrate_custom_fields(matched, fields)
 
     if matched and is_email:
         return {"user": {"name": query}, "assets": matched}
@@ -220,21 +464,67 @@ def _get_all_members_pages(max_pages: int = 20, only_active: bool = True):
         people = _fetch(False)
     return people
 
+_member_indexes = {}
+_member_index_lock = threading.Lock()
+
+def _get_member_index(max_pages: int = 20, only_active: bool = True):
+    """n-gram name index over the cached member directory (built once per refresh)."""
+    key = (max_pages, only_active)
+    with _member_index_lock:
+        if key not in _member_indexes:
+            _member_indexes[key] = NameIndex(_get_all_members_pages(max_pages=max_pages, only_active=only_active))
+        return _member_indexes[key]
+
+def refresh_member_directory():
+    """Drop the cached member directory and its name index; next search refetches."""
+    _get_all_members_pages.cache_clear()
+    with _member_index_lock:
+        _member_indexes.clear()
+
+_MEMBER_NAME_FIELDS = ("first_name", "last_name", "name", "display_name")
+
+def _apply_member_update(indexes, member_id, member):
+    """
+    Merge `member` (possibly only the changed fields) over the record in each
+    built name index; None (deleted) or inactive removes it from active-only
+    ones. False when an index lacks the member and the payload has no name.
+    """
+    applied = True
+    for (_, only_active), index in list(indexes.items()):
+        current = index.get(member_id) if member is not None else None
+        merged = {**current, **member} if current else member
+        if merged is None or (only_active and str(merged.get("status") or "active").lower() != "active"):
+            index.remove(member_id)
+        elif current or any(member.get(f) for f in _MEMBER_NAME_FIELDS):
+            index.upsert(merged)
+        else:
+            applied = False
+    return applied
+
+def update_member(member_id, member):
+    """Apply one member change to the name indexes without refetching the directory."""
+    return _apply_member_update(_member_indexes, member_id, member)
+
 def search_members_by_name(name: str, max_pages: int = 20, only_active: bool = True):
     """
     Fuzzy search members by name.
-    Priority: exact full-name match > token prefix matches > name/display_name substring > email substring.
+    Priority: exact full-name match > token prefix matches > name/display_name substring > email substring,
+    plus a typo/romanization-tolerant n-gram score ("Goerge", "Lee"/"Li", "Wei Zhang"/"Zhang Wei").
+    Only the index's candidate pool is scored, not the whole directory.
     """
     tokens = [_norm(t) for t in _tokenize_name(name)]
     if not tokens:
         return []
 
-    people = _get_all_members_pages(max_pages=max_pages, only_active=only_active)
-    if not people:
+    index = _get_member_index(max_pages=max_pages, only_active=only_active)
+    return _rank_members(index, name, tokens)
+
+def _rank_members(index: NameIndex, name: str, tokens):
+    if not len(index):
         return []
 
     scored = []
-    for m in people:
+    for fuzzy, m in index.score_candidates(name):
         first = _norm(m.get("first_name"))
         last  = _norm(m.get("last_name"))
         disp  = _norm(m.get("name") or m.get("display_name") or f"{first} {last}".strip())
@@ -256,22 +546,17 @@ def search_members_by_name(name: str, max_pages: int = 20, only_active: bool = T
             if t in disp:          score += 15    # broader match on name/display_name
             if t in email:         score += 2
 
+        # typo / romanization / name-order tolerant match (0..1)
+        score += int(round(fuzzy * 40))
+
         if score > 0:
             scored.append((score, m))
 
     scored.sort(key=lambda x: x[0], reverse=True)
     return [m for _, m in scored]
 
-def find_assets_by_person_name(name: str, include_custom_fields: bool = False, max_pages: int = 10):
-    """
-    Find assets by human name:
-      - If exactly one strong match (or one full-name match): fetch possessions_of.
-      - Otherwise return candidates with only name & email (and id) for disambiguation.
-    """
-    candidates = search_members_by_name(name)
-    if not candidates:
-        return {"candidates": [], "assets": []}
-
+def _pick_unique_member(name: str, candidates):
+    """One full-name match, or the only candidate; None when ambiguous."""
     tokens = [_norm(t) for t in _tokenize_name(name)]
 
     def _is_full_eq(m):
@@ -280,118 +565,108 @@ def find_assets_by_person_name(name: str, include_custom_fields: bool = False, m
         return len(tokens) >= 2 and tokens[0] == first and tokens[1] == last
 
     full_matches = [m for m in candidates if _is_full_eq(m)]
-    target = None
     if len(full_matches) == 1:
-        target = full_matches[0]
-    elif len(candidates) == 1:
-        target = candidates[0]
+        return full_matches[0]
+    if len(candidates) == 1:
+        return candidates[0]
+    return None
+
+def _slim_member(m):
+    return {
+        "id": m.get("id") or m.get("user_id"),
+        "first_name": m.get("first_name"),
+        "last_name": m.get("last_name"),
+        "email": m.get("email"),
+    }
+
+def find_assets_by_person_name(name: str, include_custom_fields: bool = False, max_pages: int = 10):
+    """
+    Find assets by human name:
+      - If exactly one strong match (or one full-name match): fetch possessions_of.
+      - Otherwise return candidates with only name & email (and id) for disambiguation.
+    """
+    candidates = search_members_by_name(name)
+    if not candidates:
+        return {"candidates": [], "assets": []}
 
+    target = _pick_unique_member(name, candidates)
     if target:
         uid = target.get("id") or target.get("user_id")
         assets = get_assets_possessions_of_user(int(uid), include_custom_fields=include_custom_fields, max_pages=max_pages)
-        return {
-            "candidates": [],
-            "member": {
-                "id": uid,
-                "first_name": target.get("first_name"),
-                "last_name": target.get("last_name"),
-                "email": target.get("email"),
-            },
-            "assets": assets
-        }
+        return {"candidates": [], "member": _slim_member(target), "assets": assets}
 
     # Return only name + email for disambiguation
-    slim = [{
-        "id": c.get("id") or c.get("user_id"),
-        "first_name": c.get("first_name"),
-        "last_name": c.get("last_name"),
-        "email": c.get("email"),
-    } for c in candidates[:15]]
+    slim = [_slim_member(c) for c in candidates[:15]]
     return {"candidates": slim, "assets": []}
 
 # ====================== Other helpers ======================
 
-def licenses_expiring_within(days: int = 10):
-    """Fetch all software licenses expiring within N days."""
+def _licenses_params(days: int, page: int, include_custom_fields=False):
+    params = {
+        "status": "expiring_in",
+        "filter_param_val": str(days),
+        "page": page,
+        "limit": PAGE_SIZE,
+    }
+    if include_custom_fields:
+        params["include_custom_fields"] = "true"
+    return params
+
+def _collect_expiring(items, cutoff, seen_ids):
+    """License rows expiring on/before cutoff, de-duplicated across pages via seen_ids."""
+    rows = []
+    for lic in items:
+        lic_id = lic.get("license_id") or lic.get("id")
+        if lic_id and lic_id in seen_ids:
+            continue
+        if lic_id:
+            seen_ids.add(lic_id)
+        expiry_raw = lic.get("end_date") or lic.get("expiry_date") or lic.get("expires_on")
+        d = parse_date(expiry_raw)
+        if d and d <= cutoff:
+            rows.append({
+                "name": lic.get("name") or lic.get("software_name") or "(unknown)",
+                "expires_on": d.isoformat(),
+                "license_id": lic_id,
+            })
+    return rows
+
+def licenses_expiring_within(days: int = 10, fields=None):
+    """Fetch all software licenses expiring within N days (custom fields only if requested)."""
+    need_cf = FL.needs_custom_fields(fields)
     today = datetime.utcnow().date()
     cutoff = today + timedelta(days=days)
     results = []
     seen_ids = set()
     page = 1
 
-    while True:
-        params = {
-            "status": "expiring_in",
-            "filter_param_val": str(days),
-            "page": page,
-            "limit": PAGE_SIZE,
-            "include_custom_fields": "true",
-        }
-        data = _get("software_licenses/filter.api", params=params)
-        items = data.get("licenses") or data.get("software_licenses") or []
-        count = len(items)
-        print(f"[licenses_expiring_within] page={page} items={count}")
-        if count == 0:
-            break
-        for lic in items:
-            lic_id = lic.get("license_id") or lic.get("id")
-            if lic_id and lic_id in seen_ids:
-                continue
-            if lic_id:
-                seen_ids.add(lic_id)
-            expiry_raw = lic.get("end_date") or lic.get("expiry_date") or lic.get("expires_on")
-            d = parse_date(expiry_raw)
-            if d and d <= cutoff:
-                results.append({
-                    "name": lic.get("name") or lic.get("software_name") or "(unknown)",
-                    "expires_on": d.isoformat(),
-                    "license_id": lic_id,
-                })
-        if count < PAGE_SIZE:
-            break
-        page += 1
+    try:
+        while True:
+            data = _get("software_licenses/filter.api", params=_licenses_params(days, page, need_cf))
+            items = data.get("licenses") or data.get("software_licenses") or []
+            count = len(items)
+            slog.debug("licenses_page", page=page, items=count)
+            if count == 0:
+                break
+            results.extend(_collect_expiring(items, cutoff, seen_ids))
+            if count < PAGE_SIZE:
+                break
+            page += 1
+    except DL.DeadlineExceeded as e:
+        raise e.attach(sorted(results, key=lambda x: x["expires_on"]), page - 1)
     return sorted(results, key=lambda x: x["expires_on"])
 
-def laptops_older_than(years: int = 3):
+def laptops_older_than(years: int = 3, progress=None, fields=None):
     """Find laptops older than N years."""
-    cutoff = datetime.utcnow().date() - timedelta(days=365 * years)
-    results = []
-    page = 1
-    print(f"[laptops_older_than] cutoff={cutoff} years={years}")
-    while True:
-        data = _get("assets.api", params={"page": page, "limit": 200})
-        assets = data.get("assets", [])
-        if not assets:
-            break
-        for a in assets:
-            name = (a.get("name") or "").lower()
-            group = (a.get("group_name") or "").lower()
-            pd_raw = a.get("purchased_on")
-            pd = parse_date(pd_raw)
-            if any(b in name for b in ["apple", "lenovo", "dell", "hp"]):
-                if any(w in name or w in group for w in ["laptop", "notebook", "macbook", "desktop", "pc"]):
-                    if pd and pd <= cutoff:
-                        results.append(a)
-        if page >= data.get("total_pages", 1):
-            break
-        page += 1
-    print(f"[laptops_older_than] total matches={len(results)}")
+    plan = QP.plan_from_intent({"intent": "old_laptops", "years": years})
+    results = run_plan(plan, progress=progress, fields=fields)
+    slog.info("laptops_older_than", plan=plan.describe(), years=years, matches=len(results))
     return results
 
-def find_assets_by_location(location: str):
+def devices_older_than(years: int = 3, progress=None, fields=None):
+    """Find any asset purchased more than N years ago."""
+    return run_plan(QP.plan_from_intent({"intent": "age_assets", "years": years}), progress=progress, fields=fields)
+
+def find_assets_by_location(location: str, progress=None, fields=None):
     """Find all assets in a given location (by location_name)."""
-    results = []
-    page = 1
-    while True:
-        data = _get("assets.api", params={"page": page, "limit": 200})
-        assets = data.get("assets", [])
-        if not assets:
-            break
-        for a in assets:
-            loc = (a.get("location_name") or "").upper()
-            if loc == location.upper():
-                results.append(a)
-        if page >= data.get("total_pages", 1):
-            break
-        page += 1
-    return results
\ No newline at end of file
+    return run_plan(QP.plan_from_intent({"intent": "location_assets", "location": location}), progress=progress, fields=fields)
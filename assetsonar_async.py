@@ -0,0 +1,385 @@
+"""
+Async AssetSonar client for the AsyncApp runtime (see app_async.py).
+
+Same public functions as assetsonar.py, backed by one pooled aiohttp session.
+Payload parsing, matching and ranking are shared with the sync module; the
+difference is that full assets.api scans fetch pages concurrently once the
+first page has told us total_pages.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import aiohttp
+
+import assetsonar as AS
+import catalog
+import deadline as DL
+import log
+import metrics as M
+import fields as FL
+import idcache as IDC
+import query_plan as QP
+from name_index import NameIndex
+
+MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(sock_connect=5, sock_read=20)
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_session = None
+_member_indexes = {}
+# (loop, lock): one index build at a time; an asyncio.Lock belongs to one loop
+_index_lock = (None, None)
+slog = log.get_logger("assetsonar_async")
+
+
+def _get_session():
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            headers=AS.HEADERS,
+            timeout=DEFAULT_TIMEOUT,
+            connector=aiohttp.TCPConnector(limit=MAX_CONCURRENCY * 2),
+        )
+    return _session
+
+
+async def close():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def _get(path, params=None):
+    url = f"{AS.BASE_URL}/{path}"
+    params = {k: str(v) for k, v in (params or {}).items()}
+    endpoint = AS._endpoint(path)
+    for attempt in range(4):
+        DL.check(endpoint, DL.MIN_REQUEST_SECONDS)
+        timeout = aiohttp.ClientTimeout(sock_connect=DL.clamp(5), sock_read=DL.clamp(20), total=DL.remaining())
+        start = time.perf_counter()
+        try:
+            async with _get_session().get(url, params=params, timeout=timeout) as r:
+                M.AS_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+                M.AS_REQUESTS.inc(endpoint=endpoint, status=str(r.status))
+                if r.status == 429:
+                    await asyncio.sleep(AS._rate_limit_wait(r, endpoint))
+                    continue
+                if r.status in RETRY_STATUSES and attempt < 3:
+                    await asyncio.sleep(DL.clamp(0.4 * (2 ** attempt)))
+                    continue
+                r.raise_for_status()
+                return await r.json(content_type=None)
+        except asyncio.TimeoutError:
+            if DL.expired():
+                M.AS_REQUESTS.inc(endpoint=endpoint, status="deadline")
+                raise DL.DeadlineExceeded(endpoint) from None
+            raise
+    r.raise_for_status()
+    return {}
+
+
+async def _scan_assets(predicate, limit=200, progress=None):
+    """
+    Run predicate over every assets.api page; pages 2..N are fetched concurrently.
+    progress(pages_done, total_pages, matched) is called as pages complete.
+    """
+    first = await _get("assets.api", params={"page": 1, "limit": limit})
+    assets = first.get("assets", [])
+    if not assets:
+        return []
+    results = [a for a in assets if predicate(a)]
+    M.AS_PAGES.inc()
+    total_pages = first.get("total_pages", 1)
+    if progress is not None:
+        progress(1, total_pages, results)
+    if total_pages <= 1:
+        return results
+
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    done = [1]
+
+    async def _page(page):
+        async with sem:
+            data = await _get("assets.api", params={"page": page, "limit": limit})
+        matched = [a for a in data.get("assets", []) if predicate(a)]
+        M.AS_PAGES.inc()
+        done[0] += 1
+        if progress is not None:
+            progress(done[0], total_pages, matched)
+        return matched
+
+    pages = await asyncio.gather(*(_page(p) for p in range(2, total_pages + 1)), return_exceptions=True)
+    late = None
+    for matched in pages:
+        if isinstance(matched, DL.DeadlineExceeded):
+            late = late or matched
+        elif isinstance(matched, BaseException):
+            raise matched
+        else:
+            results.extend(matched)
+    if late is not None:
+        raise late.attach(results, done[0], total_pages)
+    return results
+
+
+async def quick_search(query: str, include_custom_fields=False):
+    """Fast search by AIN/Serial using search.api"""
+    try:
+        data = await _get("search.api", params=AS._search_params(query, include_custom_fields))
+        return data.get("assets", [])
+    except Exception as e:
+        slog.warning("quick_search_failed", error=str(e))
+        return []
+
+
+async def resolve_fields(fields):
+    """Async counterpart of assetsonar.resolve_fields (shares its name cache)."""
+    if not FL.needs_custom_fields(fields):
+        return fields
+    if AS._custom_field_names is None:
+        try:
+            data = await _get("assets.api", params={"page": 1, "limit": AS.PAGE_SIZE, "include_custom_fields": "true"})
+        except DL.DeadlineExceeded:
+            raise
+        except Exception as e:
+            slog.warning("custom_field_names_failed", error=str(e))
+            return AS._resolved(fields, ())
+        AS._custom_field_names = AS._custom_field_names_of(data)
+    return AS._resolved(fields, AS._custom_field_names)
+
+
+async def hydrate_custom_fields(assets, fields):
+    """Async counterpart of assetsonar.hydrate_custom_fields (same row cap, copies, skips)."""
+    if not FL.needs_custom_fields(fields):
+        return assets
+    missing = [i for i, a in enumerate(assets) if not FL.has_custom_fields(a) and a.get("id")]
+    if len(missing) > AS.HYDRATE_MAX_ROWS:
+        slog.warning("hydrate_skipped", rows=len(missing), max_rows=AS.HYDRATE_MAX_ROWS)
+        return assets
+    out = list(assets)
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def _one(i):
+        asset = assets[i]
+        try:
+            async with sem:
+                data = await _get(f"assets/{asset['id']}.api", params={"include_custom_fields": "true"})
+        except DL.DeadlineExceeded:
+            raise
+        except Exception as e:
+            slog.warning("hydrate_failed", asset_id=asset.get("id"), error=str(e))
+            return
+        full = (data.get("asset") if isinstance(data.get("asset"), dict) else data) if isinstance(data, dict) else {}
+        # a copy: the row may be shared with the lookup cache or the catalog index
+        out[i] = {**asset, "custom_fields": full.get("custom_fields") or []}
+
+    results = await asyncio.gather(*(_one(i) for i in missing), return_exceptions=True)
+    late = next((r for r in results if isinstance(r, BaseException)), None)
+    if late is not None:
+        raise late.attach(out) if isinstance(late, DL.DeadlineExceeded) else late
+    return out
+
+
+async def get_member_by_email(email: str):
+    """Fetch member record by email."""
+    params = {"page": 1, "filter": "email", "filter_val": email}
+    data = await _get("members.api", params=params)
+    return AS._pick_member_by_email(data, email)
+
+
+async def get_assets_possessions_of_user(user_id: int, include_custom_fields=False, max_pages=10):
+    """Use assets/filter.api possessions_of to list user assets quickly."""
+    results = []
+    page = 1
+    try:
+        while page <= max_pages:
+            params = AS._possessions_params(user_id, page, include_custom_fields)
+            items = AS._extract_assets_payload(await _get("assets/filter.api", params=params))
+            results.extend(items)
+            if len(items) < 25:
+                break
+            page += 1
+    except DL.DeadlineExceeded as e:
+        raise e.attach(results, page - 1)
+    return results
+
+
+async def find_assets_by_assignee_email_fast(email: str, include_custom_fields=False, max_pages=10):
+    """High-speed asset lookup via server-side filters."""
+    if not AS.EMAIL_RE.match(email or ""):
+        return []
+    member = await get_member_by_email(email)
+    if not member:
+        return []
+    user_id = member.get("id") or member.get("user_id")
+    if not user_id:
+        return []
+    return await get_assets_possessions_of_user(int(user_id), include_custom_fields, max_pages)
+
+
+async def find_user_assets(query: str, limit=200, progress=None, fields=None):
+    """Async counterpart of assetsonar.find_user_assets."""
+    need_cf = FL.needs_custom_fields(fields)
+    is_email = "@" in query
+    m = AS.EMAIL_RE.search(query)
+    if m:
+        email = m.group(0)
+        fast_assets = await find_assets_by_assignee_email_fast(email, include_custom_fields=need_cf)
+        if fast_assets:
+            return {"user": {"name": email}, "assets": await hydrate_custom_fields(fast_assets, fields)}
+
+    query_lower = query.lower()
+    is_identifier = AS._looks_like_ain(query) or AS._looks_like_serial(query)
+    if is_identifier:
+        known = AS._known_identifier(query)
+        if known is not None:
+            return {"user": None, "assets": await hydrate_custom_fields(known, fields)}
+        quick = await quick_search(query, include_custom_fields=need_cf)
+        if quick:
+            M.ID_LOOKUPS.inc(source="search")
+            IDC.CACHE.put(query, quick)
+            return {"user": None, "assets": await hydrate_custom_fields(quick, fields)}
+
+    matched = await _scan_assets(lambda a: AS._asset_matches_query(a, query_lower), limit=limit, progress=progress)
+    if is_identifier:
+        M.ID_LOOKUPS.inc(source="scan")
+        IDC.CACHE.put(query, matched)
+    matched = await hydrate_custom_fields(matched, fields)
+    if matched and is_email:
+        return {"user": {"name": query}, "assets": matched}
+    return {"user": None, "assets": matched}
+
+
+async def _get_all_members_pages(max_pages: int = 20, only_active: bool = True):
+    async def _fetch(only_active_flag: bool):
+        people = []
+        page = 1
+        while page <= max_pages:
+            params = {"page": page}
+            if only_active_flag:
+                params["filter"] = "status"
+                params["filter_val"] = "active"
+            members = AS._extract_members_payload(await _get("members.api", params=params))
+            if not members:
+                break
+            people.extend(members)
+            if len(members) < 25:
+                break
+            page += 1
+        return people
+
+    people = await _fetch(only_active)
+    if not people and only_active:
+        people = await _fetch(False)
+    return people
+
+
+def _member_index_lock():
+    global _index_lock
+    loop = asyncio.get_running_loop()
+    if _index_lock[0] is not loop:
+        _index_lock = (loop, asyncio.Lock())
+    return _index_lock[1]
+
+
+async def _get_member_index(max_pages: int = 20, only_active: bool = True):
+    """
+    NameIndex over the member directory, built once per refresh. The build is
+    CPU-bound (seconds for 50k members), so it runs in a thread; the lock makes
+    concurrent first searches wait for one build instead of each starting one.
+    """
+    key = (max_pages, only_active)
+    index = _member_indexes.get(key)
+    if index is not None:
+        return index
+    async with _member_index_lock():
+        if key not in _member_indexes:
+            members = await _get_all_members_pages(max_pages, only_active)
+            _member_indexes[key] = await asyncio.to_thread(NameIndex, members)
+        return _member_indexes[key]
+
+
+def refresh_member_directory():
+    _member_indexes.clear()
+
+
+def update_member(member_id, member):
+    return AS._apply_member_update(_member_indexes, member_id, member)
+
+
+async def search_members_by_name(name: str, max_pages: int = 20, only_active: bool = True):
+    """Async counterpart of assetsonar.search_members_by_name (same ranking)."""
+    tokens = [AS._norm(t) for t in AS._tokenize_name(name)]
+    if not tokens:
+        return []
+    index = await _get_member_index(max_pages, only_active)
+    return AS._rank_members(index, name, tokens)
+
+
+async def find_assets_by_person_name(name: str, include_custom_fields: bool = False, max_pages: int = 10):
+    """Async counterpart of assetsonar.find_assets_by_person_name."""
+    candidates = await search_members_by_name(name)
+    if not candidates:
+        return {"candidates": [], "assets": []}
+
+    target = AS._pick_unique_member(name, candidates)
+    if target:
+        uid = target.get("id") or target.get("user_id")
+        assets = await get_assets_possessions_of_user(int(uid), include_custom_fields=include_custom_fields, max_pages=max_pages)
+        return {"candidates": [], "member": AS._slim_member(target), "assets": assets}
+
+    return {"candidates": [AS._slim_member(c) for c in candidates[:15]], "assets": []}
+
+
+async def licenses_expiring_within(days: int = 10, fields=None):
+    """Fetch all software licenses expiring within N days (custom fields only if requested)."""
+    need_cf = FL.needs_custom_fields(fields)
+    cutoff = datetime.utcnow().date() + timedelta(days=days)
+    results = []
+    seen_ids = set()
+    page = 1
+    try:
+        while True:
+            data = await _get("software_licenses/filter.api", params=AS._licenses_params(days, page, need_cf))
+            items = data.get("licenses") or data.get("software_licenses") or []
+            if not items:
+                break
+            results.extend(AS._collect_expiring(items, cutoff, seen_ids))
+            if len(items) < AS.PAGE_SIZE:
+                break
+            page += 1
+    except DL.DeadlineExceeded as e:
+        raise e.attach(sorted(results, key=lambda x: x["expires_on"]), page - 1)
+    return sorted(results, key=lambda x: x["expires_on"])
+
+
+async def run_plan(plan, progress=None, fields=None):
+    """Evaluate a QueryPlan: from the catalog index if installed, else one concurrent scan."""
+    index = catalog.get_index()
+    if index is not None:
+        results = plan.execute_index(index)
+    else:
+        results = await _scan_assets(plan.match, progress=progress)
+    return await hydrate_custom_fields(results, fields)
+
+
+async def laptops_older_than(years: int = 3, progress=None, fields=None):
+    """Find laptops older than N years."""
+    return await run_plan(QP.plan_from_intent({"intent": "old_laptops", "years": years}), progress=progress, fields=fields)
+
+
+async def devices_older_than(years: int = 3, progress=None, fields=None):
+    """Find any asset purchased more than N years ago."""
+    return await run_plan(QP.plan_from_intent({"intent": "age_assets", "years": years}), progress=progress, fields=fields)
+
+
+async def find_assets_by_location(location: str, progress=None, fields=None):
+    """Find all assets in a given location (by location_name)."""
+    return await run_plan(QP.plan_from_intent({"intent": "location_assets", "location": location}), progress=progress, fields=fields)
+
+
+async def all_assets():
+    """Every asset (used by the debug olddevices path)."""
+    return await _scan_assets(lambda a: True)
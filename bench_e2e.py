@@ -0,0 +1,226 @@
+"""
+End-to-end benchmark: the real /asset handler against fake_services.py.
+
+    python bench_e2e.py [--sizes 1000,10000,100000] [--latency-ms 0] [--rate-limit 0]
+                        [--json out.json] [--baseline old.json] [--tolerance 0.25]
+
+For every catalog size a fake AssetSonar/Slack/OpenAI server and a fresh bot
+process are started; after a warm-up, each intent below is run through
+app.handle_asset_command with cold caches. Reported per (size, intent):
+wall latency, AssetSonar / Slack / OpenAI request counts (server side, so
+retries and 429s are included) and, from a separate traced pass, peak
+Python memory.
+
+With --baseline, exits 1 if any latency or AssetSonar call count grew by
+more than --tolerance against a previous --json run.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from fake_services import slack_user_id
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (name, text); {email}/{name}/{ain}/{serial}/{slack_user} come from the fake catalog
+CASES = [
+    ("email", "{email}"),
+    ("name", "{name}"),
+    ("ain", "{ain}"),
+    ("serial", "{serial}"),
+    ("mention", "<@{slack_user}>"),
+    # same user again: Slack user -> member comes from the usermap cache
+    ("mention_cached", "<@{slack_user}>"),
+    ("license_expiry", "licenses expiring in 60 days"),
+    ("location", "SG devices"),
+    ("asset_query", "apple laptops older than 3 years in SG"),
+    ("age_gpt", "assets bought 5 years ago or earlier"),
+]
+
+
+def _samples(base_url):
+    """Pick real identifiers/people from page 1 of the fake catalog."""
+    assets = requests.get(f"{base_url}/assets.api", params={"page": 1, "limit": 25}).json()["assets"]
+    members = requests.get(f"{base_url}/members.api", params={"page": 1}).json()
+    owned = next(a for a in assets if a.get("assigned_to_user_email"))
+    m = members[0]
+    requests.post(f"{base_url}/_reset")
+    return {
+        "email": owned["assigned_to_user_email"],
+        "name": f"{m['first_name']} {m['last_name']}",
+        "ain": assets[0]["identifier"],
+        "serial": assets[1]["bios_serial_number"],
+        "slack_user": slack_user_id({"id": owned["assigned_to_user_id"]}),
+    }
+
+
+def _split_stats(stats):
+    out = {"assetsonar": 0, "slack": 0, "openai": 0, "as_429": stats.get("assetsonar:429", 0)}
+    for k, v in stats.items():
+        service = k.split(":", 1)[0]
+        if service in out and k != "assetsonar:429":
+            out[service] += v
+    return out
+
+
+def run_worker(base_url, out_path):
+    """
+    Runs inside the bot process (env already points at the fakes). A warm-up
+    pays the one-off costs (lazy OpenAI SDK import, client pools) before
+    anything is timed; latency is then measured with tracemalloc off, and
+    peak memory in a second pass with it on.
+    """
+    import logging
+
+    import app
+    import assetsonar as AS
+    import catalog
+    import config
+    import idcache as IDC
+    import metrics as M
+    import usermap as UM
+
+    samples = _samples(base_url)
+    ack = lambda *a, **k: None
+    logger = logging.getLogger("bench_e2e")
+
+    def _run(pass_name, name, template):
+        # cold caches per case; the usermap only carries over within a pass
+        AS.refresh_member_directory()
+        catalog.set_index(None)
+        IDC.CACHE.clear()
+        requests.post(f"{base_url}/_reset")
+        body = {"text": template.format(**samples), "channel_id": "CBENCH", "user_id": "UBENCH",
+                "trigger_id": f"bench.{pass_name}.{name}"}
+        t0 = time.perf_counter()
+        app.handle_asset_command(ack=ack, body=body, client=app.app.client, logger=logger)
+        return time.perf_counter() - t0
+
+    def _fresh_usermap(pass_name):
+        UM.MAP.close()
+        UM.MAP = UM.UserMap(f"{config.USER_MAP_PATH}.{pass_name}")
+
+    for name, template in CASES:
+        if name in ("email", "age_gpt"):
+            _run("warmup", name, template)
+
+    results = []
+    _fresh_usermap("timing")
+    for name, template in CASES:
+        errors_before = M.COMMANDS.value(intent="error")
+        elapsed = _run("timing", name, template)
+        stats = requests.get(f"{base_url}/_stats").json()
+        results.append({
+            "intent": name,
+            "seconds": round(elapsed, 4),
+            "ok": M.COMMANDS.value(intent="error") == errors_before,
+            **_split_stats(stats),
+        })
+
+    _fresh_usermap("memory")
+    tracemalloc.start()
+    for r, (name, template) in zip(results, CASES):
+        tracemalloc.reset_peak()
+        _run("memory", name, template)
+        r["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+    tracemalloc.stop()
+
+    with open(out_path, "w") as f:
+        json.dump(results, f)
+
+
+def _start_fake(size, latency_ms, rate_limit):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "fake_services.py"), "--assets", str(size), "--port", "0",
+         "--latency-ms", str(latency_ms), "--rate-limit", str(rate_limit)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()  # "fake services on http://127.0.0.1:PORT: ..."
+    return proc, line.split(" on ", 1)[1].split(": ", 1)[0]
+
+
+def run_size(size, latency_ms, rate_limit):
+    fake, base_url = _start_fake(size, latency_ms, rate_limit)
+    fd, out_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    user_map = tempfile.mkdtemp(prefix="bench_usermap_")
+    env = dict(
+        os.environ,
+        AS_BASE_URL=base_url,
+        SLACK_API_URL=f"{base_url}/api/",
+        OPENAI_BASE_URL=f"{base_url}/v1",
+        OPENAI_API_KEY="sk-fake",
+        SLACK_BOT_TOKEN="xoxb-fake",
+        SLACK_SIGNING_SECRET="fake",
+        LOG_LEVEL="WARNING",
+        USER_MAP_PATH=os.path.join(user_map, "usermap.sqlite3"),
+        SLACK_DEDUPE_PATH=os.path.join(user_map, "dedupe.sqlite3"),
+    )
+    try:
+        subprocess.run([sys.executable, __file__, "--worker", base_url, out_path], env=env, check=True, cwd=HERE)
+        with open(out_path) as f:
+            return [dict(r, size=size) for r in json.load(f)]
+    finally:
+        os.remove(out_path)
+        shutil.rmtree(user_map, ignore_errors=True)
+        fake.terminate()
+        fake.wait()
+
+
+def _regressions(results, baseline, tolerance):
+    old = {(r["size"], r["intent"]): r for r in baseline}
+    found = []
+    for r in results:
+        b = old.get((r["size"], r["intent"]))
+        if not b:
+            continue
+        for key in ("seconds", "assetsonar"):
+            # ignore sub-50ms noise on latency
+            floor = 0.05 if key == "seconds" else 0
+            if r[key] > max(b[key] * (1 + tolerance), b[key] + floor):
+                found.append(f"{r['size']:>7} {r['intent']:<15} {key}: {b[key]} -> {r[key]}")
+    return found
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=int, default=0)
+    ap.add_argument("--json", help="write results here")
+    ap.add_argument("--baseline", help="previous --json output to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'size':>7} {'intent':<15} {'seconds':>8} {'AS':>5} {'429':>4} {'slack':>5} {'gpt':>4} {'peakMB':>7}  ok")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for r in run_size(size, args.latency_ms, args.rate_limit):
+            results.append(r)
+            print(f"{size:>7} {r['intent']:<15} {r['seconds']:>8.3f} {r['assetsonar']:>5} {r['as_429']:>4} "
+                  f"{r['slack']:>5} {r['openai']:>4} {r['peak_mb']:>7.1f}  {'ok' if r['ok'] else 'ERROR'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = _regressions(results, json.load(f), args.tolerance)
+        if found:
+            print("regressions:\n" + "\n".join(found))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[2], sys.argv[3])
+    else:
+        main()
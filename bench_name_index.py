@@ -0,0 +1,42 @@
+"""
+Benchmark for name_index.NameIndex over a synthetic member directory.
+
+    python bench_name_index.py [members] [queries]
+
+Prints index build time, fuzzy lookup latency (p50/p95/max) and recall@5 for
+queries with injected typos, romanization variants and swapped name order.
+"""
+import sys
+import time
+
+from name_index import NameIndex
+from synthetic import noisy_queries, same_person, synthetic_members
+
+
+def main(n_members: int = 50000, n_queries: int = 500):
+    members = synthetic_members(n_members)
+
+    t0 = time.perf_counter()
+    index = NameIndex(members)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    queries = noisy_queries(members, n_queries)
+    lat, hits = [], 0
+    for q, expected in queries:
+        t0 = time.perf_counter()
+        res = index.search(q, limit=5)
+        lat.append((time.perf_counter() - t0) * 1000)
+        if any(same_person(m, expected) for _, m in res):
+            hits += 1
+
+    lat.sort()
+    p = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))]
+    print(f"members={n_members} queries={n_queries}")
+    print(f"build={build_ms:.0f}ms")
+    print(f"lookup p50={p(0.50):.2f}ms p95={p(0.95):.2f}ms max={lat[-1]:.2f}ms")
+    print(f"recall@5={hits / n_queries:.3f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
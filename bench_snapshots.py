@@ -0,0 +1,77 @@
+"""
+Snapshot diff benchmark.
+
+    python bench_snapshots.py [--sizes 10000,100000] [--changes 10,1000] [--snapshots 7]
+
+For each catalog size a baseline snapshot is taken from fake_services'
+synthetic catalog, then --snapshots more, each reassigning/moving `changes`
+random assets. Reported: time to take one snapshot (a full sorted merge,
+grows with the catalog), bytes of delta history written, and time for the
+`/asset changes` report over all of them (grows with the changes only).
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fake_services import FakeCatalog, LOCATIONS
+from snapshots import SnapshotStore
+
+
+def run(size, changes, snapshots, seed=1):
+    rnd = random.Random(seed)
+    assets = {a["id"]: dict(a) for a in FakeCatalog(size, seed=seed).assets}
+    ids = list(assets)
+    path = tempfile.mkdtemp(prefix="bench_snapshots_")
+    try:
+        store = SnapshotStore(path, retention_days=0)
+        now = 1_000_000.0
+        store.take(assets.values(), now=now)
+        take_s = []
+        for n in range(snapshots):
+            for i in rnd.sample(ids, changes):
+                a = assets[i]
+                if rnd.random() < 0.5:
+                    a["assigned_to_user_id"] = rnd.randint(1, 10_000)
+                else:
+                    a["location_name"] = rnd.choice(LOCATIONS)
+            now += 86400
+            t0 = time.perf_counter()
+            store.take(assets.values(), now=now)
+            take_s.append(time.perf_counter() - t0)
+
+        delta_bytes = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path) if f.startswith("delta-"))
+        head_bytes = os.path.getsize(os.path.join(path, "head.jsonl.gz"))
+        t0 = time.perf_counter()
+        report = store.changes_since(1_000_000.0)
+        diff_s = time.perf_counter() - t0
+        return {
+            "size": size, "changes": changes, "take_s": sorted(take_s)[len(take_s) // 2],
+            "diff_s": diff_s, "delta_kb": delta_bytes / 1024, "head_kb": head_bytes / 1024,
+            "reported": len(report["changes"]),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000")
+    ap.add_argument("--changes", default="10,1000")
+    ap.add_argument("--snapshots", type=int, default=7)
+    args = ap.parse_args()
+
+    print(f"{'size':>7} {'changes':>7} {'take(med)':>10} {'diff':>9} {'deltas':>9} {'head':>9} {'reported':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for changes in (int(c) for c in args.changes.split(",")):
+            r = run(size, changes, args.snapshots)
+            print(f"{r['size']:>7} {r['changes']:>7} {r['take_s']:>9.3f}s {r['diff_s']:>8.4f}s "
+                  f"{r['delta_kb']:>7.0f}KB {r['head_kb']:>7.0f}KB {r['reported']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Cold-start benchmark.
+
+    python bench_startup.py [--runs 5] [--runtime sync|async|both] [--json out.json]
+
+import     median wall time of `import app` / `import app_async` in a fresh
+           interpreter (includes Bolt's auth.test against the fake Slack API)
+first_ack  spawn time of `server.py` until the first signed /asset slash
+           command is acked with 200
+
+Both run against fake_services.py, so no real credentials are needed. Use
+`python -X importtime -c "import app"` to see where the import time goes.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from bench_e2e import _start_fake
+from loadtest import sign, slash_command
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SECRET = "startup-secret"
+MODULES = {"sync": "app", "async": "app_async"}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _env(base_url, **extra):
+    env = dict(
+        os.environ,
+        AS_BASE_URL=base_url,
+        SLACK_API_URL=f"{base_url}/api/",
+        OPENAI_BASE_URL=f"{base_url}/v1",
+        OPENAI_API_KEY="sk-fake",
+        SLACK_BOT_TOKEN="xoxb-fake",
+        SLACK_SIGNING_SECRET=SECRET,
+        LOG_LEVEL="WARNING",
+        PREWARM="",
+    )
+    env.update(extra)
+    return env
+
+
+def time_import(module, env):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=HERE,
+                         check=True, capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def time_first_ack(runtime, env, timeout=30):
+    port = _free_port()
+    env = dict(env, BOT_RUNTIME=runtime, PORT=str(port))
+    url = f"http://127.0.0.1:{port}/slack/events"
+    started = time.perf_counter()
+    bot = subprocess.Popen([sys.executable, "server.py"], env=env, cwd=HERE,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        n = 0
+        while time.perf_counter() - started < timeout:
+            n += 1
+            body = slash_command("help", "CSTARTUP", n)
+            ts = str(int(time.time()))
+            headers = {
+                "Content-Type": "application/x-www-form-urlencoded",
+                "X-Slack-Request-Timestamp": ts,
+                "X-Slack-Signature": sign(SECRET, ts, body),
+            }
+            try:
+                r = requests.post(url, data=body, headers=headers, timeout=5)
+            except requests.RequestException:
+                time.sleep(0.02)
+                continue
+            if r.status_code == 200:
+                return time.perf_counter() - started
+            raise SystemExit(f"{runtime}: first ack returned HTTP {r.status_code}")
+        raise SystemExit(f"{runtime}: no ack within {timeout}s")
+    finally:
+        bot.terminate()
+        bot.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--runtime", choices=["sync", "async", "both"], default="both")
+    ap.add_argument("--json")
+    args = ap.parse_args()
+
+    runtimes = ["sync", "async"] if args.runtime == "both" else [args.runtime]
+    fake, base_url = _start_fake(1000, 0, 0)
+    env = _env(base_url)
+    results = {}
+    try:
+        for runtime in runtimes:
+            imports = [time_import(MODULES[runtime], env) for _ in range(args.runs)]
+            acks = [time_first_ack(runtime, env) for _ in range(args.runs)]
+            results[runtime] = {
+                "import_s": statistics.median(imports),
+                "first_ack_s": statistics.median(acks),
+            }
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    print(f"{'runtime':<8} {'import (median)':>16} {'first ack (median)':>19}")
+    for runtime, r in results.items():
+        print(f"{runtime:<8} {r['import_s'] * 1000:>14.0f}ms {r['first_ack_s'] * 1000:>17.0f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
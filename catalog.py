@@ -0,0 +1,118 @@
+"""
+In-memory catalog snapshot with secondary indexes.
+
+When a CatalogIndex is installed (set_index), query plans are answered from
+its posting sets instead of paging assets.api, and AIN/serial lookups from
+its exact identifier index. prewarm.py installs one when PREWARM includes
+"catalog"; nothing does by default.
+
+Webhooks update the installed index in place while queries read it, so every
+read that walks its dicts or posting sets holds `index.lock`, as add and
+remove do.
+"""
+import threading
+from collections import defaultdict
+
+VENDORS = ["apple", "lenovo", "dell", "hp"]
+
+_lock = threading.Lock()
+_current = None
+
+
+def asset_key(a):
+    return a.get("id") or a.get("identifier")
+
+
+def identifiers_of(a):
+    """Normalized AIN and serial of an asset (the keys of CatalogIndex.by_identifier)."""
+    out = set()
+    for f in ("identifier", "bios_serial_number"):
+        v = str(a.get(f) or "").strip().upper()
+        if v:
+            out.add(v)
+    return out
+
+
+def vendors_of(a):
+    """Every VENDORS entry named in the asset name ("HP dock for Dell" -> {"hp", "dell"})."""
+    name = (a.get("name") or "").lower()
+    return {v for v in VENDORS if v in name}
+
+
+class CatalogIndex:
+    """Assets by id, exact AIN/serial index, and posting sets for location / group / vendor / status."""
+
+    def __init__(self, assets):
+        self.assets = {}
+        self.by_identifier = defaultdict(set)
+        self.by_location = defaultdict(set)
+        self.by_group = defaultdict(set)
+        self.by_vendor = defaultdict(set)
+        self.by_status = defaultdict(set)
+        self.lock = threading.RLock()
+        for a in assets:
+            self.add(a)
+
+    def __len__(self):
+        return len(self.assets)
+
+    def add(self, a):
+        key = asset_key(a)
+        if key is None:
+            return
+        with self.lock:
+            if key in self.assets:
+                self.remove(key)
+            self.assets[key] = a
+            for ident in identifiers_of(a):
+                self.by_identifier[ident].add(key)
+            self.by_location[(a.get("location_name") or "").upper()].add(key)
+            self.by_group[(a.get("group_name") or "").lower()].add(key)
+            for v in vendors_of(a):
+                self.by_vendor[v].add(key)
+            self.by_status[str(a.get("status") or a.get("state") or "").lower()].add(key)
+
+    def remove(self, key):
+        with self.lock:
+            a = self.assets.pop(key, None)
+            if a is None:
+                return
+            for ident in identifiers_of(a):
+                keys = self.by_identifier.get(ident)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.by_identifier[ident]
+            self.by_location[(a.get("location_name") or "").upper()].discard(key)
+            self.by_group[(a.get("group_name") or "").lower()].discard(key)
+            for v in vendors_of(a):
+                self.by_vendor[v].discard(key)
+            self.by_status[str(a.get("status") or a.get("state") or "").lower()].discard(key)
+
+    def find_identifier(self, query):
+        """Assets whose AIN or serial equals query (case-insensitive)."""
+        with self.lock:
+            keys = self.by_identifier.get((query or "").strip().upper(), ())
+            return [self.assets[k] for k in keys]
+
+    def all_assets(self):
+        """A list copy of every asset, safe to iterate while webhooks update the index."""
+        with self.lock:
+            return list(self.assets.values())
+
+
+def get_index():
+    return _current
+
+
+def set_index(index):
+    global _current
+    with _lock:
+        _current = index
+
+
+def build_index(pages):
+    """Build and install an index from an iterable of asset pages."""
+    index = CatalogIndex(a for page in pages for a in page)
+    set_index(index)
+    return index
@@ -0,0 +1,84 @@
+"""
+Process settings, loaded once.
+
+The first `import config` reads .env (without overriding real environment
+variables) and every other module takes its settings from here, so no module
+calls load_dotenv() itself. Keep this module cheap to import: it runs before
+anything else on cold start.
+"""
+import os
+import ssl
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _float(name, default):
+    return float(os.getenv(name) or default)
+
+
+def _list(name):
+    return [v.strip() for v in (os.getenv(name) or "").split(",") if v.strip()]
+
+
+# --- Slack ---
+SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
+SLACK_SIGNING_SECRET = os.getenv("SLACK_SIGNING_SECRET")
+# empty -> slack_sdk's default (https://slack.com/api/)
+SLACK_API_URL = os.getenv("SLACK_API_URL") or None
+SLACK_DEDUPE_TTL = int(_float("SLACK_DEDUPE_TTL", 600))
+# claims shared by gunicorn workers (see dedupe.py); empty = per process
+SLACK_DEDUPE_PATH = os.getenv("SLACK_DEDUPE_PATH", "asbot_dedupe.sqlite3") or None
+# Slack user -> email -> member id cache for `/asset mine` (see usermap.py)
+USER_MAP_PATH = os.getenv("USER_MAP_PATH") or "asbot_usermap.sqlite3"
+USER_MAP_TTL = _float("USER_MAP_TTL", 7 * 24 * 3600)
+
+# --- AssetSonar ---
+AS_SECRET_KEY = os.getenv("AS_SECRET_KEY")
+AS_SUBDOMAIN = os.getenv("AS_SUBDOMAIN", "shopback")
+AS_BASE_URL = (os.getenv("AS_BASE_URL") or f"https://{AS_SUBDOMAIN}.assetsonar.com").rstrip("/")
+# shared secret for POST /assetsonar/webhook (see webhooks.py); unset = webhooks rejected
+AS_WEBHOOK_SECRET = os.getenv("AS_WEBHOOK_SECRET") or None
+
+# AIN / serial lookup cache (see idcache.py); misses are kept much shorter
+ID_CACHE_HIT_TTL = _float("ID_CACHE_HIT_TTL", 300)
+ID_CACHE_MISS_TTL = _float("ID_CACHE_MISS_TTL", 60)
+
+# --- OpenAI (the SDK itself also honours OPENAI_BASE_URL) ---
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# --- server / runtime ---
+PORT = int(_float("PORT", 3000))
+BOT_RUNTIME = (os.getenv("BOT_RUNTIME") or "sync").strip().lower()
+LOG_LEVEL = (os.getenv("LOG_LEVEL") or "INFO").upper()
+LOG_FORMAT = (os.getenv("LOG_FORMAT") or "json").lower()
+PROFILE_USERS = set(_list("PROFILE_USERS"))
+
+# --- budgets ---
+COMMAND_BUDGET_SECONDS = _float("COMMAND_BUDGET_SECONDS", 45)
+BACKGROUND_BUDGET_SECONDS = _float("BACKGROUND_BUDGET_SECONDS", 900)
+
+# --- background cache warm-up (see prewarm.py) ---
+# comma-separated subset of: members, catalog
+PREWARM = set(_list("PREWARM"))
+PREWARM_DELAY_SECONDS = _float("PREWARM_DELAY_SECONDS", 2)
+# full reconciliation of the warmed caches; webhooks keep them fresh in between,
+# so with a webhook secret the default poll is much slower
+CATALOG_REFRESH_SECONDS = _float("CATALOG_REFRESH_SECONDS", 3600 if AS_WEBHOOK_SECRET else 900)
+
+# --- catalog snapshots for `/asset changes` (see snapshots.py) ---
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or "snapshots"
+SNAPSHOT_INTERVAL_SECONDS = _float("SNAPSHOT_INTERVAL_SECONDS", 24 * 3600)
+SNAPSHOT_RETENTION_DAYS = _float("SNAPSHOT_RETENTION_DAYS", 90)
+
+_ssl_context = None
+
+
+def ssl_context():
+    """certifi-backed SSLContext for the Slack clients (python.org macOS builds lack a CA store)."""
+    global _ssl_context
+    if _ssl_context is None:
+        import certifi
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
@@ -0,0 +1,102 @@
+"""
+Per-command deadline budget.
+
+Each /asset command runs inside start(budget) ... reset(token). Stages ask
+the current deadline how much time is left: the AssetSonar clients clamp
+request timeouts and 429 sleeps to it and raise DeadlineExceeded once it is
+spent, and GPT parsing gets the remaining time as its request timeout. Scans
+catch the exception on the way out and attach the rows matched so far
+(`partial`) so the handler can post them with a "truncated" notice and a
+button to continue in the background with BACKGROUND_BUDGET.
+
+The deadline lives in a contextvar: asyncio tasks inherit it; worker-pool
+threads only see it when submitted through contextvars.copy_context().run,
+as export and custom field hydration do.
+"""
+import contextvars
+import time
+
+import config
+
+COMMAND_BUDGET = config.COMMAND_BUDGET_SECONDS
+BACKGROUND_BUDGET = config.BACKGROUND_BUDGET_SECONDS
+# below this, starting another request is pointless
+MIN_REQUEST_SECONDS = 0.5
+
+_CURRENT = contextvars.ContextVar("asbot_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The command's budget ran out in `stage`; `partial` holds rows gathered so far."""
+
+    def __init__(self, stage, partial=None, pages_done=None, total_pages=None):
+        super().__init__(f"deadline exceeded during {stage}")
+        self.stage = stage
+        self.partial = partial
+        self.pages_done = pages_done
+        self.total_pages = total_pages
+
+    def attach(self, partial, pages_done=None, total_pages=None):
+        """Set the partial result if an inner stage has not already."""
+        if self.partial is None:
+            self.partial = partial
+            self.pages_done = pages_done
+            self.total_pages = total_pages
+        return self
+
+
+class Deadline:
+    def __init__(self, budget, clock=time.monotonic):
+        self.budget = budget
+        self.clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        return self.remaining() <= 0.0
+
+
+def start(budget=COMMAND_BUDGET):
+    """Install a deadline for this context; pass the token to reset()."""
+    return _CURRENT.set(Deadline(budget))
+
+
+def reset(token):
+    _CURRENT.reset(token)
+
+
+def current():
+    return _CURRENT.get()
+
+
+def remaining():
+    """Seconds left, or None when no deadline is installed."""
+    d = _CURRENT.get()
+    return None if d is None else d.remaining()
+
+
+def expired():
+    d = _CURRENT.get()
+    return d is not None and d.expired()
+
+
+def check(stage, min_seconds=0.0):
+    """Raise DeadlineExceeded if less than min_seconds of budget is left."""
+    d = _CURRENT.get()
+    if d is not None and d.remaining() <= min_seconds:
+        raise DeadlineExceeded(stage)
+
+
+def clamp(seconds):
+    """seconds, capped to the remaining budget (unchanged without a deadline)."""
+    d = _CURRENT.get()
+    if d is None:
+        return seconds
+    return max(0.001, min(seconds, d.remaining()))
+
+
+def budget_for(body):
+    """Continuations started from the 'continue in background' button get the long budget."""
+    return BACKGROUND_BUDGET if isinstance(body, dict) and body.get("background") else COMMAND_BUDGET
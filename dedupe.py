@@ -0,0 +1,164 @@
+"""
+De-duplication of Slack redeliveries.
+
+When an ack is slow Slack re-sends the same request (X-Slack-Retry-Num: 1, 2)
+with the same trigger_id / event_id. Each delivery used to post a new
+"Searching" anchor and rerun the scan and upload. Handlers now claim the
+delivery key first; a redelivery within DEDUPE_TTL seconds finds the
+in-flight or finished job and does no new work. Both runtimes also ack
+known retries before they reach Bolt (the Flask route, an aiohttp
+middleware); the async runtime calls the registry through asyncio.to_thread.
+
+Claims are also recorded in a small sqlite file (SLACK_DEDUPE_PATH), like
+usermap.py, so a retry that lands on another gunicorn worker finds the claim
+too. With SLACK_DEDUPE_PATH empty the registry is per process and only
+catches retries that reach the worker that took the original.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs
+
+import config
+
+DEDUPE_TTL = config.SLACK_DEDUPE_TTL
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    key TEXT PRIMARY KEY, started REAL NOT NULL, finished REAL);
+"""
+
+
+class Job:
+    __slots__ = ("key", "started", "finished", "channel_id", "thread_ts")
+
+    def __init__(self, key, started):
+        self.key = key
+        self.started = started
+        self.finished = None
+        self.channel_id = None
+        self.thread_ts = None
+
+    @property
+    def state(self):
+        return "done" if self.finished is not None else "running"
+
+
+class JobRegistry:
+    """
+    delivery key -> Job, forgotten DEDUPE_TTL seconds after it started. With
+    a path, claims are shared through sqlite with every process using it;
+    jobs claimed elsewhere come back without channel/thread.
+    """
+
+    def __init__(self, ttl=DEDUPE_TTL, clock=time.time, path=None):
+        self.ttl = ttl
+        self.clock = clock
+        self.path = path
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        # opened on first use, as in usermap.UserMap
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _purge(self, now):
+        expired = [k for k, j in self._jobs.items() if now - j.started > self.ttl]
+        for k in expired:
+            del self._jobs[k]
+
+    def _claim_shared(self, key, now):
+        """True if this process took the key; else the Job another process holds."""
+        db = self._db()
+        db.execute("DELETE FROM deliveries WHERE started < ?", (now - self.ttl,))
+        if db.execute("INSERT OR IGNORE INTO deliveries VALUES (?, ?, NULL)", (key, now)).rowcount:
+            return True
+        row = db.execute("SELECT started, finished FROM deliveries WHERE key = ?", (key,)).fetchone()
+        job = Job(key, row[0] if row else now)
+        job.finished = row[1] if row else None
+        return job
+
+    def claim(self, key):
+        """(job, True) for a new delivery; (existing job, False) for a redelivery."""
+        now = self.clock()
+        with self._lock:
+            self._purge(now)
+            job = self._jobs.get(key)
+            if job is not None:
+                return job, False
+            if self.path is not None:
+                other = self._claim_shared(key, now)
+                if other is not True:
+                    return other, False
+            job = self._jobs[key] = Job(key, now)
+            return job, True
+
+    def seen(self, key) -> bool:
+        if key is None:
+            return False
+        with self._lock:
+            now = self.clock()
+            job = self._jobs.get(key)
+            if job is not None:
+                return now - job.started <= self.ttl
+            if self.path is None:
+                return False
+            row = self._db().execute("SELECT started FROM deliveries WHERE key = ?", (key,)).fetchone()
+            return row is not None and now - row[0] <= self.ttl
+
+    def finish(self, key):
+        with self._lock:
+            now = self.clock()
+            job = self._jobs.get(key)
+            if job is not None:
+                job.finished = now
+            if self.path is not None:
+                self._db().execute("UPDATE deliveries SET finished = ? WHERE key = ?", (now, key))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+REGISTRY = JobRegistry(path=config.SLACK_DEDUPE_PATH)
+
+
+def delivery_key(body):
+    """Stable id of one Slack delivery from a Bolt `body` (same across retries)."""
+    if not isinstance(body, dict):
+        return None
+    for field in ("trigger_id", "event_id"):
+        if body.get(field):
+            return f"{field}:{body[field]}"
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+    return f"body:{digest}"
+
+
+def key_from_raw(raw: str):
+    """delivery_key() for the raw HTTP body of /slack/events (form, payload= or JSON)."""
+    raw = raw or ""
+    if raw.lstrip().startswith("{"):
+        try:
+            return delivery_key(json.loads(raw))
+        except ValueError:
+            return None
+    form = {k: v[-1] for k, v in parse_qs(raw).items()}
+    if "payload" in form:
+        try:
+            return delivery_key(json.loads(form["payload"]))
+        except ValueError:
+            return None
+    return delivery_key(form)
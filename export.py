@@ -0,0 +1,216 @@
+"""
+Full inventory export: `/asset export [csv|parquet]`.
+
+Pages of assets.api are fetched with bounded parallelism (at most
+EXPORT_WORKERS requests in flight, pages consumed in order), rows are
+written to fixed-size compressed chunks, and each finished chunk is
+uploaded to the thread while fetching continues. Memory is bounded by one
+chunk plus the in-flight pages, whatever the catalog size.
+
+An export is long by nature and posts into its own thread as it goes, so it
+runs under BACKGROUND_BUDGET instead of the command's deadline; page fetches
+see it through a copy of the context in each pool call. If even that runs
+out, the rows fetched so far are still written and uploaded and the summary
+says where the export stopped.
+"""
+import contextvars
+import csv
+import gzip
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import assetsonar as AS
+import deadline as DL
+import log
+import metrics as M
+from slack_upload import client as slack_client, upload_csv_to_slack
+
+slog = log.get_logger("export")
+
+EXPORT_WORKERS = 4
+EXPORT_PAGE_LIMIT = 200
+CHUNK_ROWS = 10000
+REPORT_INTERVAL = 3.0
+
+EXPORT_COLUMNS = [
+    "id",
+    "identifier",
+    "name",
+    "bios_serial_number",
+    "group_name",
+    "location_name",
+    "purchased_on",
+    "assigned_to_user_name",
+    "assigned_to_user_email",
+    "status",
+]
+
+
+def _fetch_page(page):
+    return AS._get("assets.api", params={"page": page, "limit": EXPORT_PAGE_LIMIT})
+
+
+def iter_pages_parallel(workers=EXPORT_WORKERS):
+    """Yield (page, total_pages, assets) in page order, keeping `workers` requests in flight."""
+    first = _fetch_page(1)
+    assets = first.get("assets", [])
+    if not assets:
+        return
+    total_pages = first.get("total_pages", 1)
+    yield 1, total_pages, assets
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        next_page = 2
+        for page in range(2, total_pages + 1):
+            while next_page <= total_pages and len(pending) < workers:
+                # the deadline is a contextvar; pool threads only see it through a copy
+                pending[next_page] = pool.submit(contextvars.copy_context().run, _fetch_page, next_page)
+                next_page += 1
+            data = pending.pop(page).result()
+            yield page, total_pages, data.get("assets", [])
+
+
+class _ChunkWriter:
+    """Writes rows to numbered chunk files and hands each finished file to on_chunk."""
+
+    def __init__(self, fmt, prefix, on_chunk, chunk_rows=CHUNK_ROWS):
+        self.fmt = fmt
+        self.prefix = prefix
+        self.on_chunk = on_chunk
+        self.chunk_rows = chunk_rows
+        self.chunks = 0
+        self.rows = []
+
+    def add(self, asset):
+        self.rows.append([asset.get(c) for c in EXPORT_COLUMNS])
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        self.chunks += 1
+        with M.span("export_chunk", format=self.fmt):
+            path = self._write(self.rows)
+        self.rows = []
+        self.on_chunk(self.chunks, path)
+
+    def _write(self, rows):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            fd, path = tempfile.mkstemp(prefix=f"{self.prefix}_part{self.chunks:03d}_", suffix=".parquet")
+            os.close(fd)
+            cols = {c: [None if r[i] is None else str(r[i]) for r in rows] for i, c in enumerate(EXPORT_COLUMNS)}
+            pq.write_table(pa.table(cols), path, compression="zstd")
+            return path
+
+        fd, path = tempfile.mkstemp(prefix=f"{self.prefix}_part{self.chunks:03d}_", suffix=".csv.gz")
+        os.close(fd)
+        with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_COLUMNS)
+            writer.writerows(rows)
+        return path
+
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def export_inventory(channel_id, thread_ts, fmt="csv", workers=EXPORT_WORKERS, chunk_rows=CHUNK_ROWS, budget=None):
+    """
+    Export every asset to the thread as compressed chunks; returns a summary dict.
+    Progress/throughput is reported by editing the anchor message (thread_ts).
+    `budget` defaults to BACKGROUND_BUDGET, replacing the caller's deadline.
+    """
+    token = DL.start(DL.BACKGROUND_BUDGET if budget is None else budget)
+    try:
+        return _export(channel_id, thread_ts, fmt, workers, chunk_rows)
+    finally:
+        DL.reset(token)
+
+
+def _export(channel_id, thread_ts, fmt, workers, chunk_rows):
+    fmt = (fmt or "csv").lower()
+    note = ""
+    if fmt == "parquet" and not _parquet_available():
+        fmt, note = "csv", " (pyarrow not installed, fell back to csv.gz)"
+
+    started = time.monotonic()
+    uploads = []
+    uploader = ThreadPoolExecutor(max_workers=1)
+
+    def _upload(n, path):
+        try:
+            permalink = upload_csv_to_slack(path, channel_id, title=f"Inventory export part {n}", thread_ts=thread_ts)
+        finally:
+            os.remove(path)
+        return permalink
+
+    writer = _ChunkWriter(fmt, "inventory", lambda n, path: uploads.append(uploader.submit(_upload, n, path)),
+                          chunk_rows=chunk_rows)
+
+    exported = 0
+    last_report = started
+    page = total_pages = 0
+    truncated = None
+    try:
+        try:
+            for page, total_pages, assets in iter_pages_parallel(workers):
+                for a in assets:
+                    writer.add(a)
+                exported += len(assets)
+
+                now = time.monotonic()
+                if now - last_report >= REPORT_INTERVAL:
+                    last_report = now
+                    rate = exported / max(now - started, 1e-6)
+                    try:
+                        slack_client.chat_update(
+                            channel=channel_id,
+                            ts=thread_ts,
+                            text=f":package: Exporting... page {page}/{total_pages}, {exported:,} assets ({rate:,.0f}/s), "
+                                 f"{writer.chunks} chunk(s) queued"
+                        )
+                    except Exception as e:
+                        slog.warning("export_progress_update_failed", error=str(e))
+        except DL.DeadlineExceeded:
+            # keep what was fetched: it is still written and uploaded below
+            truncated = (page, total_pages)
+            slog.warning("export_truncated", pages_done=page, total_pages=total_pages, assets=exported)
+        writer.flush()
+        permalinks = [f.result() for f in uploads]
+    finally:
+        uploader.shutdown(wait=True)
+
+    elapsed = time.monotonic() - started
+    return {
+        "assets": exported,
+        "chunks": writer.chunks,
+        "format": fmt,
+        "note": note,
+        "seconds": elapsed,
+        "rate": exported / max(elapsed, 1e-6),
+        "permalinks": [p for p in permalinks if p],
+        "truncated": truncated,
+    }
+
+
+def summary_text(summary):
+    ext = "parquet" if summary["format"] == "parquet" else "csv.gz"
+    return (
+        f"📦 Exported {summary['assets']:,} assets in {summary['chunks']} {ext} chunk(s) "
+        f"in {summary['seconds']:.1f}s ({summary['rate']:,.0f} assets/s){summary['note']}"
+    ) + (
+        "\n⏳ Time budget reached after page {}/{}; this export is incomplete.".format(*summary["truncated"])
+        if summary.get("truncated") else ""
+    )
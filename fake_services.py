@@ -0,0 +1,399 @@
+"""
+Local stand-ins for AssetSonar, Slack and OpenAI, for benchmarks and
+end-to-end runs without touching the live tenant.
+
+    python fake_services.py --assets 10000 --port 8765 --latency-ms 20 --rate-limit 50
+
+then point the bot at it:
+
+    AS_BASE_URL=http://127.0.0.1:8765
+    SLACK_API_URL=http://127.0.0.1:8765/api/
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+
+AssetSonar: assets.api, members.api, search.api, assets/filter.api
+(possessions_of), software_licenses/filter.api (expiring_in) and
+assets/<id>.api over a deterministic synthetic catalog, with the same page
+sizes and payload shapes as the real API. --latency-ms delays every response;
+--rate-limit N answers 429 + Retry-After once more than N requests arrive
+within one second.
+
+Slack: any /api/<method> returns ok; files_upload_v2's three steps are
+supported, and users.info maps slack_user_id(member) back to the member's
+email. OpenAI: /v1/chat/completions returns a keyword-based intent.
+
+GET /_stats returns request counts per service/endpoint and
+GET /_events?since=<epoch> the chat.* calls (time, channel, text) the bot
+made; POST /_reset clears both. Stdlib only, so it runs wherever the bot runs.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from synthetic import synthetic_members
+
+MEMBERS_PAGE = 25
+FILTER_PAGE = 25
+LICENSES = 300
+
+LOCATIONS = ["TW", "SG", "MY", "ID", "PH", "VN", "TH", "AU"]
+MODELS = [
+    ("Laptops", "Apple MacBook Pro 14"),
+    ("Laptops", "Apple MacBook Air 13"),
+    ("Laptops", "Lenovo ThinkPad X1 Carbon"),
+    ("Laptops", "Dell Latitude 7440"),
+    ("Laptops", "HP EliteBook 840"),
+    ("Desktops", "Dell OptiPlex 7010"),
+    ("Desktops", "Apple iMac 24"),
+    ("Monitors", "Dell U2723QE"),
+    ("Monitors", "LG 27UP850"),
+    ("Peripherals", "Logitech MX Keys"),
+]
+STATUSES = ["in_use"] * 8 + ["available", "in_repair"]
+SOFTWARE = ["Adobe CC", "JetBrains All Products", "Microsoft 365", "Figma", "Zoom Pro",
+            "Slack Pro", "Notion", "1Password", "Tableau", "Miro"]
+
+
+def slack_user_id(member):
+    """The fake Slack user id users.info resolves to this member's email."""
+    return f"UM{member['id']:07d}"
+
+
+class FakeCatalog:
+    """Deterministic synthetic tenant: members, assets and licenses."""
+
+    def __init__(self, n_assets, n_members=None, seed=1, today=None):
+        rnd = random.Random(seed)
+        today = today or date.today()
+        n_members = n_members or max(50, n_assets // 3)
+        self.members = [dict(m, status="active") for m in synthetic_members(n_members, seed=seed)]
+        self.members_by_id = {m["id"]: m for m in self.members}
+
+        self.assets = []
+        self.by_user = {}
+        for i in range(n_assets):
+            group, model = rnd.choice(MODELS)
+            owner = rnd.choice(self.members) if rnd.random() < 0.85 else None
+            asset = {
+                "id": 100000 + i,
+                "identifier": f"{rnd.choice(LOCATIONS)}{i:06d}",
+                "name": model,
+                "bios_serial_number": "".join(rnd.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(10)),
+                "group_name": group,
+                "location_name": rnd.choice(LOCATIONS),
+                "purchased_on": (today - timedelta(days=rnd.randint(30, 365 * 7))).isoformat(),
+                "status": rnd.choice(STATUSES),
+                "assigned_to_user_id": owner["id"] if owner else None,
+                "assigned_to_user_name": f"{owner['first_name']} {owner['last_name']}" if owner else None,
+                "assigned_to_user_email": owner["email"] if owner else None,
+            }
+            self.assets.append(asset)
+            if owner:
+                self.by_user.setdefault(owner["id"], []).append(asset)
+        self.by_id = {a["id"]: a for a in self.assets}
+
+        self.licenses = []
+        for i in range(LICENSES):
+            self.licenses.append({
+                "license_id": 5000 + i,
+                "name": f"{rnd.choice(SOFTWARE)} seat {i}",
+                "end_date": (today + timedelta(days=rnd.randint(-30, 400))).isoformat(),
+            })
+        self.licenses.sort(key=lambda lic: lic["end_date"])
+
+    @staticmethod
+    def with_custom_fields(asset):
+        out = dict(asset)
+        out["custom_fields"] = [
+            {"name": "Cost Center", "value": f"CC-{asset['id'] % 37:03d}"},
+            {"name": "Warranty Expiry", "value": asset["purchased_on"]},
+        ]
+        return out
+
+
+class _RateLimiter:
+    """Fixed one-second window; 0 disables."""
+
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if not self.per_second:
+            return True
+        now = int(time.monotonic())
+        with self._lock:
+            if now != self._window:
+                self._window, self._count = now, 0
+            self._count += 1
+            return self._count <= self.per_second
+
+
+class FakeServices(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, catalog, latency=0.0, rate_limit=0):
+        super().__init__(addr, _Handler)
+        self.catalog = catalog
+        self.latency = latency
+        self.limiter = _RateLimiter(rate_limit)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self.events = deque(maxlen=200000)
+        self._file_seq = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def record(self, method, args):
+        with self.stats_lock:
+            self.events.append({
+                "t": time.time(),
+                "method": method,
+                "channel": args.get("channel"),
+                "thread_ts": args.get("thread_ts"),
+                "text": args.get("text"),
+            })
+
+    def next_file_id(self):
+        with self.stats_lock:
+            self._file_seq += 1
+            return f"F{self._file_seq:08d}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    # --- plumbing ---
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def _route(self, method):
+        url = urlparse(self.path)
+        path = url.path.strip("/")
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        srv = self.server
+
+        if path == "_stats":
+            with srv.stats_lock:
+                return self._send(200, dict(srv.stats))
+        if path == "_reset":
+            with srv.stats_lock:
+                srv.stats.clear()
+                srv.events.clear()
+            return self._send(200, {"ok": True})
+        if path == "_events":
+            since = float(params.get("since") or 0)
+            with srv.stats_lock:
+                return self._send(200, [e for e in srv.events if e["t"] > since])
+
+        body = self._body() if method == "POST" else b""
+        if srv.latency:
+            time.sleep(srv.latency)
+
+        if path.startswith("api/"):
+            srv.count("slack:" + path[4:])
+            return self._slack(path[4:], body, params)
+        if path.startswith("upload/"):
+            srv.count("slack:upload")
+            return self._send(200, {"ok": True})
+        if path.startswith("v1/"):
+            srv.count("openai:" + path[3:])
+            return self._openai(body)
+
+        endpoint = re.sub(r"/\d+\.api$", "/:id.api", path)
+        srv.count("assetsonar:" + endpoint)
+        if not srv.limiter.allow():
+            srv.count("assetsonar:429")
+            return self._send(429, {"error": "rate limited"}, {"Retry-After": "1"})
+        return self._assetsonar(path, params)
+
+    # --- AssetSonar ---
+    def _assetsonar(self, path, params):
+        cat = self.server.catalog
+        page = max(1, int(params.get("page") or 1))
+        with_cf = params.get("include_custom_fields") == "true"
+
+        def _page(rows, size):
+            chunk = rows[(page - 1) * size: page * size]
+            return [cat.with_custom_fields(a) for a in chunk] if with_cf else chunk
+
+        if path == "assets.api":
+            size = int(params.get("limit") or 25)
+            total_pages = max(1, -(-len(cat.assets) // size))
+            return self._send(200, {"assets": _page(cat.assets, size), "total_pages": total_pages,
+                                    "total_count": len(cat.assets)})
+
+        if path == "members.api":
+            members = cat.members
+            if params.get("filter") == "email":
+                wanted = (params.get("filter_val") or "").lower()
+                members = [m for m in members if m["email"].lower() == wanted]
+            chunk = members[(page - 1) * MEMBERS_PAGE: page * MEMBERS_PAGE]
+            return self._send(200, chunk)
+
+        if path == "search.api":
+            q = (params.get("search") or "").lower()
+            hits = [a for a in cat.assets
+                    if q and (q == a["identifier"].lower() or q == a["bios_serial_number"].lower())]
+            return self._send(200, {"assets": _page(hits, FILTER_PAGE)})
+
+        if path == "assets/filter.api" and params.get("status") == "possessions_of":
+            rows = cat.by_user.get(int(params.get("filter_param_val") or 0), [])
+            return self._send(200, {"assets": _page(rows, FILTER_PAGE)})
+
+        if path == "software_licenses/filter.api":
+            days = int(params.get("filter_param_val") or 30)
+            cutoff = (date.today() + timedelta(days=days)).isoformat()
+            rows = [lic for lic in cat.licenses if lic["end_date"] <= cutoff]
+            size = int(params.get("limit") or 25)
+            return self._send(200, {"licenses": rows[(page - 1) * size: page * size]})
+
+        m = re.fullmatch(r"assets/(\d+)\.api", path)
+        if m and int(m.group(1)) in cat.by_id:
+            return self._send(200, {"asset": cat.with_custom_fields(cat.by_id[int(m.group(1))])})
+
+        return self._send(404, {"error": f"unknown endpoint {path}"})
+
+    # --- Slack ---
+    def _slack(self, method, body, params):
+        ts = f"{time.time():.6f}"
+        if method.startswith("chat."):
+            self.server.record(method, _slack_args(body))
+        if method == "auth.test":
+            return self._send(200, {"ok": True, "user_id": "UFAKEBOT", "bot_id": "BFAKE", "team_id": "TFAKE"})
+        if method == "users.info":
+            user = params.get("user") or _slack_args(body).get("user") or ""
+            m = re.fullmatch(r"UM(\d+)", user)
+            member = self.server.catalog.members_by_id.get(int(m.group(1))) if m else None
+            if member is None:
+                return self._send(200, {"ok": False, "error": "user_not_found"})
+            return self._send(200, {"ok": True, "user": {"id": user, "profile": {"email": member["email"]}}})
+        if method == "files.getUploadURLExternal":
+            fid = self.server.next_file_id()
+            return self._send(200, {"ok": True, "file_id": fid, "upload_url": f"{self.server.base_url}/upload/{fid}"})
+        if method == "files.completeUploadExternal":
+            files = []
+            try:
+                form = parse_qs(body.decode())
+                files = json.loads(form.get("files", ["[]"])[0])
+            except ValueError:
+                pass
+            if not files:
+                try:
+                    files = json.loads(body or b"{}").get("files", [])
+                except ValueError:
+                    files = []
+            if not files and params.get("files"):
+                # AsyncWebClient sends these arguments in the query string
+                files = json.loads(params["files"])
+            out = [{"id": f.get("id"), "title": f.get("title"),
+                    "permalink": f"{self.server.base_url}/files/{f.get('id')}"} for f in files]
+            return self._send(200, {"ok": True, "files": out})
+        return self._send(200, {"ok": True, "channel": "CFAKE", "ts": ts, "message": {"ts": ts}})
+
+    # --- OpenAI ---
+    def _openai(self, body):
+        try:
+            req = json.loads(body or b"{}")
+            text = req.get("messages", [{}])[-1].get("content", "")
+        except ValueError:
+            text = ""
+        # intent._gpt_request wraps the query as "User query: ...\nReturn intent JSON only."
+        m = re.search(r"User query:\s*(.*)", text)
+        if m:
+            text = m.group(1)
+        years = re.search(r"(\d+)\s*(?:years?|yrs?|年)", text)
+        if years and re.search(r"laptop|notebook|筆電", text, re.I):
+            intent = {"intent": "old_laptops", "years": int(years.group(1))}
+        elif years:
+            intent = {"intent": "age_assets", "years": int(years.group(1))}
+        else:
+            intent = {"intent": "user_or_asset_lookup", "query": text.strip()}
+        intent["fields"] = ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"]
+        return self._send(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "fake") if isinstance(req, dict) else "fake",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(intent)}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+def _slack_args(body):
+    """slack_sdk sends chat.* as JSON and most other methods form-encoded."""
+    try:
+        args = json.loads(body or b"{}")
+        if isinstance(args, dict):
+            return args
+    except ValueError:
+        pass
+    return {k: v[-1] for k, v in parse_qs(body.decode(errors="replace")).items()}
+
+
+def start(n_assets=1000, port=0, latency=0.0, rate_limit=0, seed=1, host="127.0.0.1"):
+    """Serve in a daemon thread; returns the server (server.base_url, server.shutdown())."""
+    server = FakeServices((host, port), FakeCatalog(n_assets, seed=seed), latency=latency, rate_limit=rate_limit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--assets", type=int, default=1000)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=int, default=0, help="AssetSonar requests/second before 429 (0 = off)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    catalog = FakeCatalog(args.assets, seed=args.seed)
+    server = FakeServices((args.host, args.port), catalog, latency=args.latency_ms / 1000.0,
+                          rate_limit=args.rate_limit)
+    print(f"fake services on {server.base_url}: {len(catalog.assets)} assets, {len(catalog.members)} members",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Requested-field planning.
+
+Intent `fields` are either built-in asset attributes (always in the plain
+payload) or AssetSonar custom field names, which are only returned with
+include_custom_fields=true. Handlers first pass the parsed fields through
+resolve() with the account's custom field names (assetsonar.custom_field_names),
+so a name GPT made up ("purchase_date") is dropped rather than costing a
+per-row custom field fetch. The data layer then asks needs_custom_fields()
+before requesting the heavier payload, and formatting lays out asset rows
+and their CSV header from columns().
+"""
+
+# intent field -> asset payload key
+BUILTIN_FIELDS = {
+    "asset_name": "name",
+    "ain": "identifier",
+    "serial_number": "bios_serial_number",
+    "purchased_on": "purchased_on",
+    "assigned_to_user_name": "assigned_to_user_name",
+    "assigned_to_user_email": "assigned_to_user_email",
+    # other attributes of the plain payload users (and GPT) ask for by name
+    "name": "name",
+    "identifier": "identifier",
+    "bios_serial_number": "bios_serial_number",
+    "location": "location_name",
+    "location_name": "location_name",
+    "group": "group_name",
+    "group_name": "group_name",
+    "status": "status",
+}
+# the columns format_assets_list has always shown, in this order; the
+# assignee is one field but two columns (name, email)
+STANDARD_COLUMNS = (
+    ("asset_name", "name"),
+    ("ain", "identifier"),
+    ("serial_number", "bios_serial_number"),
+    ("purchased_on", "purchased_on"),
+)
+ASSIGNEE_FIELDS = ("assigned_to_user_name", "assigned_to_user_email")
+
+
+def builtin_key(field):
+    """Payload key of a built-in field ("Location" / "location_name" -> "location_name"), else None."""
+    return BUILTIN_FIELDS.get(str(field).strip().lower().replace(" ", "_"))
+
+
+def resolve(fields, custom_names):
+    """
+    Built-in fields as given, custom fields spelled as the account names them
+    (case-insensitive match against custom_names); anything else is dropped.
+    """
+    if not fields:
+        return fields
+    known = {str(n).strip().lower(): n for n in custom_names or ()}
+    out = []
+    for f in fields:
+        if builtin_key(f) is not None:
+            out.append(f)
+        elif str(f).strip().lower() in known:
+            out.append(known[str(f).strip().lower()])
+    return out
+
+
+def custom_fields_of(fields):
+    """Requested fields that are not built-in, i.e. custom field names."""
+    return [f for f in (fields or []) if builtin_key(f) is None]
+
+
+def columns(fields):
+    """
+    [(header, payload key)] for every column of an asset row, in row order:
+    the standard columns, other built-ins as requested, then custom fields
+    (payload key None; read with custom_field_value).
+    """
+    fields = fields or []
+    cols = [(f, key) for f, key in STANDARD_COLUMNS if f in fields]
+    if any(f in fields for f in ASSIGNEE_FIELDS):
+        cols += [(f, f) for f in ASSIGNEE_FIELDS]
+    seen = {key for _, key in cols}
+    for f in fields:
+        key = builtin_key(f)
+        if key is not None and key not in seen:
+            seen.add(key)
+            cols.append((f, key))
+    return cols + [(f, None) for f in custom_fields_of(fields)]
+
+
+def column_value(asset, column):
+    header, key = column
+    return asset.get(key) if key is not None else custom_field_value(asset, header)
+
+
+def needs_custom_fields(fields) -> bool:
+    return bool(custom_fields_of(fields))
+
+
+def has_custom_fields(asset) -> bool:
+    return "custom_fields" in asset
+
+
+def custom_field_value(asset, field):
+    """Value of a custom field by name (case-insensitive), or None."""
+    wanted = field.strip().lower()
+    cf = asset.get("custom_fields")
+    if isinstance(cf, dict):
+        for k, v in cf.items():
+            if str(k).lower() == wanted:
+                return v
+        return None
+    for item in cf or []:
+        if isinstance(item, dict) and str(item.get("name", "")).lower() == wanted:
+            return item.get("value")
+    return None
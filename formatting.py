@@ -1,10 +1,14 @@
 from typing import List, Dict
 import csv
+import json
 import tempfile
 import os
 from datetime import datetime
 from dateutil import parser as dtparser
 
+import metrics as M
+import fields as FL
+
 
 def parse_date(value: str):
     if not value:
@@ -16,15 +20,32 @@ def parse_date(value: str):
 
 
 def write_csv(headers: List[str], rows: List[List[str]], prefix="report"):
-    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".csv")
-    os.close(fd)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(rows)
+    with M.span("csv_write"):
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=".csv")
+        os.close(fd)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
     return path
 
 
+def debug_olddevices_rows(assets: List[Dict], cutoff):
+    """Rows for the `debug olddevices` CSV: vendor-named devices with raw + parsed purchase date."""
+    rows = []
+    for a in assets:
+        name = (a.get("name") or "")
+        pd_raw = a.get("purchased_on")
+        pd = parse_date(pd_raw)
+        if any(b in name.lower() for b in ["apple", "lenovo", "dell", "hp"]):
+            rows.append([name, pd_raw or "-", str(pd or "-"), str(cutoff)])
+    return rows
+
+
+DEBUG_OLDDEVICES_HEADERS = ["Asset Name", "Purchased On (raw)", "Parsed", "Cutoff"]
+
+
+@M.timed("format")
 def format_assets_list(title: str, assets: List[Dict], fields=None):
     default_fields = ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"]
     fields = fields or default_fields
@@ -34,31 +55,25 @@ def format_assets_list(title: str, assets: List[Dict], fields=None):
     if not assets:
         return [header, {"type": "section", "text": {"type": "mrkdwn", "text": "No assets found."}}], None
 
-    rows = []
-    for a in assets:
-        row = []
-        if "asset_name" in fields:
-            row.append(a.get("name"))
-        if "ain" in fields:
-            row.append(a.get("identifier"))
-        if "serial_number" in fields:
-            row.append(a.get("bios_serial_number"))
-        if "purchased_on" in fields:
-            row.append(a.get("purchased_on"))
-        if "assigned_to_user_name" in fields or "assigned_to_user_email" in fields:
-            row.append(a.get("assigned_to_user_name"))
-            row.append(a.get("assigned_to_user_email"))
-        rows.append(row)
+    # header and rows from the same column list, so they cannot drift apart
+    cols = FL.columns(fields)
+    rows = [[FL.column_value(a, c) for c in cols] for a in assets]
 
     if count > 10:
-        csv_path = write_csv(fields, rows, prefix="assets")
+        csv_path = write_csv([h for h, _ in cols], rows, prefix="assets")
         blocks = [
             header,
             {"type": "section", "text": {"type": "mrkdwn", "text": "⚠️ Too many results. CSV uploaded."}}
         ]
         return blocks, csv_path
 
-    blocks = [header, {"type": "divider"}]
+    return [header, {"type": "divider"}] + _asset_sections(assets, fields), None
+
+
+def _asset_sections(assets: List[Dict], fields):
+    blocks = []
+    standard = {h for h, _ in FL.STANDARD_COLUMNS} | set(FL.ASSIGNEE_FIELDS)
+    extras = [c for c in FL.columns(fields) if c[0] not in standard]
     for a in assets:
         desc_parts = []
         if "asset_name" in fields:
@@ -73,12 +88,25 @@ def format_assets_list(title: str, assets: List[Dict], fields=None):
             desc_parts.append(
                 f"*Assigned To*: {a.get('assigned_to_user_name') or '-'} ({a.get('assigned_to_user_email') or '-'})"
             )
+        for col in extras:
+            desc_parts.append(f"*{col[0]}*: {FL.column_value(a, col) or '-'}")
         desc = "\n".join(desc_parts)
         blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": desc}})
         blocks.append({"type": "divider"})
-    return blocks, None
+    return blocks
 
 
+def format_first_screen(title: str, assets: List[Dict], fields=None):
+    """
+    First screen of matches posted while a long scan is still running.
+    """
+    fields = fields or ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"]
+    header = {"type": "section", "text": {"type": "mrkdwn",
+              "text": f"*{title}* (first {len(assets)} matches, still scanning…)"}}
+    return [header, {"type": "divider"}] + _asset_sections(assets, fields)
+
+
+@M.timed("format")
 def format_licenses_expiring(days: int, items: List[Dict]):
     count = len(items or [])
     header = {"type": "section", "text": {"type": "mrkdwn", "text": f":warning: *{count} licenses expiring within {days} days*"}}
@@ -115,9 +143,128 @@ def format_licenses_expiring(days: int, items: List[Dict]):
         blocks.append({"type": "divider"})
     return blocks, None
 
+CHANGES_HEADERS = ["Change", "Asset ID", "AIN", "Asset Name", "Fields Changed",
+                   "Assigned To (before)", "Assigned To (after)", "Location (before)", "Location (after)",
+                   "Status (before)", "Status (after)"]
+
+
+def _change_line(c):
+    a = c["after"] or c["before"]
+    what = ", ".join(c["kind"])
+    if "reassigned" in c["kind"]:
+        what += f": {(c['before'] or {}).get('assigned_to_user_name') or '-'} → {(c['after'] or {}).get('assigned_to_user_name') or '-'}"
+    elif c["fields"]:
+        what += f" ({', '.join(c['fields'])})"
+    return f"• `{a.get('identifier') or c['id']}` {a.get('name') or ''}: {what}"
+
+
+@M.timed("format")
+def format_changes(title: str, report: Dict):
+    """Blocks + CSV for a snapshots.changes_since() report."""
+    changes = report.get("changes") or []
+    counts = {}
+    for c in changes:
+        for k in c["kind"]:
+            counts[k] = counts.get(k, 0) + 1
+    summary = ", ".join(f"{n} {k}" for k, n in sorted(counts.items(), key=lambda kv: -kv[1])) or "no changes"
+    header = {"type": "section", "text": {"type": "mrkdwn",
+              "text": f"*{title}* ({summary}; {report.get('snapshots', 0)} snapshots)"}}
+    if not changes:
+        return [header], None
+
+    rows = []
+    for c in changes:
+        b, a = c["before"] or {}, c["after"] or {}
+        cur = a or b
+        rows.append([
+            "/".join(c["kind"]), c["id"], cur.get("identifier"), cur.get("name"), " ".join(c["fields"]),
+            b.get("assigned_to_user_email"), a.get("assigned_to_user_email"),
+            b.get("location_name"), a.get("location_name"),
+            b.get("status"), a.get("status"),
+        ])
+    csv_path = write_csv(CHANGES_HEADERS, rows, prefix="changes")
+    lines = [_change_line(c) for c in changes[:10]]
+    if len(changes) > 10:
+        lines.append(f"…and {len(changes) - 10} more in the CSV.")
+    return [header, {"type": "divider"},
+            {"type": "section", "text": {"type": "mrkdwn", "text": "\n".join(lines)}}], csv_path
+
+
 def format_old_laptops(years: int, items: list, fields=None):
     """
     Format laptops older than N years into Slack blocks + CSV.
     """
     title = f"Laptops older than {years} years"
-    return format_assets_list(title, items, fields=fields)
\ No newline at end of file
+    return format_assets_list(title, items, fields=fields)
+
+
+def member_picker_blocks(query: str, candidates: List[Dict], channel_id: str, thread_ts: str):
+    """
+    Disambiguation picker (name + email only) for the pick_member_for_assets action.
+    """
+    options = []
+    for c in candidates:
+        full_name = ("{} {}".format(c.get("first_name") or "", c.get("last_name") or "")).strip() or "(no name)"
+        label = full_name + (f" — {c.get('email')}" if c.get("email") else "")
+        # ✅ Pass channel_id & thread_ts into value to avoid reading Slack body later
+        value = json.dumps({
+            "uid": c["id"],
+            "name": full_name,
+            "email": c.get("email"),
+            "channel_id": channel_id,
+            "thread_ts": thread_ts,
+        })
+        options.append({
+            "text": {"type": "plain_text", "text": label[:75]},
+            "value": value
+        })
+
+    return [
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": f"Found multiple matches for *{query}*. Please choose the correct person (name + email only):"}
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "static_select",
+                    "action_id": "pick_member_for_assets",
+                    "placeholder": {"type": "plain_text", "text": "Choose a person"},
+                    "options": options
+                }
+            ]
+        }
+    ]
+
+
+def truncated_notice_blocks(exc, continue_value: str):
+    """'Truncated' notice + 'Continue in background' button for a DeadlineExceeded."""
+    if exc.total_pages:
+        where = f" after page {exc.pages_done}/{exc.total_pages}"
+    elif exc.pages_done:
+        where = f" after {exc.pages_done} page(s)"
+    else:
+        where = ""
+    return [
+        {"type": "section", "text": {"type": "mrkdwn",
+         "text": f":hourglass: *Truncated*: the time budget ran out during `{exc.stage}`{where}. "
+                 f"Results above are partial."}},
+        {"type": "actions", "elements": [{
+            "type": "button",
+            "action_id": "continue_in_background",
+            "text": {"type": "plain_text", "text": "Continue in background"},
+            "value": continue_value,
+        }]},
+    ]
+
+
+def format_partial(exc, text: str, intent_data: Dict, fields, channel_id: str):
+    """Blocks/CSV for the rows a DeadlineExceeded carried out, plus the truncated notice."""
+    rows = exc.partial or []
+    if (intent_data or {}).get("intent") == "license_expiry":
+        blocks, csv_path = format_licenses_expiring(int(intent_data.get("days", 30)), rows)
+    else:
+        blocks, csv_path = format_assets_list(f"Partial results for your query: {text}", rows, fields=fields)
+    value = json.dumps({"text": text, "channel_id": channel_id})
+    return blocks + truncated_notice_blocks(exc, value), csv_path
@@ -0,0 +1,92 @@
+"""
+Lookup cache for AIN / serial quick searches.
+
+find_user_assets used to ask search.api for every AIN or serial and, when
+that came back empty, page through all of assets.api, so a serial that does
+not exist cost the most expensive scan the bot has, every time it was asked.
+Results are now kept per normalized identifier: hits for HIT_TTL seconds,
+confirmed misses (the scan, or the catalog snapshot, found nothing) for the
+much shorter MISS_TTL so a newly registered asset shows up soon. With a
+catalog snapshot installed the exact identifier/serial index answers before
+the API is asked at all. AssetSonar webhooks (webhooks.py) drop the entries
+a changed asset affects.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+HIT_TTL = config.ID_CACHE_HIT_TTL
+MISS_TTL = config.ID_CACHE_MISS_TTL
+MAX_ENTRIES = 4096
+
+
+def normalize(query):
+    return (query or "").strip().upper()
+
+
+class LookupCache:
+    """normalized identifier -> assets list ([] = confirmed miss), LRU-bounded."""
+
+    def __init__(self, hit_ttl=HIT_TTL, miss_ttl=MISS_TTL, max_entries=MAX_ENTRIES, clock=time.monotonic):
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        """Cached assets (possibly [] for a known miss), or None when unknown/expired."""
+        key = normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            assets, expires_at = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return assets
+
+    def put(self, query, assets):
+        key = normalize(query)
+        if not key:
+            return
+        assets = list(assets or [])
+        ttl = self.hit_ttl if assets else self.miss_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (assets, self.clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_asset(self, asset_id=None, identifiers=()):
+        """
+        Drop what a change to one asset can make wrong: entries keyed by its
+        (old or new) AIN/serial, entries that contain it, and every miss.
+        """
+        keys = {normalize(i) for i in identifiers if i}
+        with self._lock:
+            stale = [
+                k for k, (assets, _) in self._entries.items()
+                if k in keys or not assets
+                or (asset_id is not None and any(a.get("id") == asset_id for a in assets))
+            ]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+CACHE = LookupCache()
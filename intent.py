@@ -1,9 +1,13 @@
-import os
 import json
-from openai import OpenAI
 import re
 
-print("DEBUG intent.py loaded from:", __file__)
+import config
+
+import deadline as DL
+import log
+import metrics as M
+
+slog = log.get_logger("intent")
 
 # --- 新增：Email 偵測與強制規則 ---
 EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
@@ -26,21 +30,43 @@ def _forced_email_intent(email: str):
 
 KEYWORDS_LICENSE = ["license", "licenses", "授權", "到期"]
 
-def parse_intent(text: str):
+DEFAULT_FIELDS = ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"]
+
+VENDOR_RE = re.compile(r"\b(apple|lenovo|dell|hp)\b", re.I)
+YEARS_RE = re.compile(r"(?:older than|over|more than|>)\s*(\d+)\s*(?:years?|yrs?|y\b)|(\d+)\s*年以上", re.I)
+IN_LOCATION_RE = re.compile(r"\b(?:in|at|@)\s+([A-Z]{2})\b")
+KIND_RE = re.compile(r"\b(laptop|notebook|macbook|desktop)s?\b|(筆電)", re.I)
+
+def _compound_slots(cleaned: str):
+    """抽出 query planner 可用的欄位 (vendor/years/location/device_kind)"""
+    slots = {}
+    m = VENDOR_RE.search(cleaned)
+    if m:
+        slots["vendor"] = m.group(1).lower()
+    m = YEARS_RE.search(cleaned)
+    if m:
+        slots["min_years"] = int(m.group(1) or m.group(2))
+    m = IN_LOCATION_RE.search(cleaned)
+    if m:
+        slots["location"] = m.group(1)
+    m = KIND_RE.search(cleaned)
+    if m:
+        slots["device_kind"] = (m.group(1) or "laptop").lower()
+    return slots
+
+def _rule_intent(text: str):
+    """強制規則（Email / license / location）；沒命中則回傳 None 交給 GPT"""
     # 清理 Slack 可能加的 Markdown 標記
     cleaned = text.strip("*_`")
     text_lower = cleaned.lower()
-    print("DEBUG cleaned text:", text_lower)
+    slog.debug("cleaned_text", text=text_lower)
 
     # --- 強制規則：Email ---
     m = EMAIL_RE.search(text or "")
     if m:
         email = m.group(0)
         intent = _forced_email_intent(email)
-        try:
-            print("DEBUG intent (forced email):", intent)
-        except Exception:
-            pass
+        slog.debug("intent", source="forced_email", intent=intent)
         return intent
 
     # --- 強制規則 ---
@@ -54,7 +80,20 @@ def parse_intent(text: str):
             "days": days,
             "fields": ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"],
         }
-        print("DEBUG intent (forced license):", intent)
+        slog.debug("intent", source="forced_license", intent=intent)
+        return intent
+
+    # --- 強制規則：複合查詢（vendor / 年份 / 地點 / 機種 兩個以上）---
+    slots = _compound_slots(cleaned)
+    if len(slots) >= 2:
+        if slots.get("device_kind") == "laptop" and "min_years" in slots:
+            # "laptops older than 3 years" (+ vendor / 地點) 維持 old_laptops 的機種與預設 vendor
+            slots.pop("device_kind")
+            slots["years"] = slots.pop("min_years")
+            intent = {"intent": "old_laptops", "fields": DEFAULT_FIELDS, **slots}
+        else:
+            intent = {"intent": "asset_query", "fields": DEFAULT_FIELDS, **slots}
+        slog.debug("intent", source="forced_compound", intent=intent)
         return intent
 
     # --- 強制規則 for location ---
@@ -66,22 +105,19 @@ def parse_intent(text: str):
             "location": loc,
             "fields": ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"],
         }
-        print("DEBUG intent (forced location):", intent)
+        slog.debug("intent", source="forced_location", intent=intent)
         return intent
 
-    # --- 需要 GPT 的情況才初始化 client ---
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("⚠️ WARNING: OPENAI_API_KEY not set, fallback to user_or_asset_lookup")
-        return {
-            "intent": "user_or_asset_lookup",
-            "query": text,
-            "fields": ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"],
-        }
+    return None
 
-    client = OpenAI(api_key=api_key)
+def _fallback_intent(text: str):
+    return {
+        "intent": "user_or_asset_lookup",
+        "query": text,
+        "fields": DEFAULT_FIELDS,
+    }
 
-    system_prompt = """You are an intent parser for an IT asset management bot.
+SYSTEM_PROMPT = """You are an intent parser for an IT asset management bot.
 The user may type queries in Chinese, English, or mixed.
 Always normalize into structured JSON in English.
 
@@ -93,6 +129,7 @@ Supported intents:
 - group_assets
 - vendor_assets
 - age_assets
+- asset_query (compound filters, e.g. "Lenovo laptops older than 3 years in SG")
 
 Fields you may extract:
 - query: for user_or_asset_lookup
@@ -101,7 +138,14 @@ Fields you may extract:
 - location: for location_assets
 - group: for group_assets (Mac/Windows)
 - vendor: for vendor_assets
-- fields: list of requested fields
+- min_years / max_years: purchase-age range in years (integers)
+- assignee: email or name the asset is assigned to
+- status: asset status
+- device_kind: laptop / desktop / notebook / macbook
+- fields: list of requested fields; besides the defaults, AssetSonar custom field
+  names may be listed as the user wrote them (e.g. "Warranty Expiry")
+Any asset intent may carry several of vendor, group, location, min_years, max_years,
+assignee, status and device_kind at once; they are combined with AND.
 
 Rules:
 1. Always return valid JSON only.
@@ -109,25 +153,91 @@ Rules:
 3. If parsing fails, fallback to {"intent":"user_or_asset_lookup","query":<text>}.
 """
 
-    user_prompt = f"User query: {text}\nReturn intent JSON only."
+GPT_TIMEOUT = 20
+
+def _gpt_request(text: str):
+    # out of budget -> raise here and let the caller fall back to a plain lookup
+    DL.check("gpt", DL.MIN_REQUEST_SECONDS)
+    return dict(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"User query: {text}\nReturn intent JSON only."},
+        ],
+        temperature=0,
+        timeout=DL.clamp(GPT_TIMEOUT),
+    )
+
+# the OpenAI SDK is most of our import time and only GPT fallbacks need it
+_client = None
+_async_client = None
+
+def _openai_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=config.OPENAI_API_KEY)
+    return _client
+
+def _async_openai_client():
+    global _async_client
+    if _async_client is None:
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+    return _async_client
+
+def _without_gpt(text: str):
+    """Rule-based intent, or the plain lookup when there is no OpenAI key; None = ask GPT."""
+    intent = _rule_intent(text)
+    if intent:
+        M.INTENTS.inc(intent=intent.get("intent"), source="rule")
+        return intent
 
+    if not config.OPENAI_API_KEY:
+        slog.warning("openai_key_missing", fallback="user_or_asset_lookup")
+        M.INTENTS.inc(intent="user_or_asset_lookup", source="fallback")
+        return _fallback_intent(text)
+    return None
+
+def _from_gpt(text: str, response):
+    """Intent from a chat completion; `response` is the exception when the call failed."""
+    source = "gpt"
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0,
-        )
+        if isinstance(response, Exception):
+            raise response
         intent = json.loads(response.choices[0].message.content.strip())
     except Exception as e:
-        print("DEBUG intent (GPT error):", e)
-        intent = {
-            "intent": "user_or_asset_lookup",
-            "query": text,
-            "fields": ["asset_name", "ain", "serial_number", "purchased_on", "assigned_to_user_name"],
-        }
+        slog.warning("gpt_failed", error=str(e))
+        intent, source = _fallback_intent(text), "fallback"
+
+    slog.info("intent", source=source, intent=intent)
+    M.INTENTS.inc(intent=intent.get("intent"), source=source)
+    return intent
+
+def parse_intent(text: str):
+    with M.span("intent_parse"):
+        intent = _without_gpt(text)
+        if intent is not None:
+            return intent
 
-    print("DEBUG intent (GPT):", intent)
-    return intent
\ No newline at end of file
+        # --- 需要 GPT 的情況才初始化 client ---
+        try:
+            with M.span("gpt"):
+                response = _openai_client().chat.completions.create(**_gpt_request(text))
+        except Exception as e:
+            response = e
+        return _from_gpt(text, response)
+
+async def parse_intent_async(text: str):
+    """Same as parse_intent, but the GPT fallback goes through AsyncOpenAI."""
+    with M.span("intent_parse"):
+        intent = _without_gpt(text)
+        if intent is not None:
+            return intent
+
+        try:
+            with M.span("gpt"):
+                response = await _async_openai_client().chat.completions.create(**_gpt_request(text))
+        except Exception as e:
+            response = e
+        return _from_gpt(text, response)
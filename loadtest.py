@@ -0,0 +1,277 @@
+"""
+Load generator for the sync deployment's /slack/events endpoint.
+
+    python loadtest.py --spawn gunicorn --workers 2 --threads 8 --steps 1,4,8,16,32 --duration 20
+    python loadtest.py --target http://127.0.0.1:3000/slack/events --fake http://127.0.0.1:8765
+
+Sends correctly signed /asset slash commands and pick_member_for_assets block
+actions (mix set by --mix, texts from bench_e2e.CASES) at each concurrency
+step, optionally capped to --rate requests/second overall. With --spawn it
+starts fake_services.py and the bot (gunicorn app:flask_app, or server.py's
+threaded Flask) pointed at it; otherwise both must already be running with
+the same SLACK_SIGNING_SECRET.
+
+Per step it reports ack latency (HTTP response to Slack), completion latency
+(send -> the bot's final chat.* call, read from the fake Slack's /_events),
+HTTP and handler error rates, and marks the first step where acks miss
+Slack's 3 s deadline, errors exceed 1 % or work stops completing as the
+saturation point.
+"""
+import argparse
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+
+from bench_e2e import CASES, _samples, _start_fake
+
+ACK_DEADLINE = 3.0
+DEFAULT_MIX = "email=3,ain=2,serial=1,license_expiry=1,location=1,name=1,pick=1"
+# first text of a finished command / action (see handle_asset_command and the pick action)
+DONE_PREFIXES = ("✅", ":x:", "🔎", "Found ", "No assets found", "Sorry,")
+FAILED_PREFIXES = (":x:", "Sorry,")
+
+
+def sign(secret, timestamp, body):
+    base = f"v0:{timestamp}:{body}".encode()
+    return "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+
+
+def slash_command(text, channel_id, n):
+    return urlencode({
+        "token": "fake",
+        "team_id": "TFAKE",
+        "channel_id": channel_id,
+        "user_id": f"ULOAD{n % 50:03d}",
+        "command": "/asset",
+        "text": text,
+        "trigger_id": f"lt.{n}.{time.time():.6f}",
+        "response_url": "https://hooks.slack.invalid/commands/lt",
+    })
+
+
+def block_action(member, channel_id, n):
+    value = {"uid": member["id"], "name": f"{member['first_name']} {member['last_name']}",
+             "email": member["email"], "channel_id": channel_id, "thread_ts": "1.000000"}
+    payload = {
+        "type": "block_actions",
+        "team": {"id": "TFAKE"},
+        "user": {"id": f"ULOAD{n % 50:03d}"},
+        "api_app_id": "AFAKE",
+        "token": "fake",
+        "trigger_id": f"lt.{n}.{time.time():.6f}",
+        "channel": {"id": channel_id},
+        "container": {"type": "message", "channel_id": channel_id, "message_ts": "1.000000"},
+        "response_url": "https://hooks.slack.invalid/actions/lt",
+        "actions": [{
+            "type": "static_select",
+            "action_id": "pick_member_for_assets",
+            "block_id": "pick",
+            "selected_option": {"text": {"type": "plain_text", "text": value["name"]}, "value": json.dumps(value)},
+            "action_ts": f"{time.time():.6f}",
+        }],
+    }
+    return urlencode({"payload": json.dumps(payload)})
+
+
+class _Pacer:
+    """Shared start-time spacing for an overall request rate (None = unpaced)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+def _pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_step(args, concurrency, mix, samples, members, counter):
+    sent = []
+    lock = threading.Lock()
+    pacer = _Pacer(args.rate)
+    step_start = time.time()
+    stop = time.monotonic() + args.duration
+
+    def user(_):
+        session = requests.Session()
+        while time.monotonic() < stop:
+            pacer.wait()
+            with lock:
+                n = next(counter)
+            kind = mix[n % len(mix)]
+            channel = f"CLT{n:07d}"
+            if kind == "pick":
+                body = block_action(members[n % len(members)], channel, n)
+            else:
+                body = slash_command(dict(CASES)[kind].format(**samples), channel, n)
+            ts = str(int(time.time()))
+            headers = {
+                "Content-Type": "application/x-www-form-urlencoded",
+                "X-Slack-Request-Timestamp": ts,
+                "X-Slack-Signature": sign(args.secret, ts, body),
+            }
+            t0 = time.time()
+            try:
+                status = session.post(args.target, data=body, headers=headers, timeout=args.timeout).status_code
+            except requests.RequestException:
+                status = "timeout"
+            with lock:
+                sent.append({"kind": kind, "channel": channel, "sent": t0, "ack": time.time() - t0, "status": status})
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # drain: wait for the bot to finish what it acknowledged
+    pending = {r["channel"]: r for r in sent if r["status"] == 200}
+    done = {}
+    deadline = time.monotonic() + args.drain
+    while pending and time.monotonic() < deadline:
+        for e in requests.get(f"{args.fake}/_events", params={"since": step_start}).json():
+            r = pending.get(e.get("channel"))
+            if r and str(e.get("text") or "").startswith(DONE_PREFIXES):
+                done[r["channel"]] = (e["t"] - r["sent"], str(e["text"]).startswith(FAILED_PREFIXES))
+                del pending[r["channel"]]
+        time.sleep(0.5)
+
+    acks = [r["ack"] for r in sent]
+    http_errors = sum(1 for r in sent if r["status"] != 200)
+    completions = [c for c, _ in done.values()]
+    failed = sum(1 for _, f in done.values() if f)
+    elapsed = max(time.time() - step_start, 1e-6)
+    return {
+        "concurrency": concurrency,
+        "sent": len(sent),
+        "rps": len(sent) / args.duration,
+        "ack_p50": _pct(acks, 0.50),
+        "ack_p95": _pct(acks, 0.95),
+        "ack_max": max(acks) if acks else float("nan"),
+        "ack_late": sum(1 for a in acks if a > ACK_DEADLINE),
+        "http_errors": http_errors,
+        "completed": len(done),
+        "incomplete": len(pending),
+        "handler_errors": failed,
+        "done_p50": _pct(completions, 0.50),
+        "done_p95": _pct(completions, 0.95),
+        "throughput": len(done) / elapsed,
+    }
+
+
+def saturated(r):
+    n = max(r["sent"], 1)
+    return r["ack_p95"] > ACK_DEADLINE or (r["http_errors"] + r["handler_errors"]) / n > 0.01 or r["incomplete"] > 0
+
+
+def _wait_http(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up")
+
+
+def spawn(args):
+    """Start fake services + the bot; returns the processes to stop afterwards."""
+    fake, args.fake = _start_fake(args.assets, args.latency_ms, args.rate_limit)
+    env = dict(
+        os.environ,
+        AS_BASE_URL=args.fake,
+        SLACK_API_URL=f"{args.fake}/api/",
+        OPENAI_BASE_URL=f"{args.fake}/v1",
+        OPENAI_API_KEY="sk-fake",
+        SLACK_BOT_TOKEN="xoxb-fake",
+        SLACK_SIGNING_SECRET=args.secret,
+        LOG_LEVEL="WARNING",
+        PORT=str(args.port),
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    if args.spawn == "gunicorn":
+        cmd = ["gunicorn", "app:flask_app", "-b", f"127.0.0.1:{args.port}",
+               "--workers", str(args.workers), "--threads", str(args.threads), "--timeout", "120"]
+    else:
+        cmd = [sys.executable, "server.py"]
+    bot = subprocess.Popen(cmd, env=env, cwd=here, stdout=subprocess.DEVNULL)
+    args.target = f"http://127.0.0.1:{args.port}/slack/events"
+    _wait_http(f"http://127.0.0.1:{args.port}/healthz")
+    return [bot, fake]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target", default="http://127.0.0.1:3000/slack/events")
+    ap.add_argument("--fake", default="http://127.0.0.1:8765", help="fake_services.py base URL")
+    ap.add_argument("--secret", default=os.getenv("SLACK_SIGNING_SECRET") or "loadtest-secret")
+    ap.add_argument("--steps", default="1,2,4,8,16,32", help="concurrency levels")
+    ap.add_argument("--duration", type=float, default=15.0, help="seconds per step")
+    ap.add_argument("--rate", type=float, default=None, help="cap on requests/second across users")
+    ap.add_argument("--mix", default=DEFAULT_MIX)
+    ap.add_argument("--timeout", type=float, default=10.0)
+    ap.add_argument("--drain", type=float, default=120.0, help="max seconds to wait for completions per step")
+    ap.add_argument("--spawn", choices=["none", "flask", "gunicorn"], default="none")
+    ap.add_argument("--port", type=int, default=3100)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--assets", type=int, default=10000)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--rate-limit", type=int, default=0)
+    ap.add_argument("--json", help="write per-step results here")
+    args = ap.parse_args()
+
+    procs = spawn(args) if args.spawn != "none" else []
+    try:
+        samples = _samples(args.fake)
+        members = requests.get(f"{args.fake}/members.api", params={"page": 1}).json()
+        mix = [k for part in args.mix.split(",") for k, w in [part.split("=")] for _ in range(int(w))]
+        counter = itertools.count()
+
+        print(f"{'conc':>5} {'sent':>6} {'rps':>6} {'ack50':>7} {'ack95':>7} {'ackmax':>7} {'late':>5} "
+              f"{'httpErr':>7} {'done':>5} {'open':>5} {'fail':>5} {'done50':>7} {'done95':>7} {'thru':>6}")
+        results, saturation = [], None
+        for c in (int(s) for s in args.steps.split(",")):
+            r = run_step(args, c, mix, samples, members, counter)
+            results.append(r)
+            print(f"{c:>5} {r['sent']:>6} {r['rps']:>6.1f} {r['ack_p50']:>7.3f} {r['ack_p95']:>7.3f} "
+                  f"{r['ack_max']:>7.3f} {r['ack_late']:>5} {r['http_errors']:>7} {r['completed']:>5} "
+                  f"{r['incomplete']:>5} {r['handler_errors']:>5} {r['done_p50']:>7.2f} {r['done_p95']:>7.2f} "
+                  f"{r['throughput']:>6.2f}", flush=True)
+            if saturation is None and saturated(r):
+                saturation = c
+        print(f"saturation: concurrency {saturation}" if saturation else "saturation: not reached")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"args": vars(args), "steps": results, "saturation": saturation}, f, indent=1)
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Leveled, structured logging.
+
+    slog = log.get_logger("assetsonar")
+    slog.info("licenses_page", page=3, items=25)
+    slog.debug_sampled("match", 0.01, name=...)   # hot paths: ~1% of calls
+
+LOG_LEVEL (default INFO) sets the level; LOG_FORMAT=json (default) emits one
+JSON object per line, LOG_FORMAT=text a human-readable line. Disabled levels
+return before any formatting, so debug calls in hot loops stay cheap.
+"""
+import json
+import logging
+import random
+import sys
+import time
+
+import config
+
+_configured = False
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        out.update(getattr(record, "fields", {}) or {})
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = getattr(record, "fields", {}) or {}
+        kv = " ".join(f"{k}={v}" for k, v in fields.items())
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if kv:
+            line += " " + kv
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure(level=None, fmt=None):
+    """Install the handler on the 'asbot' logger tree (idempotent)."""
+    global _configured
+    level = (level or config.LOG_LEVEL).upper()
+    fmt = (fmt or config.LOG_FORMAT).lower()
+    root = logging.getLogger("asbot")
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_TextFormatter() if fmt == "text" else _JsonFormatter())
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+    _configured = True
+
+
+class StructLogger:
+    def __init__(self, name):
+        self._logger = logging.getLogger(f"asbot.{name}")
+
+    def _log(self, level, event, exc_info=None, **fields):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def enabled(self, level=logging.DEBUG):
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+    def debug_sampled(self, event, rate, **fields):
+        """Debug-log roughly `rate` (0..1) of the calls; for per-item hot paths."""
+        if self._logger.isEnabledFor(logging.DEBUG) and random.random() < rate:
+            self._log(logging.DEBUG, event, sample_rate=rate, **fields)
+
+
+def get_logger(name):
+    if not _configured:
+        configure()
+    return StructLogger(name)
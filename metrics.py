@@ -0,0 +1,188 @@
+"""
+Minimal in-process metrics: counters, histograms and timing spans, exposed in
+Prometheus text format on /metrics (see app.py / app_async.py).
+
+    with span("format"):
+        ...
+
+records the block's wall time in asbot_stage_seconds{stage="format"}.
+Kept dependency-free; one Registry per process (gunicorn workers each expose
+their own numbers).
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import log
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_slog = log.get_logger("metrics")
+
+# per-request stage log for /asset profile; None outside a profiled command
+_STAGE_SINK = contextvars.ContextVar("asbot_stage_sink", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name, self.help = name, help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def count(self, **labels):
+        s = self._series.get(_label_key(labels))
+        return s[-1] if s else 0
+
+    def total(self, **labels):
+        s = self._series.get(_label_key(labels))
+        return s[-2] if s else 0.0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                for i, b in enumerate(self.buckets):
+                    lines.append(f"{self.name}_bucket{_fmt_labels(key, [('le', b)])} {s[i]}")
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, [('le', '+Inf')])} {s[-1]}")
+                lines.append(f"{self.name}_sum{_fmt_labels(key)} {s[-2]:.6f}")
+                lines.append(f"{self.name}_count{_fmt_labels(key)} {s[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help_text, **kw)
+            return m
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram("asbot_stage_seconds", "Wall time per pipeline stage")
+STAGE_ERRORS = REGISTRY.counter("asbot_stage_errors_total", "Stages that raised")
+AS_REQUEST_SECONDS = REGISTRY.histogram("asbot_assetsonar_request_seconds", "AssetSonar API call latency")
+AS_REQUESTS = REGISTRY.counter("asbot_assetsonar_requests_total", "AssetSonar API calls by endpoint and status")
+AS_RATE_LIMITED = REGISTRY.counter("asbot_assetsonar_rate_limited_total", "AssetSonar 429 responses")
+AS_PAGES = REGISTRY.counter("asbot_assetsonar_pages_total", "assets.api pages scanned")
+ID_LOOKUPS = REGISTRY.counter("asbot_identifier_lookups_total",
+                              "AIN/serial lookups by source (cache_hit/cache_miss/catalog/search/scan)")
+WEBHOOK_EVENTS = REGISTRY.counter("asbot_webhook_events_total",
+                                  "AssetSonar webhook events by kind, action and outcome")
+USER_MAP = REGISTRY.counter("asbot_user_map_lookups_total",
+                            "Slack user -> email / email -> member mapping lookups by result")
+COMMANDS = REGISTRY.counter("asbot_commands_total", "/asset commands by intent")
+INTENTS = REGISTRY.counter("asbot_intents_total", "Parsed intents by intent and source (rule/gpt/fallback)")
+SLACK_UPLOADS = REGISTRY.counter("asbot_slack_uploads_total", "Slack file uploads by outcome")
+SLACK_DUPLICATES = REGISTRY.counter("asbot_slack_duplicate_deliveries_total",
+                                    "Slack redeliveries absorbed, by layer (route/handler) and job state")
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a pipeline stage into asbot_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage, **labels)
+        sink = _STAGE_SINK.get()
+        if sink is not None:
+            sink.append((stage, elapsed))
+        _slog.debug("span", stage=stage, seconds=round(elapsed, 4), **labels)
+
+
+@contextmanager
+def record_stages(sink):
+    """Also append (stage, seconds) for every span in this context to `sink`."""
+    token = _STAGE_SINK.set(sink)
+    try:
+        yield sink
+    finally:
+        _STAGE_SINK.reset(token)
+
+
+def timed(stage):
+    """Decorator form of span() for functions that are a whole stage."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def render():
+    return REGISTRY.render()
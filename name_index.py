@@ -0,0 +1,363 @@
+"""
+Character n-gram inverted index over member names and email local-parts.
+
+Built once per member-directory refresh (see assetsonar._get_member_index),
+kept current by member webhooks (upsert / remove), and used by
+search_members_by_name to tolerate typos ("Goerge"), romanization
+variants ("Lee" vs "Li") and swapped name order ("Zhang Wei" vs "Wei Zhang").
+
+Romanization variants are surname-only and scored VARIANT_SIMILARITY, below
+an exact spelling: "Hui Ling" is not "Xu Ling", but "George Lee" still
+finds George Li, after any George Lee.
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import chain
+
+NGRAM = 3
+MIN_SIMILARITY = 0.6
+CANDIDATE_POOL = 200
+TOKEN_POOL = 32
+VARIANT_SIMILARITY = 0.9
+WHOLE_COUNTED_POSTINGS = 2000
+# prefix of the canonical-surname keys; tokenize() never yields it
+SURNAME_KEY = "~"
+
+# Common alternate romanizations of surnames, keyed to one canonical spelling
+# (Wade-Giles / Cantonese / Hokkien / English-ised -> pinyin). Only last_name
+# tokens are indexed under it; several of these are distinct names too.
+ROMANIZATION_VARIANTS = {
+    "lee": "li", "leigh": "li",
+    "chang": "zhang", "cheung": "zhang", "cheong": "zhang",
+    "wong": "wang",
+    "chan": "chen", "chin": "chen",
+    "hwang": "huang",
+    "chow": "zhou", "chou": "zhou", "chau": "zhou",
+    "hsu": "xu", "hui": "xu", "tsui": "xu",
+    "tsai": "cai", "choi": "cai", "choy": "cai",
+    "lim": "lin", "lam": "lin",
+    "ng": "wu", "woo": "wu",
+    "kwok": "guo", "kuo": "guo",
+    "yeung": "yang", "yeo": "yang",
+    "cheng": "zheng", "tay": "zheng",
+    "ho": "he",
+    "hsieh": "xie", "tse": "xie",
+    "liew": "liu", "lau": "liu", "lao": "liu",
+    "goh": "wu",
+    "koh": "xu",
+    "teo": "zhang",
+    "loh": "lu", "low": "lu",
+    "yap": "ye", "yip": "ye",
+}
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def _fold(s: str) -> str:
+    """Lowercase and strip accents ("José" -> "jose")."""
+    s = unicodedata.normalize("NFKD", (s or "").strip().lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def canonical_token(token: str) -> str:
+    return ROMANIZATION_VARIANTS.get(token, token)
+
+
+def tokenize(text: str):
+    """Split a name or email local-part into folded letter tokens."""
+    return _WORD_RE.findall(_fold(text))
+
+
+def ngrams(token: str, n: int = NGRAM):
+    padded = f"${token}$"
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def edit_distance(a: str, b: str, max_dist: int = None) -> int:
+    """
+    Optimal string alignment distance (Levenshtein + adjacent transpositions),
+    so "goerge" -> "george" costs 1. Capped at max_dist + 1 when given.
+
+    Bit-parallel (Hyyro 2001): one machine-word step per character of `b`
+    instead of a len(a) * len(b) table in Python.
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(a)
+    if max_dist is not None and m - len(b) > max_dist:
+        return max_dist + 1
+    if not b:
+        return m
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    hibit = 1 << (m - 1)
+    vp, vn, d0, pm_prev = mask, 0, 0, 0
+    dist = m
+    for c in b:
+        pm = peq.get(c, 0)
+        tr = (((~d0) & pm) << 1) & pm_prev  # transposition of the previous pair
+        d0 = ((((pm & vp) + vp) ^ vp) | pm | vn | tr) & mask
+        hp = (vn | ~(d0 | vp)) & mask
+        hn = d0 & vp
+        if hp & hibit:
+            dist += 1
+        elif hn & hibit:
+            dist -= 1
+        hp = ((hp << 1) | 1) & mask
+        hn = (hn << 1) & mask
+        vp = (hn | ~(d0 | hp)) & mask
+        vn = hp & d0
+        pm_prev = pm
+    if max_dist is not None and dist > max_dist:
+        return max_dist + 1
+    return dist
+
+
+def similarity(a: str, b: str) -> float:
+    longest = max(len(a), len(b))
+    if not longest:
+        return 0.0
+    max_dist = int(longest * (1 - MIN_SIMILARITY))
+    return 1.0 - edit_distance(a, b, max_dist) / longest
+
+
+def _member_name_parts(m: dict):
+    first = m.get("first_name") or ""
+    last = m.get("last_name") or ""
+    disp = m.get("name") or m.get("display_name") or f"{first} {last}".strip()
+    local = (m.get("email") or "").split("@", 1)[0]
+    return first, last, disp, local
+
+
+def _member_tokens(m: dict):
+    """(name tokens + canonical surname keys, whole local-part or "")."""
+    first, last, disp, local = _member_name_parts(m)
+    toks = set(tokenize(first) + tokenize(last) + tokenize(disp) + tokenize(local))
+    toks.update(SURNAME_KEY + canonical_token(t) for t in tokenize(last))
+    # whole local-part too, e.g. "georgeli" for "george.li@..."
+    return toks, "".join(_WORD_RE.findall(_fold(local)))
+
+
+class _GramIndex:
+    """gram -> ids of vocabulary tokens, with the count filter and edit-distance check."""
+
+    def __init__(self, n, counted_postings=None):
+        self.n = n
+        self.counted_postings = counted_postings
+        self.vocab = []
+        self.ids = {}
+        self.grams = {}
+
+    def add(self, token):
+        # append-only: safe while searches read it
+        if token in self.ids:
+            return
+        tid = len(self.vocab)
+        self.vocab.append(token)
+        self.ids[token] = tid
+        for g in ngrams(token, self.n):
+            self.grams.setdefault(g, []).append(tid)
+
+    def similar(self, token: str, out: dict):
+        """Add {vocab_token: similarity} for vocabulary tokens close to `token` to out."""
+        qgrams = ngrams(token, self.n)
+        max_dist = int(len(token) * (1 - MIN_SIMILARITY)) + 1
+        # count filter: k edits destroy at most k*n grams
+        need = max(1, len(qgrams) - max_dist * self.n)
+        postings = sorted((self.grams.get(g, ()) for g in qgrams), key=len)
+        used = postings
+        if self.counted_postings is not None:
+            # rarest grams first, up to counted_postings ids (keeping at least
+            # two grams): the common ones say little and dominate the cost
+            used, counted = [], 0
+            for p in postings:
+                if len(used) >= 2 and counted + len(p) > self.counted_postings:
+                    break
+                used.append(p)
+                counted += len(p)
+        shared = Counter(chain.from_iterable(used))
+
+        if token in self.ids:
+            out[token] = 1.0
+        # only the tokens sharing the most grams are worth an edit distance
+        for tid, cnt in shared.most_common(TOKEN_POOL):
+            cand = self.vocab[tid]
+            if out.get(cand, 0.0) >= 0.9:
+                continue
+            if len(token) >= 3 and cand.startswith(token):
+                out[cand] = 0.9
+                continue
+            if used is not postings:
+                cnt = len(qgrams & ngrams(cand, self.n))
+            if cnt < need:
+                continue
+            # each edit touches at most n grams: cheap lower bound first
+            lower = (max(len(qgrams), len(cand)) - cnt) / self.n
+            if lower > max(len(token), len(cand)) * (1 - MIN_SIMILARITY):
+                continue
+            sim = similarity(token, cand)
+            if sim >= max(MIN_SIMILARITY, out.get(cand, 0.0)):
+                out[cand] = sim
+        return out
+
+
+class NameIndex:
+    """
+    Two-level inverted index: gram -> vocabulary tokens -> member positions.
+
+    A query token is compared (edit distance) only against vocabulary tokens
+    that share enough n-grams with it, and members are gathered from the
+    matching tokens' postings, so lookup cost depends on the postings touched
+    rather than on directory size.
+    """
+
+    def __init__(self, members, n: int = NGRAM):
+        self.n = n
+        self.members = list(members or [])
+        self._member_tokens = []
+        self._positions = {}
+        # name tokens are few and shared; whole local-parts are one per member,
+        # so they get their own grams and only the rarest of those are counted
+        self._names = _GramIndex(n)
+        self._wholes = _GramIndex(n, counted_postings=WHOLE_COUNTED_POSTINGS)
+        token_members = defaultdict(list)
+        for pos, m in enumerate(self.members):
+            toks = self._index_tokens(m)
+            self._member_tokens.append(toks)
+            if m.get("id") is not None:
+                self._positions[m["id"]] = pos
+            for t in toks:
+                token_members[t].append(pos)
+        self._token_members = {t: frozenset(p) for t, p in token_members.items()}
+        self._removed = 0
+        self._write_lock = threading.Lock()
+
+    def _index_tokens(self, m):
+        names, whole = _member_tokens(m)
+        for t in names:
+            if t[0] != SURNAME_KEY:  # looked up exactly, never fuzzily
+                self._names.add(t)
+        if whole:
+            self._wholes.add(whole)
+            names.add(whole)
+        return tuple(names)
+
+    def __len__(self):
+        return len(self.members) - self._removed
+
+    def get(self, member_id):
+        pos = self._positions.get(member_id)
+        return None if pos is None else self.members[pos]
+
+    def upsert(self, member):
+        """Add a member, or replace the one with the same id."""
+        with self._write_lock:
+            self._remove(member.get("id"))
+            pos = len(self.members)
+            # searches run concurrently: every step below appends or swaps a
+            # whole value, and the member is in place before any posting names it
+            self.members.append(member)
+            toks = self._index_tokens(member)
+            self._member_tokens.append(toks)
+            for t in toks:
+                self._token_members[t] = self._token_members.get(t, frozenset()) | {pos}
+            if member.get("id") is not None:
+                self._positions[member["id"]] = pos
+
+    def remove(self, member_id):
+        with self._write_lock:
+            self._remove(member_id)
+
+    def _remove(self, member_id):
+        pos = self._positions.pop(member_id, None)
+        if pos is None:
+            return
+        for t in self._member_tokens[pos]:
+            self._token_members[t] = self._token_members[t] - {pos}
+        # positions are never reused; the vocabulary keeps the (now empty) tokens
+        self._member_tokens[pos] = ()
+        self.members[pos] = None
+        self._removed += 1
+
+    def _similar_tokens(self, token: str, names=True, wholes=False):
+        """{vocab_token: similarity} for vocabulary tokens close to `token`."""
+        out = {}
+        if names:
+            self._names.similar(token, out)
+            # surname romanizations ("lee" -> li): a bonus below an exact spelling
+            variant = SURNAME_KEY + canonical_token(token)
+            if variant in self._token_members:
+                out[variant] = VARIANT_SIMILARITY
+        if wholes:
+            self._wholes.similar(token, out)
+        return out
+
+    def score_candidates(self, query: str, pool: int = CANDIDATE_POOL):
+        """
+        Return [(similarity, member)] best first, at most `pool` of them.
+        Similarity is the mean best token similarity (0..1) of the query
+        tokens, order-insensitive; members must match the most selective
+        query tokens, as many of them as still leaves a non-empty set.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not len(self):
+            return []
+
+        # a single token may be a whole local-part ("georgeli")
+        scored = self._score_tokens(tokens, pool, wholes=len(tokens) == 1)
+        if len(tokens) > 1 and (not scored or scored[0][0] < 1.0):
+            # "george li" / "george.li" / "georgeli" all reach the whole local-part
+            whole = self._score_tokens(["".join(tokens)], pool, names=False, wholes=True)
+            best = dict((pos, s) for s, pos in scored)
+            for s, pos in whole:
+                if s > best.get(pos, 0.0):
+                    best[pos] = s
+            scored = sorted(((s, pos) for pos, s in best.items()), key=lambda x: (-x[0], x[1]))[:pool]
+        members = self.members
+        return [(s, members[pos]) for s, pos in scored if members[pos] is not None]
+
+    def _score_tokens(self, tokens, pool: int, names=True, wholes=False):
+        sims, sets = [], []
+        for t in tokens:
+            close = self._similar_tokens(t, names, wholes)
+            members = set()
+            for cand in close:
+                members.update(self._token_members[cand])
+            sims.append(close)
+            sets.append(members)
+
+        candidates = None
+        for members in sorted(sets, key=len):
+            if not members:
+                continue
+            narrowed = members if candidates is None else candidates & members
+            if not narrowed:
+                break
+            candidates = narrowed
+        if not candidates:
+            return []
+
+        scored = []
+        for pos in candidates:
+            mt = self._member_tokens[pos]
+            if not mt:
+                continue  # removed since the candidates were gathered
+            total = 0.0
+            for close in sims:
+                total += max([close.get(c, 0.0) for c in mt])
+            scored.append((total / len(tokens), pos))
+
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return scored[:pool]
+
+    def search(self, query: str, limit: int = 15):
+        """Return the best `limit` fuzzy matches as [(similarity, member)]."""
+        return self.score_candidates(query, pool=limit)
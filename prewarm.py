@@ -0,0 +1,144 @@
+"""
+Background cache warm-up, enabled with PREWARM=members,catalog.
+
+Starts PREWARM_DELAY_SECONDS after boot so the listener is already serving:
+
+  members  fetch the member directory and build its name index, which the
+           first name search would otherwise pay for
+  catalog  page assets.api into a CatalogIndex and install it, so planner
+           queries are answered without a scan
+
+Every CATALOG_REFRESH_SECONDS (0 = never) the warmed caches are rebuilt, the
+AIN/serial lookup cache is cleared and expired usermap rows are purged:
+AssetSonar webhooks keep them fresh in between, this catches the events that
+never arrived. A fresh catalog is also recorded as a snapshot for `/asset changes` once SNAPSHOT_INTERVAL_SECONDS
+have passed since the last one.
+
+Failures are logged and leave the caches cold; commands still work.
+"""
+import asyncio
+import threading
+import time
+
+import assetsonar as AS
+import catalog
+import config
+import idcache as IDC
+import log
+import metrics as M
+import snapshots as SN
+import usermap as UM
+
+slog = log.get_logger("prewarm")
+
+_started = False
+_lock = threading.Lock()
+
+
+def warm_members():
+    with M.span("prewarm", cache="members"):
+        index = AS._get_member_index()
+    slog.info("prewarm_done", cache="members", members=len(index))
+
+
+def warm_catalog():
+    with M.span("prewarm", cache="catalog"):
+        index = catalog.build_index(AS.iter_asset_pages())
+    slog.info("prewarm_done", cache="catalog", assets=len(index))
+
+
+def reconcile(targets):
+    """Rebuild the warmed caches from scratch (polling fallback for missed webhooks)."""
+    IDC.CACHE.clear()
+    AS.refresh_custom_field_names()
+    _safe(UM.MAP.purge)
+    if "members" in targets:
+        AS.refresh_member_directory()
+        warm_members()
+    if "catalog" in targets:
+        warm_catalog()
+        SN.maybe_take_from_index()
+
+
+def _safe(fn, *args):
+    try:
+        fn(*args)
+    except Exception as e:
+        slog.warning("prewarm_failed", step=fn.__name__, error=str(e))
+
+
+def _claim():
+    global _started
+    with _lock:
+        if _started:
+            return False
+        _started = True
+        return True
+
+
+def _run(targets, delay, refresh):
+    time.sleep(delay)
+    if "members" in targets:
+        _safe(warm_members)
+    if "catalog" in targets:
+        _safe(warm_catalog)
+        _safe(SN.maybe_take_from_index)
+    while refresh > 0:
+        time.sleep(refresh)
+        _safe(reconcile, targets)
+
+
+def start(targets=None, delay=None, refresh=None):
+    """Warm up in a daemon thread (sync runtime); once per process, no-op without targets."""
+    targets = config.PREWARM if targets is None else set(targets)
+    if not targets or not _claim():
+        return None
+    t = threading.Thread(
+        target=_run,
+        args=(targets,
+              config.PREWARM_DELAY_SECONDS if delay is None else delay,
+              config.CATALOG_REFRESH_SECONDS if refresh is None else refresh),
+        name="prewarm",
+        daemon=True,
+    )
+    t.start()
+    return t
+
+
+async def _run_async(targets, delay, refresh):
+    import assetsonar_async as ASA
+
+    async def warm_members_async():
+        try:
+            with M.span("prewarm", cache="members"):
+                index = await ASA._get_member_index()
+            slog.info("prewarm_done", cache="members", members=len(index))
+        except Exception as e:
+            slog.warning("prewarm_failed", step="warm_members", error=str(e))
+
+    await asyncio.sleep(delay)
+    if "members" in targets:
+        await warm_members_async()
+    if "catalog" in targets:
+        # the catalog pager is the sync one; keep it off the event loop
+        await asyncio.to_thread(_safe, warm_catalog)
+        await asyncio.to_thread(_safe, SN.maybe_take_from_index)
+    while refresh > 0:
+        await asyncio.sleep(refresh)
+        IDC.CACHE.clear()
+        AS.refresh_custom_field_names()
+        await asyncio.to_thread(_safe, UM.MAP.purge)
+        if "members" in targets:
+            ASA.refresh_member_directory()
+            await warm_members_async()
+        if "catalog" in targets:
+            await asyncio.to_thread(_safe, warm_catalog)
+            await asyncio.to_thread(_safe, SN.maybe_take_from_index)
+
+
+async def on_startup(web_app):
+    """aiohttp on_startup hook for the async runtime."""
+    if config.PREWARM and _claim():
+        web_app["prewarm_task"] = asyncio.create_task(
+            _run_async(config.PREWARM, config.PREWARM_DELAY_SECONDS, config.CATALOG_REFRESH_SECONDS)
+        )
@@ -0,0 +1,105 @@
+"""
+On-demand profiling: `/asset profile <query>`.
+
+Runs the normal command pipeline for <query> under cProfile and records the
+wall time of every metrics span (intent_parse, gpt, assetsonar pages, format,
+slack_upload, ...). The handler posts a short summary to the thread and
+uploads the raw .pstats file for `python -m pstats` / snakeviz.
+
+Restricted to the Slack user ids in PROFILE_USERS (comma-separated); nobody
+may profile when it is unset. Only one profile runs at a time per process.
+cProfile sees the handler's own thread: worker-pool threads (hydration,
+export) show up as waits there, and under the async runtime other commands
+sharing the event loop are included in the profile.
+"""
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+import config
+import metrics as M
+
+TOP_FUNCTIONS = 15
+
+_busy = threading.Lock()
+
+
+def allowed(user_id) -> bool:
+    return bool(user_id) and user_id in config.PROFILE_USERS
+
+
+def parse_command(text):
+    """'profile <query>' -> '<query>' (may be empty); None for any other command."""
+    parts = (text or "").split(None, 1)
+    if not parts or parts[0].lower() != "profile":
+        return None
+    return parts[1].strip() if len(parts) > 1 else ""
+
+
+class ProfileSession:
+    """start()/stop() around the pipeline; then summary() and dump()."""
+
+    def __init__(self, query):
+        self.query = query
+        self.stages = []
+        self.wall = 0.0
+        self._profiler = cProfile.Profile()
+        self._stack = ExitStack()
+        self._started = None
+
+    def start(self):
+        if not _busy.acquire(blocking=False):
+            return False
+        self._stack.enter_context(M.record_stages(self.stages))
+        self._started = time.perf_counter()
+        self._profiler.enable()
+        return True
+
+    def stop(self):
+        if self._started is None:
+            return
+        self._profiler.disable()
+        self.wall = time.perf_counter() - self._started
+        self._started = None
+        self._stack.close()
+        _busy.release()
+
+    def stage_totals(self):
+        """[(stage, total seconds, calls)] slowest first."""
+        totals = {}
+        for stage, secs in self.stages:
+            t, n = totals.get(stage, (0.0, 0))
+            totals[stage] = (t + secs, n + 1)
+        return sorted(((s, t, n) for s, (t, n) in totals.items()), key=lambda r: -r[1])
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        out = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=out)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+        # drop the pstats preamble, keep the table
+        lines = out.getvalue().splitlines()
+        start = next((i for i, l in enumerate(lines) if l.strip().startswith("ncalls")), 0)
+        return "\n".join(l for l in lines[start:] if l.strip())
+
+    def summary(self):
+        lines = [f":stopwatch: Profile for `{self.query}`: {self.wall:.2f}s wall"]
+        stages = self.stage_totals()
+        if stages:
+            lines.append("*Stages* (wall time, calls; nested stages overlap):")
+            for stage, total, calls in stages:
+                lines.append(f"• `{stage}` {total:.3f}s ×{calls}")
+        lines.append(f"*Top {TOP_FUNCTIONS} by cumulative time:*")
+        lines.append("```" + self.top_functions() + "```")
+        return "\n".join(lines)
+
+    def dump(self):
+        """Write the raw stats to a temp .pstats file and return its path."""
+        fd, path = tempfile.mkstemp(prefix="asset_profile_", suffix=".pstats")
+        os.close(fd)
+        self._profiler.dump_stats(path)
+        return path
@@ -0,0 +1,119 @@
+"""
+Progress reporting for long assets.api scans.
+
+A ScanProgress is passed as `progress=` to the scanning functions in
+assetsonar / assetsonar_async and is called once per page. It keeps the
+anchor message up to date ("page 12/40, 37 matches so far") at most once
+per PROGRESS_INTERVAL seconds and posts the first screen of matches to the
+thread as soon as there are enough of them; the full result is still posted
+by the handler at the end.
+"""
+import asyncio
+import time
+
+import formatting as FX
+import log
+
+slog = log.get_logger("progress")
+
+PROGRESS_INTERVAL = 2.0
+FIRST_SCREEN = 10
+
+
+class ScanProgress:
+    def __init__(self, update_anchor, post_blocks, title, fields=None,
+                 interval=PROGRESS_INTERVAL, first_screen=FIRST_SCREEN):
+        self.update_anchor = update_anchor
+        self.post_blocks = post_blocks
+        self.title = title
+        self.fields = fields
+        self.interval = interval
+        self.first_screen = first_screen
+        self.pages_done = 0
+        self.total_pages = None
+        self.matches = 0
+        self.first_posted = False
+        self._screen = []
+        self._last_update = time.monotonic()
+
+    def __call__(self, page, total_pages, matched):
+        self.pages_done += 1
+        self.total_pages = total_pages
+        self.matches += len(matched)
+        if len(self._screen) < self.first_screen:
+            self._screen.extend(matched[:self.first_screen - len(self._screen)])
+
+        if not self.first_posted and len(self._screen) >= self.first_screen and self.pages_done < total_pages:
+            self.first_posted = True
+            self._safe(self.post_blocks, FX.format_first_screen(self.title, self._screen, self.fields))
+
+        now = time.monotonic()
+        if now - self._last_update >= self.interval and self.pages_done < total_pages:
+            self._last_update = now
+            self._safe(self.update_anchor, self.status_text())
+
+    def status_text(self):
+        return f":mag: Searching... page {self.pages_done}/{self.total_pages}, {self.matches} matches so far"
+
+    @staticmethod
+    def _safe(fn, *args):
+        # progress is best-effort; never fail the scan over a Slack hiccup
+        try:
+            fn(*args)
+        except Exception as e:
+            slog.warning("progress_update_failed", error=str(e))
+
+
+def slack_progress(client, channel_id, anchor_ts, title, fields=None):
+    """ScanProgress bound to a sync WebClient and the command's anchor message/thread."""
+    return ScanProgress(
+        lambda text: client.chat_update(channel=channel_id, ts=anchor_ts, text=text),
+        lambda blocks: client.chat_postMessage(
+            channel=channel_id, thread_ts=anchor_ts, text="First matches", blocks=blocks
+        ),
+        title,
+        fields=fields,
+    )
+
+
+class AsyncScanProgress(ScanProgress):
+    """
+    ScanProgress for AsyncWebClient: each Slack call becomes a task on the
+    running loop. The tasks are kept (so they are not garbage-collected
+    mid-flight) and their failures logged; settle() waits for them, so the
+    handler's final update cannot be overwritten by a late progress one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = asyncio.get_running_loop()
+        self._tasks = set()
+
+    def spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            slog.warning("progress_update_failed", error=str(task.exception()))
+
+    async def settle(self):
+        # no new tasks once the scan has returned; wait for the ones in flight
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def async_slack_progress(client, channel_id, anchor_ts, title, fields=None):
+    """Same for AsyncWebClient; await .settle() before the final anchor update."""
+    progress = AsyncScanProgress(
+        lambda text: progress.spawn(client.chat_update(channel=channel_id, ts=anchor_ts, text=text)),
+        lambda blocks: progress.spawn(client.chat_postMessage(
+            channel=channel_id, thread_ts=anchor_ts, text="First matches", blocks=blocks
+        )),
+        title,
+        fields=fields,
+    )
+    return progress
@@ -0,0 +1,312 @@
+"""
+Intent -> query plan.
+
+Parsed intent slots (vendor, group, location, age range, assignee, status)
+become a conjunction of predicates that is evaluated in ONE pass over the
+asset pages, or over catalog indexes when a CatalogIndex is installed.
+Predicates run cheapest/most selective first so most assets are rejected
+after a single string compare.
+"""
+from datetime import datetime, timedelta
+
+from dateutil import parser as dtparser
+
+from catalog import VENDORS
+
+DEVICE_KINDS = ["laptop", "notebook", "macbook", "desktop", "pc"]
+
+# intents whose results come from a plan rather than a dedicated lookup
+PLAN_INTENTS = ("old_laptops", "age_assets", "location_assets", "vendor_assets", "group_assets", "asset_query")
+# slot an intent cannot do without; a plan without it would match every asset
+REQUIRED_SLOTS = {"location_assets": "location", "vendor_assets": "vendor", "group_assets": "group"}
+
+
+class MissingSlot(ValueError):
+    """The intent lacks the slot that narrows it (e.g. location_assets without a location)."""
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return dtparser.parse(value).date()
+    except Exception:
+        return None
+
+
+class Predicate:
+    """One conjunct. selectivity = estimated fraction of assets kept; cost = relative eval cost."""
+    selectivity = 0.5
+    cost = 1.0
+    exact_index = False
+
+    def match(self, a) -> bool:
+        raise NotImplementedError
+
+    def index_lookup(self, index):
+        """Set of candidate asset keys from a CatalogIndex, or None if not indexable."""
+        return None
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+
+class VendorPredicate(Predicate):
+    selectivity = 0.3
+
+    def __init__(self, vendors):
+        self.vendors = [v.lower() for v in vendors]
+
+    def match(self, a):
+        name = (a.get("name") or "").lower()
+        return any(v in name for v in self.vendors)
+
+    def index_lookup(self, index):
+        # by_vendor only knows VENDORS; anything else has to be matched by name
+        if any(v not in VENDORS for v in self.vendors):
+            return None
+        keys = set()
+        for v in self.vendors:
+            keys |= index.by_vendor.get(v, set())
+        return keys
+
+    def describe(self):
+        return "vendor=" + "|".join(self.vendors)
+
+
+class DeviceKindPredicate(Predicate):
+    selectivity = 0.6
+
+    def __init__(self, kinds=DEVICE_KINDS):
+        self.kinds = [k.lower() for k in kinds]
+
+    def match(self, a):
+        name = (a.get("name") or "").lower()
+        group = (a.get("group_name") or "").lower()
+        return any(w in name or w in group for w in self.kinds)
+
+    def describe(self):
+        return "kind=" + "|".join(self.kinds)
+
+
+class GroupPredicate(Predicate):
+    selectivity = 0.3
+    exact_index = True
+
+    def __init__(self, group):
+        self.group = group.lower()
+
+    def match(self, a):
+        return self.group in (a.get("group_name") or "").lower()
+
+    def index_lookup(self, index):
+        keys = set()
+        for name, members in index.by_group.items():
+            if self.group in name:
+                keys |= members
+        return keys
+
+    def describe(self):
+        return f"group~{self.group}"
+
+
+class LocationPredicate(Predicate):
+    selectivity = 0.1
+    exact_index = True
+
+    def __init__(self, location):
+        self.location = location.upper()
+
+    def match(self, a):
+        return (a.get("location_name") or "").upper() == self.location
+
+    def index_lookup(self, index):
+        return set(index.by_location.get(self.location, set()))
+
+    def describe(self):
+        return f"location={self.location}"
+
+
+class StatusPredicate(Predicate):
+    selectivity = 0.5
+    exact_index = True
+
+    def __init__(self, status):
+        self.status = str(status).lower()
+
+    def match(self, a):
+        return str(a.get("status") or a.get("state") or "").lower() == self.status
+
+    def index_lookup(self, index):
+        return set(index.by_status.get(self.status, set()))
+
+    def describe(self):
+        return f"status={self.status}"
+
+
+class AssigneePredicate(Predicate):
+    selectivity = 0.01
+
+    def __init__(self, assignee):
+        self.assignee = assignee.lower()
+
+    def match(self, a):
+        return any(
+            self.assignee in str(f).lower()
+            for f in (a.get("assigned_to_user_email"), a.get("assigned_to_user_name"))
+            if f
+        )
+
+    def describe(self):
+        return f"assignee~{self.assignee}"
+
+
+class AgeRangePredicate(Predicate):
+    """purchased_on between max_years and min_years ago (either bound optional)."""
+    selectivity = 0.4
+    cost = 20.0  # dateutil parse
+
+    def __init__(self, min_years=None, max_years=None, today=None):
+        today = today or datetime.utcnow().date()
+        self.min_years, self.max_years = min_years, max_years
+        self.newest = today - timedelta(days=365 * min_years) if min_years is not None else None
+        self.oldest = today - timedelta(days=365 * max_years) if max_years is not None else None
+
+    def match(self, a):
+        pd = _parse_date(a.get("purchased_on"))
+        if not pd:
+            return False
+        if self.newest and pd > self.newest:
+            return False
+        if self.oldest and pd < self.oldest:
+            return False
+        return True
+
+    def describe(self):
+        parts = []
+        if self.min_years is not None:
+            parts.append(f"age>={self.min_years}y")
+        if self.max_years is not None:
+            parts.append(f"age<={self.max_years}y")
+        return " ".join(parts)
+
+
+def _rank(p, index=None):
+    sel = p.selectivity
+    if index is not None and len(index):
+        keys = p.index_lookup(index)
+        if keys is not None:
+            sel = len(keys) / len(index)
+    # expected cost to reject an asset: cheap and selective first
+    return p.cost / max(1e-6, 1.0 - sel)
+
+
+class QueryPlan:
+    def __init__(self, predicates):
+        self.predicates = sorted(predicates, key=_rank)
+
+    def __bool__(self):
+        return bool(self.predicates)
+
+    def describe(self):
+        return " ∧ ".join(p.describe() for p in self.predicates) or "all assets"
+
+    def match(self, a):
+        for p in self.predicates:
+            if not p.match(a):
+                return False
+        return True
+
+    def execute(self, pages):
+        """Single pass over an iterable of asset pages."""
+        results = []
+        for page in pages:
+            results.extend(a for a in page if self.match(a))
+        return results
+
+    def execute_index(self, index):
+        """Answer from a CatalogIndex: intersect posting sets, then check the rest."""
+        with index.lock:
+            return self._execute_index(index)
+
+    def _execute_index(self, index):
+        lookups = []
+        residual = []
+        for p in self.predicates:
+            keys = p.index_lookup(index)
+            if keys is None:
+                residual.append(p)
+                continue
+            lookups.append(keys)
+            if not p.exact_index:
+                residual.append(p)
+
+        if lookups:
+            lookups.sort(key=len)
+            keys = set(lookups[0])
+            for other in lookups[1:]:
+                keys &= other
+                if not keys:
+                    return []
+            candidates = (index.assets[k] for k in keys if k in index.assets)
+        else:
+            candidates = index.assets.values()
+
+        residual.sort(key=lambda p: _rank(p, index))
+        return [a for a in candidates if all(p.match(a) for p in residual)]
+
+
+def _int_or_none(v):
+    try:
+        return int(v) if v is not None and v != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def plan_from_intent(intent_data: dict, today=None) -> QueryPlan:
+    """
+    Turn intent slots into a QueryPlan. Raises MissingSlot when the intent
+    lacks its required slot, or an asset_query carries no filter at all.
+    """
+    itype = intent_data.get("intent")
+    required = REQUIRED_SLOTS.get(itype)
+    if required and not intent_data.get(required):
+        raise MissingSlot(f"{itype} needs a {required}")
+    preds = []
+
+    vendor = intent_data.get("vendor")
+    vendors = [vendor] if isinstance(vendor, str) and vendor else (vendor or [])
+    min_years = _int_or_none(intent_data.get("min_years"))
+    if min_years is None:
+        min_years = _int_or_none(intent_data.get("years"))
+    max_years = _int_or_none(intent_data.get("max_years"))
+
+    if itype == "old_laptops":
+        preds.append(VendorPredicate(vendors or VENDORS))
+        preds.append(DeviceKindPredicate())
+        if min_years is None:
+            min_years = 3
+    elif vendors:
+        preds.append(VendorPredicate(vendors))
+
+    if itype == "age_assets" and min_years is None:
+        min_years = 3
+    if min_years is not None or max_years is not None:
+        preds.append(AgeRangePredicate(min_years, max_years, today=today))
+
+    if intent_data.get("location"):
+        preds.append(LocationPredicate(intent_data["location"]))
+    if intent_data.get("group"):
+        preds.append(GroupPredicate(intent_data["group"]))
+    if intent_data.get("assignee"):
+        preds.append(AssigneePredicate(intent_data["assignee"]))
+    if intent_data.get("status"):
+        preds.append(StatusPredicate(intent_data["status"]))
+    if intent_data.get("device_kind") and itype != "old_laptops":
+        kind = str(intent_data["device_kind"]).lower()
+        # "laptop" is the generic word (筆電 too): it means every kind old_laptops covers
+        preds.append(DeviceKindPredicate(DEVICE_KINDS if kind == "laptop" else [kind]))
+
+    if not preds:
+        raise MissingSlot(f"{itype or 'query'} has no filter")
+    return QueryPlan(preds)
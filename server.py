@@ -0,0 +1,27 @@
+"""
+Entry point that picks the runtime by config:
+
+    BOT_RUNTIME=sync   (default) Bolt App behind Flask  -> app.flask_app
+    BOT_RUNTIME=async  Bolt AsyncApp on aiohttp         -> app_async.create_web_app()
+
+gunicorn equivalents:
+    gunicorn app:flask_app
+    gunicorn 'app_async:create_web_app()' --worker-class aiohttp.GunicornWebWorker
+"""
+import config
+
+
+def main():
+    runtime = config.BOT_RUNTIME
+    if runtime == "async":
+        import app_async
+        app_async.main()
+    elif runtime == "sync":
+        import app
+        app.flask_app.run(host="0.0.0.0", port=config.PORT)
+    else:
+        raise SystemExit(f"Unknown BOT_RUNTIME={runtime!r} (expected 'sync' or 'async')")
+
+
+if __name__ == "__main__":
+    main()
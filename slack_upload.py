@@ -1,9 +1,25 @@
-import os
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
-SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
-client = WebClient(token=SLACK_BOT_TOKEN)
+import config
+import log
+import metrics as M
+
+# SLACK_API_URL points the Web API clients elsewhere (e.g. fake_services.py)
+SLACK_API_URL = config.SLACK_API_URL or WebClient.BASE_URL
+client = WebClient(token=config.SLACK_BOT_TOKEN, base_url=SLACK_API_URL, ssl=config.ssl_context())
+slog = log.get_logger("slack_upload")
+
+# AsyncWebClient pulls in aiohttp; the sync runtime never needs it
+_async_client = None
+
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        from slack_sdk.web.async_client import AsyncWebClient
+        _async_client = AsyncWebClient(token=config.SLACK_BOT_TOKEN, base_url=SLACK_API_URL, ssl=config.ssl_context())
+    return _async_client
 
 
 def upload_csv_to_slack(file_path: str, channels: str, title="Report CSV", thread_ts=None):
@@ -11,14 +27,38 @@ def upload_csv_to_slack(file_path: str, channels: str, title="Report CSV", threa
     上傳 CSV 到 Slack，但不顯示預覽，只回傳 permalink
     """
     try:
-        response = client.files_upload_v2(
-            channels=[channels],
-            file=file_path,
-            title=title,
-            thread_ts=thread_ts
-        )
+        with M.span("slack_upload"):
+            response = client.files_upload_v2(
+                channels=[channels],
+                file=file_path,
+                title=title,
+                thread_ts=thread_ts
+            )
+        M.SLACK_UPLOADS.inc(outcome="ok")
+        file_info = response.get("file", {})
+        return file_info.get("permalink")
+    except SlackApiError as e:
+        M.SLACK_UPLOADS.inc(outcome="error")
+        slog.error("slack_upload_failed", error=e.response["error"], title=title)
+        return None
+
+
+async def upload_csv_to_slack_async(file_path: str, channels: str, title="Report CSV", thread_ts=None):
+    """
+    upload_csv_to_slack 的 async 版本（AsyncWebClient）
+    """
+    try:
+        with M.span("slack_upload"):
+            response = await _get_async_client().files_upload_v2(
+                channels=[channels],
+                file=file_path,
+                title=title,
+                thread_ts=thread_ts
+            )
+        M.SLACK_UPLOADS.inc(outcome="ok")
         file_info = response.get("file", {})
         return file_info.get("permalink")
     except SlackApiError as e:
-        print(f"❌ Slack 上傳失敗: {e.response['error']}")
-        return None
\ No newline at end of file
+        M.SLACK_UPLOADS.inc(outcome="error")
+        slog.error("slack_upload_failed", error=e.response["error"], title=title)
+        return None
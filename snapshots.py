@@ -0,0 +1,326 @@
+"""
+Catalog snapshots and "what changed" reports: `/asset changes <period>`.
+
+A snapshot stores each asset as a compact record (the fields below) plus a
+short hash of it. SNAPSHOT_DIR holds:
+
+  head.jsonl.gz        the latest snapshot, [id, hash, record] sorted by id
+  delta-<ts>.jsonl.gz  what one snapshot changed against the previous head:
+                       {"id", "before", "after"} sorted by id (None = absent)
+  manifest.json        the snapshot list with per-snapshot counts
+
+Taking a snapshot is one sorted merge of the old head against the current
+catalog, comparing hashes; only records whose hash differs are written to
+the delta. History therefore grows with the number of changes, not with the
+catalog, and a report reads only the deltas inside the period, merged by id
+(heapq.merge), so it costs O(changes) whatever the catalog size.
+
+Snapshots are taken every SNAPSHOT_INTERVAL_SECONDS from the catalog index
+that prewarm.py keeps (PREWARM=catalog), or from cron with
+`python snapshots.py take`, which scans assets.api. Deltas older than
+SNAPSHOT_RETENTION_DAYS are pruned. Periods are only as fine as the interval.
+"""
+import argparse
+import fcntl
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import catalog
+import config
+import log
+import metrics as M
+
+SNAPSHOT_FIELDS = (
+    "identifier", "name", "bios_serial_number", "group_name", "location_name", "status",
+    "purchased_on", "assigned_to_user_id", "assigned_to_user_name", "assigned_to_user_email",
+)
+# change kinds a changed record is tagged with, by the field that moved
+TAGS = (
+    ("assigned_to_user_id", "reassigned"),
+    ("location_name", "moved"),
+    ("status", "status"),
+)
+DEFAULT_PERIOD = "7d"
+NO_SNAPSHOTS = ("No catalog snapshots yet. They are taken with PREWARM=catalog and "
+                "SNAPSHOT_INTERVAL_SECONDS, or by `python snapshots.py take`.")
+
+slog = log.get_logger("snapshots")
+
+
+def compact(asset):
+    return {f: asset.get(f) for f in SNAPSHOT_FIELDS}
+
+
+def _encode(record):
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def record_hash(record, blob=None):
+    blob = _encode(record) if blob is None else blob
+    return hashlib.blake2b(blob.encode(), digest_size=8).hexdigest()
+
+
+def rows_from_assets(assets):
+    """
+    Assets -> [(id, hash, record, encoded record)] sorted by id; assets without
+    an integer id are skipped. The encoding is hashed and reused for the head.
+    """
+    rows = []
+    for a in assets:
+        try:
+            asset_id = int(a.get("id"))
+        except (TypeError, ValueError):
+            continue
+        rec = compact(a)
+        blob = _encode(rec)
+        rows.append((asset_id, record_hash(rec, blob), rec, blob))
+    rows.sort(key=itemgetter(0))
+    return rows
+
+
+def diff_rows(old, new):
+    """
+    Sorted merge of two id-sorted (id, hash, record, ...) streams; yields
+    (id, before, after) for every id that was added, removed or changed.
+    """
+    old, new = iter(old), iter(new)
+    o, n = next(old, None), next(new, None)
+    while o is not None or n is not None:
+        if n is None or (o is not None and o[0] < n[0]):
+            yield o[0], o[2], None
+            o = next(old, None)
+        elif o is None or n[0] < o[0]:
+            yield n[0], None, n[2]
+            n = next(new, None)
+        else:
+            if o[1] != n[1]:
+                yield n[0], o[2], n[2]
+            o, n = next(old, None), next(new, None)
+
+
+class SnapshotStore:
+    """Files of one snapshot history (see module docstring)."""
+
+    def __init__(self, path=None, retention_days=None):
+        self.path = path or config.SNAPSHOT_DIR
+        self.retention_days = config.SNAPSHOT_RETENTION_DAYS if retention_days is None else retention_days
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def lock(self):
+        """Cross-process lock: gunicorn workers and cron may snapshot the same directory."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def manifest(self):
+        try:
+            with open(self._file("manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"snapshots": []}
+
+    def _write_json(self, name, data):
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self._file(name))
+
+    def _write_lines(self, name, lines):
+        """Write JSON lines (objects, or already-encoded str) atomically."""
+        tmp = self._file(name + ".tmp")
+        # level 1: the head is rewritten on every change; size barely differs from 9
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=1) as f:
+            for line in lines:
+                f.write(line if isinstance(line, str) else json.dumps(line, separators=(",", ":"), default=str))
+                f.write("\n")
+        os.replace(tmp, self._file(name))
+
+    def _read_lines(self, name):
+        try:
+            with gzip.open(self._file(name), "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def read_head(self):
+        return self._read_lines("head.jsonl.gz")
+
+    def read_delta(self, name):
+        return self._read_lines(name)
+
+    def take(self, assets, now=None, min_interval=0):
+        """
+        Record a snapshot of `assets`; returns its manifest entry, or None when
+        the last snapshot is younger than min_interval seconds.
+        """
+        now = time.time() if now is None else now
+        with M.span("snapshot_take"):
+            rows = rows_from_assets(assets)
+            with self.lock():
+                manifest = self.manifest()
+                has_head = bool(manifest["snapshots"])
+                if has_head and now - manifest["snapshots"][-1]["ts"] < min_interval:
+                    return None
+                entry = {"ts": now, "assets": len(rows), "file": None, "added": 0, "changed": 0, "removed": 0}
+                changes = list(diff_rows(self.read_head(), rows)) if has_head else None
+                if changes:
+                    for _, before, after in changes:
+                        entry["added" if before is None else "removed" if after is None else "changed"] += 1
+                    entry["file"] = f"delta-{int(now * 1000)}.jsonl.gz"
+                    self._write_lines(entry["file"], (
+                        {"id": i, "before": b, "after": a} for i, b, a in changes))
+                if changes is None or changes:
+                    # an unchanged catalog leaves the head as it is
+                    self._write_lines("head.jsonl.gz", (f'[{i},"{h}",{blob}]' for i, h, _, blob in rows))
+                manifest["snapshots"].append(entry)
+                self._prune(manifest, now)
+                self._write_json("manifest.json", manifest)
+        slog.info("snapshot_taken", assets=entry["assets"], added=entry["added"],
+                  changed=entry["changed"], removed=entry["removed"])
+        return entry
+
+    def _prune(self, manifest, now):
+        if not self.retention_days:
+            return
+        cutoff = now - self.retention_days * 86400
+        keep = []
+        for i, s in enumerate(manifest["snapshots"]):
+            # always keep the newest entry: it describes the current head
+            if s["ts"] >= cutoff or i == len(manifest["snapshots"]) - 1:
+                keep.append(s)
+            elif s["file"]:
+                try:
+                    os.remove(self._file(s["file"]))
+                except FileNotFoundError:
+                    pass
+        manifest["snapshots"] = keep
+
+    def last_ts(self):
+        snaps = self.manifest()["snapshots"]
+        return snaps[-1]["ts"] if snaps else None
+
+    def changes_since(self, since):
+        """
+        Net changes across the snapshots taken after `since` (epoch seconds):
+        {"since", "until", "snapshots", "changes": [{"id", "kind", "fields", "before", "after"}]}.
+        """
+        with M.span("snapshot_diff"):
+            snaps = [s for s in self.manifest()["snapshots"] if s["ts"] > since]
+            # (id, seq, before, after): merged by id, then in snapshot order
+            streams = [
+                ((d["id"], seq, d["before"], d["after"]) for d in self.read_delta(s["file"]))
+                for seq, s in enumerate(snaps) if s["file"]
+            ]
+            changes = []
+            for asset_id, group in groupby(heapq.merge(*streams, key=itemgetter(0, 1)), key=itemgetter(0)):
+                group = list(group)
+                change = classify(asset_id, group[0][2], group[-1][3])
+                if change is not None:
+                    changes.append(change)
+        return {
+            "since": since,
+            "until": snaps[-1]["ts"] if snaps else None,
+            "snapshots": len(snaps),
+            "changes": changes,
+        }
+
+
+def classify(asset_id, before, after):
+    """Net change of one asset over a period, or None if it ended where it started."""
+    if before is None and after is None:
+        return None  # added and removed again inside the period
+    if before is None:
+        return {"id": asset_id, "kind": ["added"], "fields": [], "before": None, "after": after}
+    if after is None:
+        return {"id": asset_id, "kind": ["removed"], "fields": [], "before": before, "after": None}
+    fields = [f for f in SNAPSHOT_FIELDS if before.get(f) != after.get(f)]
+    if not fields:
+        return None
+    kind = [tag for field, tag in TAGS if field in fields] or ["changed"]
+    return {"id": asset_id, "kind": kind, "fields": fields, "before": before, "after": after}
+
+
+STORE = SnapshotStore()
+
+
+def maybe_take_from_index(store=None, interval=None):
+    """Snapshot the installed catalog index if the last snapshot is older than the interval."""
+    store = store or STORE
+    interval = config.SNAPSHOT_INTERVAL_SECONDS if interval is None else interval
+    index = catalog.get_index()
+    if not interval or index is None:
+        return None
+    return store.take(index.all_assets(), min_interval=interval)
+
+
+# ---------------- /asset changes <period> ----------------
+
+_PERIOD_RE = re.compile(r"^(?:last\s+|past\s+)?(\d+)\s*(h|hours?|d|days?|w|weeks?)$")
+
+
+def parse_command(text):
+    """'changes [period]' -> period text (DEFAULT_PERIOD if omitted); None for other commands."""
+    parts = (text or "").split(None, 1)
+    if not parts or parts[0].lower() != "changes":
+        return None
+    return parts[1].strip().lower() if len(parts) > 1 else DEFAULT_PERIOD
+
+
+def period_start(period, now=None):
+    """'24h' / '7d' / '2w' / 'today' / 'this week' / 'this month' -> epoch seconds; ValueError otherwise."""
+    now = now or datetime.now()
+    period = (period or DEFAULT_PERIOD).strip().lower()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "today":
+        return midnight.timestamp()
+    if period == "yesterday":
+        return (midnight - timedelta(days=1)).timestamp()
+    if period in ("this week", "week"):
+        return (midnight - timedelta(days=now.weekday())).timestamp()
+    if period in ("this month", "month"):
+        return midnight.replace(day=1).timestamp()
+    m = _PERIOD_RE.match(period)
+    if not m:
+        raise ValueError(f"unknown period {period!r}; try 24h, 7d, 2w, today, this week or this month")
+    n, unit = int(m.group(1)), m.group(2)[0]
+    return (now - timedelta(hours=n) if unit == "h" else now - timedelta(days=n * (7 if unit == "w" else 1))).timestamp()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Catalog snapshots")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("take", help="scan assets.api and record a snapshot")
+    diff = sub.add_parser("diff", help="print the changes in a period")
+    diff.add_argument("period", nargs="?", default=DEFAULT_PERIOD)
+    args = ap.parse_args()
+
+    if args.cmd == "take":
+        import assetsonar as AS
+        entry = STORE.take(a for page in AS.iter_asset_pages() for a in page)
+        print(json.dumps(entry))
+    else:
+        report = STORE.changes_since(period_start(args.period))
+        for c in report["changes"]:
+            print(c["id"], ",".join(c["kind"]), ",".join(c["fields"]))
+        print(f"{len(report['changes'])} changes across {report['snapshots']} snapshots")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Synthetic member directory shared by the name index benchmark, the fake
+services and the tests: realistic name collisions, romanization variants
+and noisy queries with a known expected member.
+"""
+import random
+
+FIRST_NAMES = [
+    "george", "wei", "jun", "mei", "hui", "xiao", "ming", "li", "jia", "yan",
+    "john", "sarah", "michael", "emily", "david", "priya", "arjun", "siti",
+    "nur", "ahmad", "kevin", "grace", "daniel", "rachel", "ethan", "chloe",
+    "marcus", "natalie", "benjamin", "olivia", "hao", "yu", "ting", "kai",
+]
+LAST_NAMES = [
+    "li", "zhang", "wang", "chen", "huang", "zhou", "xu", "cai", "lin", "wu",
+    "guo", "yang", "zheng", "he", "xie", "liu", "lu", "ye", "tan", "ong",
+    "smith", "johnson", "kumar", "sharma", "rahman", "abdullah", "nguyen",
+    "tran", "kim", "park", "santos", "reyes", "fernandez", "lopez",
+]
+# pinyin -> alternate spellings users actually type
+VARIANTS = {
+    "li": ["lee"], "zhang": ["chang", "cheung"], "wang": ["wong"],
+    "chen": ["chan"], "huang": ["hwang"], "zhou": ["chow", "chou"],
+    "xu": ["hsu"], "cai": ["tsai"], "lin": ["lim"], "guo": ["kwok"],
+    "yang": ["yeung"], "zheng": ["cheng"], "xie": ["hsieh"], "liu": ["lau"],
+}
+SYLLABLES = [
+    "wei", "ming", "jia", "hui", "xiao", "yan", "jun", "mei", "hao", "ting",
+    "zhi", "qiang", "xin", "yu", "fang", "lei", "ling", "hong", "jie", "kai",
+]
+
+
+def _suffix(k: int) -> str:
+    out = ""
+    while k:
+        k, r = divmod(k - 1, 26)
+        out = chr(97 + r) + out
+    return out
+
+
+def synthetic_members(n: int, seed: int = 7):
+    """Members with realistic name collisions and unique email local-parts."""
+    rnd = random.Random(seed)
+    members, seen = [], {}
+    for i in range(n):
+        if rnd.random() < 0.5:
+            first = rnd.choice(SYLLABLES) + rnd.choice(SYLLABLES)
+        else:
+            first = rnd.choice(FIRST_NAMES)
+        last = rnd.choice(LAST_NAMES)
+        local = f"{first}.{last}"
+        dup = seen.get(local, 0)
+        seen[local] = dup + 1
+        if dup:
+            local = f"{local}.{_suffix(dup)}"
+        members.append({
+            "id": i + 1,
+            "first_name": first.title(),
+            "last_name": last.title(),
+            "email": f"{local}@example.com",
+        })
+    return members
+
+
+def _typo(word: str, rnd: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rnd.randrange(1, len(word) - 1)
+    op = rnd.choice(("swap", "drop", "dup"))
+    if op == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i] + word[i:]
+
+
+def noisy_queries(members, count: int, seed: int = 11):
+    """[(query, expected_member)] with one kind of noise per query."""
+    rnd = random.Random(seed)
+    out = []
+    for m in rnd.sample(members, count):
+        first, last = m["first_name"].lower(), m["last_name"].lower()
+        kind = rnd.choice(("typo", "variant", "swap", "email"))
+        if kind == "typo":
+            q = f"{_typo(first, rnd)} {last}"
+        elif kind == "variant" and last in VARIANTS:
+            q = f"{first} {rnd.choice(VARIANTS[last])}"
+        elif kind == "swap":
+            q = f"{last} {first}"
+        else:
+            local = m["email"].split("@")[0].split(".")
+            local[0] = _typo(local[0], rnd)
+            q = ".".join(local)
+        out.append((q, m))
+    return out
+
+
+def same_person(a, b):
+    # Names collide in a large directory; a hit is any member with the same name.
+    return (a["first_name"], a["last_name"]) == (b["first_name"], b["last_name"])
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+
+import pytest
+from slack_sdk.web.async_client import AsyncWebClient
+
+import assetsonar_async as ASA
+import config
+import dedupe as DD
+import fake_services
+import idcache as IDC
+import slack_upload
+from progress import async_slack_progress
+
+
+@pytest.fixture(scope="module")
+def fake():
+    server = fake_services.start(n_assets=450)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def as_client(fake, monkeypatch):
+    monkeypatch.setattr(ASA.AS, "BASE_URL", fake.base_url)
+    ASA.refresh_member_directory()
+    IDC.CACHE.clear()
+    yield ASA
+    ASA.refresh_member_directory()
+    IDC.CACHE.clear()
+
+
+def _run(coro):
+    """One event loop per test; the pooled aiohttp session belongs to it."""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await ASA.close()
+    return asyncio.run(_main())
+
+
+def test_concurrent_scan_follows_total_pages(as_client):
+    pages = []
+    found = _run(as_client._scan_assets(lambda a: True, limit=200, progress=lambda p, t, m: pages.append((p, t))))
+    assert len(found) == 450
+    assert sorted(pages) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_email_fast_path_uses_server_filters(as_client, fake):
+    owned = next(a for a in fake.catalog.assets if a["assigned_to_user_email"])
+    email = owned["assigned_to_user_email"]
+    res = _run(as_client.find_user_assets(email))
+    expected = {a["id"] for a in fake.catalog.assets if a["assigned_to_user_email"] == email}
+    assert {a["id"] for a in res["assets"]} == expected
+
+
+def test_concurrent_first_searches_build_one_index(as_client, fake, monkeypatch):
+    builds = []
+    real = ASA.NameIndex
+    monkeypatch.setattr(ASA, "NameIndex", lambda members: builds.append(1) or real(members))
+    member = fake.catalog.members[3]
+    name = f"{member['first_name']} {member['last_name']}"
+
+    async def _searches():
+        return await asyncio.gather(*(as_client.search_members_by_name(name) for _ in range(5)))
+
+    results = _run(_searches())
+    assert len(builds) == 1
+    assert all(member["id"] in {m["id"] for m in r} for r in results)
+
+
+def test_member_update_reaches_the_async_index(as_client, fake):
+    member = fake.catalog.members[5]
+    renamed = dict(member, first_name="Quentin", last_name="Abernathy")
+
+    async def _update_then_search():
+        await as_client.search_members_by_name("warm the index")
+        as_client.update_member(member["id"], renamed)
+        return await as_client.search_members_by_name("Quentin Abernathy")
+
+    assert [m["id"] for m in _run(_update_then_search())] == [member["id"]]
+
+
+def test_hydration_copies_rows_and_skips_failures(as_client, fake):
+    as_client.AS.refresh_custom_field_names()
+    rows = [{"id": a["id"]} for a in fake.catalog.assets[:3]] + [{"id": 10**9}]
+
+    async def _resolve_then_hydrate():
+        fields = await as_client.resolve_fields(["cost center", "purchase_date"])
+        return fields, await as_client.hydrate_custom_fields(rows, fields)
+
+    fields, hydrated = _run(_resolve_then_hydrate())
+    as_client.AS.refresh_custom_field_names()
+    assert fields == ["Cost Center"]
+    assert all(as_client.FL.custom_field_value(r, "Cost Center") for r in hydrated[:3])
+    assert hydrated[3] is rows[3]
+    assert not any("custom_fields" in r for r in rows)
+
+
+@pytest.fixture
+def app_async(fake, as_client, monkeypatch):
+    # AsyncApp wants a token and signing secret at import; uploads go to the fake
+    monkeypatch.setattr(config, "SLACK_BOT_TOKEN", "xoxb-fake")
+    monkeypatch.setattr(config, "SLACK_SIGNING_SECRET", "fake-secret")
+    monkeypatch.setattr(slack_upload, "SLACK_API_URL", f"{fake.base_url}/api/")
+    monkeypatch.setattr(slack_upload, "_async_client", None)
+    # per-process registry, so reruns within the TTL are not redeliveries
+    monkeypatch.setattr(DD, "REGISTRY", DD.JobRegistry())
+    import app_async
+    return app_async
+
+
+def _events(fake, since):
+    with fake.stats_lock:
+        return [e for e in fake.events if e["t"] > since]
+
+
+async def _noop_ack(*args, **kwargs):
+    return None
+
+
+def _command(app_async, fake, text, trigger_id):
+    client = AsyncWebClient(token="xoxb-fake", base_url=f"{fake.base_url}/api/")
+    body = {"text": text, "channel_id": "C1", "user_id": "U1", "trigger_id": trigger_id}
+    return _run(app_async.handle_asset_command(
+        ack=_noop_ack, body=body, client=client, logger=logging.getLogger("test")))
+
+
+def test_handler_posts_results_and_csv(app_async, fake):
+    since = time.time()
+    uploads = fake.stats.get("slack:files.completeUploadExternal", 0)
+    _command(app_async, fake, "SG devices", "async-handler-1")
+
+    texts = [e["text"] for e in _events(fake, since)]
+    assert texts[0] == ":mag: Searching, please wait..."
+    assert "✅ Search completed. See results in thread" in texts
+    assert "Search results" in texts
+    assert any(t and t.startswith("📎 [Download CSV here]") for t in texts)
+    assert fake.stats.get("slack:files.completeUploadExternal", 0) == uploads + 1
+
+
+def test_handler_ignores_redelivery(app_async, fake):
+    owned = next(a for a in fake.catalog.assets if a["assigned_to_user_email"])
+    _command(app_async, fake, owned["assigned_to_user_email"], "async-handler-2")
+    since = time.time()
+    _command(app_async, fake, owned["assigned_to_user_email"], "async-handler-2")
+    assert _events(fake, since) == []
+
+
+def test_known_retries_are_acked_before_bolt(app_async):
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+
+    reached = []
+
+    async def _bolt(request):
+        reached.append(await request.text())
+        return web.Response(text="bolt")
+
+    web_app = web.Application(middlewares=[app_async.ack_known_retries])
+    web_app.router.add_post("/slack/events", _bolt)
+    taken = "command=%2Fasset&text=SG&trigger_id=retry-1"
+    DD.REGISTRY.claim(DD.key_from_raw(taken))
+
+    fresh = "command=%2Fasset&text=SG&trigger_id=retry-2"
+
+    async def _posts():
+        out = []
+        async with TestClient(TestServer(web_app)) as http:
+            for body, retry in ((taken, True), (fresh, True), (taken, False)):
+                resp = await http.post("/slack/events", data=body, headers={
+                    "Content-Type": "application/x-www-form-urlencoded", **({"X-Slack-Retry-Num": "1"} if retry else {})})
+                out.append((resp.status, resp.headers.get("X-Slack-No-Retry"), await resp.text()))
+        return out
+
+    acked, fresh_retry, first_delivery = asyncio.run(_posts())
+    assert acked == (200, "1", "")
+    assert fresh_retry[2] == first_delivery[2] == "bolt"
+    assert reached == [fresh, taken]
+
+
+def test_progress_updates_settle_before_final_update():
+    calls = []
+
+    class _Client:
+        async def chat_update(self, channel, ts, text):
+            await asyncio.sleep(0.05)
+            calls.append(text)
+
+        async def chat_postMessage(self, **kwargs):
+            raise RuntimeError("slack down")
+
+    async def _scan():
+        progress = async_slack_progress(_Client(), "C1", "1.0", "title")
+        progress.interval = 0
+        progress.first_screen = 1
+        progress(1, 3, [{"id": 1, "name": "x"}])  # posts the first screen (fails) and an update
+        await progress.settle()
+        calls.append("final")
+        return progress
+
+    progress = asyncio.run(_scan())
+    assert calls == [progress.status_text(), "final"]
+    assert not progress._tasks
@@ -0,0 +1,61 @@
+import json
+from urllib.parse import urlencode
+
+from dedupe import JobRegistry, delivery_key, key_from_raw
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_redelivery_attaches_until_ttl():
+    clock = _Clock()
+    reg = JobRegistry(ttl=60, clock=clock)
+    job, new = reg.claim("trigger_id:1")
+    assert new and job.state == "running"
+
+    again, new = reg.claim("trigger_id:1")
+    assert not new and again is job
+
+    reg.finish("trigger_id:1")
+    assert reg.claim("trigger_id:1")[0].state == "done"
+
+    clock.now = 61
+    assert not reg.seen("trigger_id:1")
+    assert reg.claim("trigger_id:1")[1]
+
+
+def test_raw_and_parsed_keys_agree():
+    command = {"command": "/asset", "text": "SG000001", "trigger_id": "123.456.abc"}
+    action = {"type": "block_actions", "trigger_id": "789.1.def", "actions": []}
+    event = {"type": "event_callback", "event_id": "Ev01"}
+
+    assert key_from_raw(urlencode(command)) == delivery_key(command) == "trigger_id:123.456.abc"
+    assert key_from_raw(urlencode({"payload": json.dumps(action)})) == delivery_key(action)
+    assert key_from_raw(json.dumps(event)) == "event_id:Ev01"
+
+
+def test_claims_are_shared_through_the_db_file(tmp_path):
+    clock = _Clock()
+    path = str(tmp_path / "dedupe.sqlite3")
+    one = JobRegistry(ttl=60, clock=clock, path=path)
+    two = JobRegistry(ttl=60, clock=clock, path=path)
+
+    assert one.claim("trigger_id:1")[1]
+    job, new = two.claim("trigger_id:1")
+    assert not new and job.state == "running" and job.channel_id is None
+    assert two.seen("trigger_id:1")
+
+    one.finish("trigger_id:1")
+    assert two.claim("trigger_id:1")[0].state == "done"
+
+    clock.now = 61
+    assert not two.seen("trigger_id:1")
+    assert two.claim("trigger_id:1")[1]
+    assert not one.claim("trigger_id:1")[1]
+    one.close()
+    two.close()
@@ -0,0 +1,75 @@
+import csv
+import gzip
+import os
+
+import pytest
+
+import assetsonar as AS
+import deadline as DL
+import export as EX
+import fake_services
+
+
+@pytest.fixture(scope="module")
+def fake():
+    server = fake_services.start(n_assets=1000)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def uploads(fake, monkeypatch):
+    """Upload calls as (title, rows, path), read before export deletes the chunk."""
+    monkeypatch.setattr(AS, "BASE_URL", fake.base_url)
+    calls = []
+
+    def _upload(path, channel_id, title=None, thread_ts=None):
+        with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+            calls.append((title, list(csv.reader(f)), path))
+        return f"https://files.example/{len(calls)}"
+
+    monkeypatch.setattr(EX, "upload_csv_to_slack", _upload)
+    return calls
+
+
+def test_export_chunks_every_asset_in_page_order(fake, uploads):
+    summary = EX.export_inventory("C1", "1.0", workers=3, chunk_rows=300)
+
+    assert (summary["assets"], summary["chunks"], summary["truncated"]) == (1000, 4, None)
+    assert [title for title, _, _ in uploads] == [f"Inventory export part {n}" for n in range(1, 5)]
+    assert all(rows[0] == EX.EXPORT_COLUMNS for _, rows, _ in uploads)
+    ids = [int(r[0]) for _, rows, _ in uploads for r in rows[1:]]
+    assert ids == [a["id"] for a in fake.catalog.assets]
+    assert len(summary["permalinks"]) == 4
+    assert not any(os.path.exists(path) for _, _, path in uploads)
+
+
+def test_page_fetches_in_pool_threads_honour_the_deadline(fake, uploads, monkeypatch):
+    fetch = EX._fetch_page
+
+    def _fetch_then_expire(page):
+        data = fetch(page)
+        if page == 1:
+            DL.current().expires_at = 0  # spent once page 1 is in
+        return data
+
+    monkeypatch.setattr(EX, "_fetch_page", _fetch_then_expire)
+    token = DL.start(30)
+    try:
+        summary = EX.export_inventory("C1", "1.0", workers=2, chunk_rows=300)
+    finally:
+        DL.reset(token)
+
+    assert summary["truncated"] == (1, 5)
+    assert summary["assets"] == EX.EXPORT_PAGE_LIMIT
+    assert sum(len(rows) - 1 for _, rows, _ in uploads) == EX.EXPORT_PAGE_LIMIT
+    assert "incomplete" in EX.summary_text(summary)
+
+
+def test_export_is_not_bound_by_the_command_deadline(fake, uploads):
+    token = DL.start(0)  # the /asset command's budget is already spent
+    try:
+        summary = EX.export_inventory("C1", "1.0", workers=2, chunk_rows=300)
+    finally:
+        DL.reset(token)
+    assert (summary["assets"], summary["truncated"]) == (1000, None)
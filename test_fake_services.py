@@ -0,0 +1,134 @@
+import pytest
+
+import assetsonar as AS
+import catalog
+import deadline as DL
+import fake_services
+import idcache as IDC
+
+
+@pytest.fixture(scope="module")
+def fake():
+    server = fake_services.start(n_assets=450)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def as_client(fake, monkeypatch):
+    monkeypatch.setattr(AS, "BASE_URL", fake.base_url)
+    AS.refresh_member_directory()
+    IDC.CACHE.clear()
+    yield AS
+    AS.refresh_member_directory()
+    IDC.CACHE.clear()
+    catalog.set_index(None)
+
+
+def test_scan_follows_total_pages(as_client, fake):
+    pages = []
+    found = as_client.scan_assets(lambda a: True, limit=200, progress=lambda p, t, m: pages.append((p, t)))
+    assert len(found) == 450
+    assert pages == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_email_fast_path_uses_server_filters(as_client, fake):
+    owned = next(a for a in fake.catalog.assets if a["assigned_to_user_email"])
+    email = owned["assigned_to_user_email"]
+    res = as_client.find_user_assets(email)
+    expected = {a["id"] for a in fake.catalog.assets if a["assigned_to_user_email"] == email}
+    assert {a["id"] for a in res["assets"]} == expected
+
+
+def test_spent_budget_returns_partial_scan(as_client, fake):
+    def expire_after_first_page(page, total_pages, matched):
+        DL.current().expires_at = 0
+
+    token = DL.start(30)
+    try:
+        with pytest.raises(DL.DeadlineExceeded) as exc:
+            as_client.scan_assets(lambda a: True, limit=200, progress=expire_after_first_page)
+    finally:
+        DL.reset(token)
+    assert len(exc.value.partial) == 200
+    assert (exc.value.pages_done, exc.value.total_pages) == (1, 3)
+
+
+def _as_calls(fake):
+    with fake.stats_lock:
+        return sum(v for k, v in fake.stats.items() if k.startswith("assetsonar:"))
+
+
+def test_unknown_serial_scans_once_then_hits_cache(as_client, fake):
+    before = _as_calls(fake)
+    assert as_client.find_user_assets("C02NOSUCH99")["assets"] == []
+    first = _as_calls(fake) - before
+    assert first > 3  # search.api + every assets.api page
+
+    before = _as_calls(fake)
+    assert as_client.find_user_assets("C02NOSUCH99")["assets"] == []
+    assert _as_calls(fake) == before
+
+
+def test_catalog_snapshot_answers_identifiers(as_client, fake):
+    catalog.set_index(catalog.CatalogIndex(fake.catalog.assets))
+    wanted = fake.catalog.assets[7]
+    before = _as_calls(fake)
+    res = as_client.find_user_assets(wanted["bios_serial_number"])
+    assert [a["id"] for a in res["assets"]] == [wanted["id"]]
+    assert _as_calls(fake) == before
+
+    # a snapshot miss is not proof (new asset, partial serial): the API decides, once
+    assert as_client.find_user_assets("ZZ999999")["assets"] == []
+    assert _as_calls(fake) > before
+    before = _as_calls(fake)
+    assert as_client.find_user_assets("ZZ999999")["assets"] == []
+    assert _as_calls(fake) == before
+
+
+def test_custom_field_hydration_is_capped(as_client, fake, monkeypatch):
+    rows = [{"id": a["id"]} for a in fake.catalog.assets[:5]]
+    before = _as_calls(fake)
+    hydrated = as_client.hydrate_custom_fields(rows, ["Warranty Expiry"])
+    assert _as_calls(fake) - before == 5
+    assert all(AS.FL.custom_field_value(r, "Warranty Expiry") for r in hydrated)
+    assert not any("custom_fields" in r for r in rows)
+
+    monkeypatch.setattr(AS, "HYDRATE_MAX_ROWS", 3)
+    before = _as_calls(fake)
+    assert as_client.hydrate_custom_fields(rows, ["Warranty Expiry"]) is rows
+    assert _as_calls(fake) == before
+
+
+def test_custom_field_hydration_skips_rows_that_fail(as_client, fake):
+    rows = [{"id": a["id"]} for a in fake.catalog.assets[:3]] + [{"id": 10**9}]
+    hydrated = as_client.hydrate_custom_fields(rows, ["Warranty Expiry"])
+    assert [r["id"] for r in hydrated] == [r["id"] for r in rows]
+    assert all("custom_fields" in r for r in hydrated[:3])
+    assert hydrated[3] is rows[3]
+
+
+def test_custom_field_hydration_runs_under_the_deadline(as_client, fake):
+    rows = [{"id": a["id"]} for a in fake.catalog.assets[:5]]
+    token = DL.start(30)
+    DL.current().expires_at = 0
+    try:
+        with pytest.raises(DL.DeadlineExceeded) as exc:
+            as_client.hydrate_custom_fields(rows, ["Warranty Expiry"])
+    finally:
+        DL.reset(token)
+    assert [r["id"] for r in exc.value.partial] == [r["id"] for r in rows]
+
+
+def test_fields_resolve_against_the_account(as_client, fake):
+    as_client.refresh_custom_field_names()
+    before = _as_calls(fake)
+    assert as_client.resolve_fields(["asset_name", "status"]) == ["asset_name", "status"]
+    assert _as_calls(fake) == before
+
+    resolved = as_client.resolve_fields(["asset_name", "cost center", "purchase_date"])
+    assert resolved == ["asset_name", "Cost Center"]
+    assert _as_calls(fake) - before == 1
+    as_client.resolve_fields(["assignee"])
+    assert _as_calls(fake) - before == 1
+    as_client.refresh_custom_field_names()
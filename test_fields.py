@@ -0,0 +1,43 @@
+import csv
+
+import fields as FL
+import formatting as FX
+
+ASSET = {
+    "id": 1, "name": "Dell Latitude 7440", "identifier": "SG000001", "bios_serial_number": "ABC123",
+    "purchased_on": "2022-01-01", "location_name": "SG", "status": "in_use", "group_name": "Laptops",
+    "assigned_to_user_name": "Ana Lim", "assigned_to_user_email": "ana.lim@example.com",
+    "custom_fields": [{"name": "Warranty", "value": "2025-01-01"}],
+}
+
+
+def test_known_attributes_are_not_custom_fields():
+    fields = ["asset_name", "location", "Status", "group_name", "Warranty"]
+    assert FL.custom_fields_of(fields) == ["Warranty"]
+    assert not FL.needs_custom_fields(["asset_name", "location", "status", "group_name"])
+
+
+def test_resolve_keeps_only_the_accounts_custom_fields():
+    fields = ["asset_name", "warranty expiry", "purchase_date", "assignee", "Status"]
+    assert FL.resolve(fields, {"Warranty Expiry", "Cost Center"}) == ["asset_name", "Warranty Expiry", "Status"]
+    assert FL.resolve(["model"], {"Cost Center"}) == []
+    assert FL.resolve(None, ()) is None
+
+
+def test_csv_header_matches_row_columns(tmp_path):
+    fields = ["Warranty", "asset_name", "assigned_to_user_name", "location"]
+    blocks, path = FX.format_assets_list("t", [dict(ASSET, id=i) for i in range(11)], fields=fields)
+    with open(path, newline="", encoding="utf-8") as f:
+        header, first = list(csv.reader(f))[:2]
+    row = dict(zip(header, first))
+    assert header == ["asset_name", "assigned_to_user_name", "assigned_to_user_email", "location", "Warranty"]
+    assert row["Warranty"] == "2025-01-01"
+    assert row["assigned_to_user_email"] == "ana.lim@example.com"
+    assert row["location"] == "SG"
+
+
+def test_sections_show_builtins_and_custom_fields():
+    blocks, path = FX.format_assets_list("t", [ASSET], fields=["ain", "status", "Warranty"])
+    assert path is None
+    text = blocks[2]["text"]["text"]
+    assert "*AIN*: SG000001" in text and "*status*: in_use" in text and "*Warranty*: 2025-01-01" in text
@@ -0,0 +1,58 @@
+import assetsonar as AS
+import catalog
+import idcache as IDC
+from catalog import CatalogIndex
+from idcache import LookupCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_misses_expire_before_hits():
+    clock = _Clock()
+    cache = LookupCache(hit_ttl=300, miss_ttl=60, clock=clock)
+    cache.put("sg000001", [{"id": 1}])
+    cache.put("C02NOPE123", [])
+
+    assert cache.get("SG000001 ") == [{"id": 1}]
+    assert cache.get("c02nope123") == []
+    assert cache.get("SG000002") is None
+
+    clock.now = 61
+    assert cache.get("C02NOPE123") is None
+    assert cache.get("SG000001") == [{"id": 1}]
+    clock.now = 301
+    assert cache.get("SG000001") is None
+
+
+def test_catalog_identifier_index_tracks_updates():
+    index = CatalogIndex([
+        {"id": 1, "identifier": "SG000001", "bios_serial_number": "C02AAA111"},
+        {"id": 2, "identifier": "SG000002", "bios_serial_number": None},
+    ])
+    assert [a["id"] for a in index.find_identifier("c02aaa111")] == [1]
+    assert [a["id"] for a in index.find_identifier("sg000002")] == [2]
+
+    index.add({"id": 1, "identifier": "SG000001", "bios_serial_number": "C02BBB222"})
+    assert index.find_identifier("C02AAA111") == []
+    assert [a["id"] for a in index.find_identifier("C02BBB222")] == [1]
+
+    index.remove(2)
+    assert index.find_identifier("SG000002") == []
+
+
+def test_index_miss_falls_through_to_search(monkeypatch):
+    monkeypatch.setattr(catalog, "_current", CatalogIndex([
+        {"id": 1, "identifier": "SG000001", "bios_serial_number": "C02AAA111", "name": "SG000002 spare"},
+    ]))
+    monkeypatch.setattr(IDC, "CACHE", LookupCache())
+    for query in ("SG000002", "Jonathan", "C02AAA"):
+        assert AS._known_identifier(query) is None
+        assert IDC.CACHE.get(query) is None
+    assert [a["id"] for a in AS._known_identifier("c02aaa111")] == [1]
+    assert [a["id"] for a in IDC.CACHE.get("C02AAA111")] == [1]
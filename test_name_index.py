@@ -0,0 +1,92 @@
+from name_index import NameIndex, edit_distance
+from synthetic import noisy_queries, same_person, synthetic_members
+
+DIRECTORY = [
+    {"id": 1, "first_name": "George", "last_name": "Li", "email": "george.li@example.com"},
+    {"id": 2, "first_name": "George", "last_name": "Lim", "email": "george.lim@example.com"},
+    {"id": 3, "first_name": "Wei", "last_name": "Zhang", "email": "wei.zhang@example.com"},
+    {"id": 4, "first_name": "Mei Ling", "last_name": "Chen", "email": "meiling.chen@example.com"},
+    {"id": 5, "first_name": "Siti", "last_name": "Rahman", "email": "siti.rahman@example.com"},
+    {"id": 6, "first_name": "José", "last_name": "Reyes", "email": "jose.reyes@example.com"},
+    {"id": 7, "first_name": "Kevin", "last_name": "Wong", "email": "kevin.wong@example.com"},
+    {"id": 8, "first_name": "Hui", "last_name": "Ting", "email": "huiting@example.com"},
+]
+
+# query -> member id expected as the top hit
+RECALL_SET = [
+    ("George Li", 1),
+    ("Goerge Li", 1),        # transposition
+    ("George Lee", 1),       # romanization variant
+    ("Li George", 1),        # name order
+    ("Zhang Wei", 3),
+    ("Wei Chang", 3),
+    ("Meiling Chan", 4),
+    ("Mei Ling Chen", 4),
+    ("Sitti Rahmen", 5),
+    ("Jose Reyes", 6),       # accent folding
+    ("Kevin Wang", 7),
+    ("Kevn Wong", 7),
+    ("george.lim", 2),
+    ("hui ting", 8),
+]
+
+
+def test_edit_distance():
+    assert edit_distance("goerge", "george") == 1
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("abc", "abcdef", max_dist=1) == 2
+
+
+def test_recall_set_top1():
+    index = NameIndex(DIRECTORY)
+    for query, expected in RECALL_SET:
+        res = index.search(query, limit=1)
+        assert res and res[0][1]["id"] == expected, (query, res)
+
+
+def test_recall_with_distractors():
+    members = synthetic_members(5000) + DIRECTORY
+    index = NameIndex(members)
+    by_id = {m["id"]: m for m in DIRECTORY}
+    for query, expected in RECALL_SET:
+        res = index.search(query, limit=5)
+        # synthetic directory has its own Kevins and Georges
+        assert any(same_person(m, by_id[expected]) for _, m in res), (query, res)
+
+    queries = noisy_queries(members, 200)
+    hits = sum(
+        any(same_person(m, e) for _, m in index.search(q, limit=5))
+        for q, e in queries
+    )
+    assert hits / len(queries) >= 0.95
+
+
+def test_upsert_and_remove_match_a_rebuild():
+    index = NameIndex(DIRECTORY)
+    renamed = {"id": 7, "first_name": "Kevin", "last_name": "Tan", "email": "kevin.tan@example.com"}
+    added = {"id": 9, "first_name": "Priya", "last_name": "Nair", "email": "priya.nair@example.com"}
+    index.upsert(renamed)
+    index.upsert(added)
+    index.remove(3)
+
+    rebuilt = NameIndex([m for m in DIRECTORY if m["id"] not in (3, 7)] + [renamed, added])
+    assert len(index) == len(rebuilt) == len(DIRECTORY)
+    for query in ("Kevin Tan", "Kevin Wong", "Priya Nair", "Wei Zhang", "George Li"):
+        assert [m["id"] for _, m in index.search(query)] == [m["id"] for _, m in rebuilt.search(query)], query
+    assert 3 not in [m["id"] for _, m in index.search("Wei Zhang")]
+
+
+def test_romanization_is_a_surname_bonus_only():
+    index = NameIndex([
+        {"id": 1, "first_name": "Hui", "last_name": "Ling", "email": "hui.ling@example.com"},
+        {"id": 2, "first_name": "Xu", "last_name": "Ling", "email": "xu.ling@example.com"},
+        {"id": 3, "first_name": "George", "last_name": "Li", "email": "george.li@example.com"},
+        {"id": 4, "first_name": "George", "last_name": "Lee", "email": "george.lee@example.com"},
+    ])
+    # given names are not folded: "Xu Ling" is not "Hui Ling"
+    assert [m["id"] for _, m in index.search("Xu Ling")][:1] == [2]
+    assert 1 not in [m["id"] for _, m in index.search("Xu Ling")]
+    # a surname variant still matches, below the exact spelling
+    ranked = index.search("George Lee")
+    assert [m["id"] for _, m in ranked][:2] == [4, 3]
+    assert ranked[0][0] > ranked[1][0]
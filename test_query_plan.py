@@ -0,0 +1,99 @@
+from datetime import date
+
+import pytest
+
+import catalog
+import intent
+import query_plan as QP
+
+TODAY = date(2026, 1, 1)
+
+ASSETS = [
+    {"id": 1, "name": "Lenovo ThinkPad T14 Laptop", "group_name": "Windows", "location_name": "SG", "purchased_on": "2021-06-01"},
+    {"id": 2, "name": "Lenovo ThinkPad X1 Laptop", "group_name": "Windows", "location_name": "TW", "purchased_on": "2020-02-01"},
+    {"id": 3, "name": "Apple MacBook Pro", "group_name": "Mac", "location_name": "SG", "purchased_on": "2019-03-01"},
+    {"id": 4, "name": "Lenovo Monitor", "group_name": "Peripherals", "location_name": "SG", "purchased_on": "2018-01-01"},
+    {"id": 5, "name": "Lenovo ThinkPad E14 Laptop", "group_name": "Windows", "location_name": "SG", "purchased_on": "2025-05-01"},
+    {"id": 6, "name": "Dell Latitude Laptop", "group_name": "Windows", "location_name": "sg", "purchased_on": None},
+]
+
+
+def _plan(**slots):
+    return QP.plan_from_intent(slots, today=TODAY)
+
+
+def test_compound_single_pass():
+    plan = _plan(intent="asset_query", vendor="lenovo", device_kind="laptop", min_years=3, location="SG")
+    pages = [ASSETS[:3], ASSETS[3:]]
+    assert [a["id"] for a in plan.execute(pages)] == [1]
+
+
+def test_old_laptops_defaults_to_known_vendors():
+    plan = _plan(intent="old_laptops", years=3)
+    assert [a["id"] for a in plan.execute([ASSETS])] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("phrase, old_route", [
+    ("laptops older than 3 years", dict(intent="old_laptops", years=3)),
+    ("筆電 3年以上", dict(intent="old_laptops", years=3)),
+    ("lenovo laptops older than 1 years in SG", dict(intent="old_laptops", years=1, vendor="lenovo", location="SG")),
+])
+def test_rule_route_matches_old_laptops(phrase, old_route):
+    assets = ASSETS + [
+        {"id": 7, "name": "Apple MacBook Pro 14", "group_name": "Mac", "location_name": "SG", "purchased_on": "2020-01-01"},
+        {"id": 8, "name": "Dell OptiPlex Desktop", "group_name": "Windows", "location_name": "TW", "purchased_on": "2019-01-01"},
+    ]
+    routed = _plan(**intent._rule_intent(phrase)).execute([assets])
+    assert [a["id"] for a in routed] == [a["id"] for a in _plan(**old_route).execute([assets])]
+    assert routed
+
+
+def test_generic_laptop_kind_covers_old_laptops_kinds():
+    plan = _plan(intent="asset_query", device_kind="laptop", location="SG")
+    assert plan.match({"name": "Apple MacBook Pro 14", "group_name": "Mac", "location_name": "SG"})
+    assert not _plan(intent="asset_query", device_kind="desktop", location="SG").match(
+        {"name": "Apple MacBook Pro 14", "group_name": "Mac", "location_name": "SG"})
+
+
+def test_selective_cheap_predicates_run_first():
+    plan = _plan(intent="asset_query", vendor="lenovo", min_years=3, location="SG")
+    assert isinstance(plan.predicates[0], QP.LocationPredicate)
+    assert isinstance(plan.predicates[-1], QP.AgeRangePredicate)
+
+
+def test_index_matches_scan():
+    index = catalog.CatalogIndex(ASSETS)
+    for slots in (
+        dict(intent="location_assets", location="sg"),
+        dict(intent="asset_query", vendor="lenovo", location="SG", min_years=1),
+        dict(intent="group_assets", group="mac"),
+        dict(intent="age_assets", years=5),
+    ):
+        plan = _plan(**slots)
+        scanned = sorted(a["id"] for a in plan.execute([ASSETS]))
+        indexed = sorted(a["id"] for a in plan.execute_index(index))
+        assert scanned == indexed, slots
+
+
+def test_vendor_index_agrees_with_scan():
+    assets = ASSETS + [
+        {"id": 7, "name": "Microsoft Surface Laptop", "group_name": "Windows", "location_name": "SG"},
+        {"id": 8, "name": "HP USB-C Dock for Dell", "group_name": "Peripherals", "location_name": "SG"},
+    ]
+    index = catalog.CatalogIndex(assets)
+    for vendor in ("microsoft", "hp", "dell"):
+        plan = _plan(intent="vendor_assets", vendor=vendor)
+        scanned = sorted(a["id"] for a in plan.execute([assets]))
+        assert sorted(a["id"] for a in plan.execute_index(index)) == scanned, vendor
+    assert sorted(a["id"] for a in _plan(intent="vendor_assets", vendor="hp").execute_index(index)) == [8]
+
+
+def test_missing_slot_raises_instead_of_matching_everything():
+    for slots in (
+        dict(intent="location_assets"),
+        dict(intent="vendor_assets"),
+        dict(intent="group_assets", group=""),
+        dict(intent="asset_query"),
+    ):
+        with pytest.raises(QP.MissingSlot):
+            _plan(**slots)
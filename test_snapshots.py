@@ -0,0 +1,80 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import formatting as FX
+import snapshots as SN
+
+
+def _asset(i, **kw):
+    a = {"id": i, "identifier": f"SG{i:06d}", "name": "Dell Latitude", "location_name": "SG",
+         "status": "in_use", "assigned_to_user_id": 1, "assigned_to_user_name": "A",
+         "assigned_to_user_email": "a@example.com"}
+    a.update(kw)
+    return a
+
+
+def _delta_ids(store, entry):
+    with gzip.open(os.path.join(store.path, entry["file"]), "rt") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def test_diff_rows_is_a_sorted_merge():
+    old = SN.rows_from_assets([_asset(1), _asset(2), _asset(4)])
+    new = SN.rows_from_assets([_asset(4), _asset(3), _asset(1, location_name="MY")])
+    assert [(i, b is None, a is None) for i, b, a in SN.diff_rows(old, new)] == [
+        (1, False, False), (2, False, True), (3, True, False)]
+
+
+def test_deltas_hold_only_changes_and_reports_net_them(tmp_path):
+    store = SN.SnapshotStore(str(tmp_path), retention_days=0)
+    catalog = {i: _asset(i) for i in range(1, 1001)}
+    assert store.take(catalog.values(), now=100)["file"] is None  # baseline
+
+    catalog[5] = _asset(5, assigned_to_user_id=2, assigned_to_user_name="B")
+    catalog[6] = _asset(6, location_name="TH")
+    catalog[2000] = _asset(2000)
+    e1 = store.take(catalog.values(), now=200)
+    assert (e1["added"], e1["changed"], e1["removed"]) == (1, 2, 0)
+    assert _delta_ids(store, e1) == [5, 6, 2000]
+
+    catalog[6] = _asset(6)                       # moved back
+    del catalog[2000]                            # added and removed inside the period
+    catalog[5] = _asset(5, assigned_to_user_id=3, assigned_to_user_name="C")
+    del catalog[7]
+    store.take(catalog.values(), now=300)
+    head = os.path.join(store.path, "head.jsonl.gz")
+    written = os.stat(head).st_mtime_ns
+    assert store.take(catalog.values(), now=400)["file"] is None
+    assert os.stat(head).st_mtime_ns == written  # nothing changed, head left alone
+
+    report = store.changes_since(150)
+    assert report["snapshots"] == 3
+    by_id = {c["id"]: c for c in report["changes"]}
+    assert sorted(by_id) == [5, 7]
+    assert by_id[5]["kind"] == ["reassigned"]
+    assert (by_id[5]["before"]["assigned_to_user_name"], by_id[5]["after"]["assigned_to_user_name"]) == ("A", "C")
+    assert by_id[7]["kind"] == ["removed"]
+
+    # only the last snapshot's delta
+    assert [c["id"] for c in store.changes_since(250)["changes"]] == [5, 6, 7, 2000]
+
+    blocks, csv_path = FX.format_changes("changes", report)
+    with open(csv_path) as f:
+        assert len(f.readlines()) == 3
+    os.remove(csv_path)
+
+
+def test_periods():
+    now = datetime(2026, 10, 21, 15, 30)  # a Wednesday
+    assert SN.parse_command("changes this week") == "this week"
+    assert SN.parse_command("changes") == SN.DEFAULT_PERIOD
+    assert SN.parse_command("changed laptops") is None
+    assert SN.period_start("this week", now) == datetime(2026, 10, 19).timestamp()
+    assert SN.period_start("2d", now) == datetime(2026, 10, 19, 15, 30).timestamp()
+    assert SN.period_start("last 24 hours", now) == datetime(2026, 10, 20, 15, 30).timestamp()
+    with pytest.raises(ValueError):
+        SN.period_start("since forever", now)
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from slack_sdk import WebClient
+from slack_sdk.web.async_client import AsyncWebClient
+
+import assetsonar as AS
+import fake_services
+import usermap as UM
+
+
+@pytest.fixture
+def fake(monkeypatch, tmp_path):
+    server = fake_services.start(n_assets=300)
+    monkeypatch.setattr(AS, "BASE_URL", server.base_url)
+    monkeypatch.setattr(UM, "MAP", UM.UserMap(str(tmp_path / "usermap.sqlite3")))
+    yield server
+    UM.MAP.close()
+    server.shutdown()
+
+
+def _calls(server, key):
+    with server.stats_lock:
+        return server.stats.get(key, 0)
+
+
+def test_parse_command():
+    assert UM.parse_command("mine", "U42") == "U42"
+    assert UM.parse_command(" My Assets ", "U42") == "U42"
+    assert UM.parse_command("<@U0ABC123|george>", "U42") == "U0ABC123"
+    assert UM.parse_command("<@W0ABC123>", "U42") == "W0ABC123"
+    assert UM.parse_command("@george", "U42") is None
+    assert UM.parse_command("SG000001", "U42") is None
+
+
+def test_repeat_lookup_skips_users_info_and_member_search(fake):
+    member = next(m for m in fake.catalog.members if m["id"] in fake.catalog.by_user)
+    client = WebClient(token="xoxb-fake", base_url=f"{fake.base_url}/api/")
+    who = fake_services.slack_user_id(member)
+
+    assert UM.resolve(client, who, AS.get_member_by_email) == (member["email"].lower(), member["id"])
+    assert (_calls(fake, "slack:users.info"), _calls(fake, "assetsonar:members.api")) == (1, 1)
+
+    # a new process reading the same file still hits
+    UM.MAP.close()
+    UM.MAP = UM.UserMap(UM.MAP.path)
+    assert UM.resolve(client, who, AS.get_member_by_email)[1] == member["id"]
+    assert (_calls(fake, "slack:users.info"), _calls(fake, "assetsonar:members.api")) == (1, 1)
+
+    UM.MAP.forget_member(member["id"])
+    UM.resolve(client, who, AS.get_member_by_email)
+    assert (_calls(fake, "slack:users.info"), _calls(fake, "assetsonar:members.api")) == (1, 2)
+
+
+def test_unknown_user_and_expiry(fake, tmp_path):
+    client = WebClient(token="xoxb-fake", base_url=f"{fake.base_url}/api/")
+    assert UM.resolve(client, "UNOBODY", AS.get_member_by_email) == (None, None)
+
+    now = [1000.0]
+    m = UM.UserMap(str(tmp_path / "ttl.sqlite3"), ttl=60, clock=lambda: now[0])
+    m.put_email("U1", "A@Example.com")
+    assert m.email_for("U1") == "a@example.com"
+    now[0] += 61
+    assert m.email_for("U1") is None
+    m.close()
+
+
+def test_near_miss_member_is_not_cached(fake):
+    member = fake.catalog.members[0]
+    client = WebClient(token="xoxb-fake", base_url=f"{fake.base_url}/api/")
+    who = fake_services.slack_user_id(member)
+    # members.api answering with somebody else, as _pick_member_by_email's fallback does
+    other = dict(fake.catalog.members[1])
+    assert UM.resolve(client, who, lambda email: other) == (member["email"].lower(), None)
+    assert UM.MAP.member_for(member["email"]) is None
+
+    upper = dict(member, email=member["email"].upper())
+    assert UM.resolve(client, who, lambda email: upper)[1] == member["id"]
+
+
+def test_async_resolve_shares_the_cache_and_exact_match(fake):
+    member = fake.catalog.members[2]
+    who = fake_services.slack_user_id(member)
+    client = AsyncWebClient(token="xoxb-fake", base_url=f"{fake.base_url}/api/")
+    other = dict(fake.catalog.members[1])
+
+    async def _lookup(answer):
+        return answer
+
+    assert asyncio.run(UM.resolve_async(client, who, lambda email: _lookup(other))) == (member["email"].lower(), None)
+    assert asyncio.run(UM.resolve_async(client, who, lambda email: _lookup(member)))[1] == member["id"]
+    # the sync path reads what the async one stored: no users.info, no members.api
+    sync_client = WebClient(token="xoxb-fake", base_url=f"{fake.base_url}/api/")
+    assert UM.resolve(sync_client, who, lambda email: None) == (member["email"].lower(), member["id"])
+    assert _calls(fake, "slack:users.info") == 1
+
+
+def test_expired_rows_are_purged_when_the_file_is_opened(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "purge.sqlite3")
+    m = UM.UserMap(path, ttl=60, clock=lambda: now[0])
+    m.put_email("U1", "a@example.com")
+    m.put_member("a@example.com", 7)
+    m.close()
+
+    now[0] += 61
+    m = UM.UserMap(path, ttl=60, clock=lambda: now[0])
+    m.put_email("U2", "b@example.com")
+    assert m._db().execute("SELECT count(*) FROM slack_emails").fetchone()[0] == 1
+    assert m._db().execute("SELECT count(*) FROM member_ids").fetchone()[0] == 0
+    m.close()
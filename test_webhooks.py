@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+
+import pytest
+
+import assetsonar as AS
+import catalog
+import fake_services
+import idcache as IDC
+import query_plan as QP
+import usermap as UM
+import webhooks as WH
+from webhook_replay import load_events
+
+SECRET = "whsec-test"
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "webhooks")
+
+
+def _signed(event, secret=SECRET, ts=1_700_000_000):
+    body = json.dumps(event).encode()
+    return {WH.TIMESTAMP_HEADER: str(ts), WH.SIGNATURE_HEADER: WH.sign(secret, ts, body)}, body
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    server = fake_services.start(n_assets=200)
+    monkeypatch.setattr(UM, "MAP", UM.UserMap(str(tmp_path / "usermap.sqlite3")))
+    monkeypatch.setattr(AS, "BASE_URL", server.base_url)
+    monkeypatch.setattr(WH.config, "AS_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(WH.time, "time", lambda: 1_700_000_010)
+    catalog.set_index(catalog.CatalogIndex(dict(a) for a in server.catalog.assets))
+    IDC.CACHE.clear()
+    yield server
+    catalog.set_index(None)
+    IDC.CACHE.clear()
+    server.shutdown()
+
+
+def test_rejects_bad_stale_and_unsigned():
+    headers, body = _signed({"event": "asset.updated"})
+    WH.verify(headers, body, secret=SECRET, now=1_700_000_010)
+    with pytest.raises(WH.WebhookError):
+        WH.verify(headers, body, secret="other", now=1_700_000_010)
+    with pytest.raises(WH.WebhookError):
+        WH.verify(headers, body, secret=SECRET, now=1_700_000_000 + WH.SIGNATURE_TOLERANCE + 1)
+    with pytest.raises(WH.WebhookError) as exc:
+        WH.verify(headers, body, secret="")
+    assert exc.value.status == 403
+
+
+def test_asset_events_update_snapshot_and_lookup_cache(env):
+    index = catalog.get_index()
+    IDC.CACHE.put("PH000000", [index.assets[100000]])
+    IDC.CACHE.put("SG999001", [])
+
+    assert WH.handle(*_signed(_fixture("asset_updated.json")))["outcome"] == "upserted"
+    assert index.assets[100000]["location_name"] == "SG"
+    assert 100000 in index.by_location["SG"]
+    assert IDC.CACHE.get("PH000000") is None
+
+    WH.handle(*_signed(_fixture("asset_created.json")))
+    assert [a["id"] for a in index.find_identifier("C02WEBHOOK1")] == [999001]
+    assert IDC.CACHE.get("SG999001") is None  # the old miss is gone
+
+    WH.handle(*_signed(_fixture("asset_deleted.json")))
+    assert index.find_identifier("SG999001") == []
+
+    # id-only payloads are fetched from assets/<id>.api
+    index.assets[100001]["location_name"] = "stale"
+    WH.handle(*_signed(_fixture("asset_id_only.json")))
+    assert index.assets[100001]["location_name"] == env.catalog.by_id[100001]["location_name"]
+
+
+def test_every_fixture_applies(env):
+    events = list(load_events([FIXTURES]))
+    assert len(events) == 6
+    for _, event in events:
+        assert WH.handle(*_signed(event))["ok"]
+
+
+def test_member_event_updates_the_name_index_in_place(env):
+    member = env.catalog.members[0]
+    assert member["id"] in {m["id"] for m in AS.search_members_by_name(f"{member['first_name']} {member['last_name']}")}
+    fetches = env.stats["assetsonar:members.api"]
+
+    renamed = dict(member, first_name="Quentin", last_name="Abernathy", status="active")
+    event = {"event": "member.updated", "data": {"member": renamed}}
+    assert WH.handle(*_signed(event))["outcome"] == "upserted"
+    assert [m["id"] for m in AS.search_members_by_name("Quentin Abernathy")] == [member["id"]]
+
+    event = {"event": "member.updated", "data": {"member": dict(renamed, status="inactive")}}
+    WH.handle(*_signed(event))
+    assert AS.search_members_by_name("Quentin Abernathy") == []
+    assert env.stats["assetsonar:members.api"] == fetches
+    AS.refresh_member_directory()
+
+
+def test_queries_run_while_webhooks_mutate_the_index(env):
+    index = catalog.get_index()
+    plans = [QP.plan_from_intent({"intent": "location_assets", "location": "SG"}),
+             QP.plan_from_intent({"intent": "group_assets", "group": "g"})]
+    stop = threading.Event()
+
+    def _churn():
+        n = 0
+        while not stop.is_set():
+            n += 1
+            index.add({"id": 5_000_000 + n, "identifier": f"ZZ{n:06d}", "location_name": "SG", "group_name": f"g{n}"})
+            index.remove(5_000_000 + n - 1)
+
+    writer = threading.Thread(target=_churn)
+    writer.start()
+    try:
+        for _ in range(200):
+            for plan in plans:
+                plan.execute_index(index)  # used to raise "changed size during iteration"
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_partial_payloads_merge_over_the_held_record(env):
+    index = catalog.get_index()
+    full = dict(index.assets[100002])
+    event = {"event": "asset.updated", "data": {"asset": {"id": 100002, "identifier": full["identifier"], "status": "retired"}}}
+    assert WH.handle(*_signed(event))["outcome"] == "upserted"
+    assert index.assets[100002] == dict(full, status="retired")
+    assert 100002 in index.by_group[full["group_name"].lower()]
+
+    member = env.catalog.members[2]
+    name = f"{member['first_name']} {member['last_name']}"
+    assert member["id"] in {m["id"] for m in AS.search_members_by_name(name)}
+    event = {"event": "member.updated", "data": {"member": {"id": member["id"], "email": "renamed@example.com"}}}
+    assert WH.handle(*_signed(event))["outcome"] == "upserted"
+    assert member["id"] in {m["id"] for m in AS.search_members_by_name(name)}
+
+    # a partial payload for a member the index lacks: refetch instead of indexing a nameless record
+    event = {"event": "member.updated", "data": {"member": {"id": 987654, "status": "active"}}}
+    assert WH.handle(*_signed(event))["outcome"] == "invalidated"
+    assert not AS._member_indexes
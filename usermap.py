@@ -0,0 +1,214 @@
+"""
+Slack user -> AssetSonar member mapping for `/asset mine` and `/asset @user`.
+
+People checking their own devices used to type their email, which costs a
+members.api search before the possessions fetch. Now the Slack user id is
+resolved through users.info (needs the users:read.email scope) to an email,
+and the email to a member id; both mappings are kept in a small sqlite file
+(USER_MAP_PATH) for USER_MAP_TTL seconds, so a repeat lookup goes straight
+to assets/filter.api. The file is shared by gunicorn workers and survives
+restarts; point it at a volume to survive pod restarts too. Expired rows
+are purged when a process first opens the file and on each prewarm
+reconciliation. A member is only cached when its email matches the one
+looked up exactly (case-insensitive), never on a members.api near miss.
+
+`@user` needs "Escape channels, users, and links" on the slash command so
+Slack sends <@U123|name>; an unescaped "@name" takes the normal name search.
+Member webhooks (webhooks.py) drop the mapping of the changed member.
+"""
+import re
+import sqlite3
+import threading
+import time
+
+from slack_sdk.errors import SlackApiError
+
+import config
+import log
+import metrics as M
+
+TTL = config.USER_MAP_TTL
+MINE = {"mine", "me", "my assets", "my devices"}
+_MENTION_RE = re.compile(r"^<@([UW][A-Z0-9]+)(?:\|[^>]*)?>$")
+
+slog = log.get_logger("usermap")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slack_emails (
+    slack_user_id TEXT PRIMARY KEY, email TEXT NOT NULL, expires_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS member_ids (
+    email TEXT PRIMARY KEY, member_id INTEGER NOT NULL, expires_at REAL NOT NULL);
+"""
+
+
+def parse_command(text, user_id):
+    """'mine' -> the caller's id, '<@U123|x>' -> 'U123'; None for any other command."""
+    text = (text or "").strip()
+    if text.lower() in MINE:
+        return user_id or None
+    m = _MENTION_RE.match(text)
+    return m.group(1) if m else None
+
+
+class UserMap:
+    """Two TTL'd mappings in sqlite: Slack user id -> email, email -> member id."""
+
+    def __init__(self, path=None, ttl=TTL, clock=time.time):
+        self.path = path or config.USER_MAP_PATH
+        self.ttl = ttl
+        self.clock = clock
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # opened on first use: keeps sqlite off the import path
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._purge(conn)
+            self._conn = conn
+        return self._conn
+
+    def _purge(self, db):
+        now = self.clock()
+        db.execute("DELETE FROM slack_emails WHERE expires_at <= ?", (now,))
+        db.execute("DELETE FROM member_ids WHERE expires_at <= ?", (now,))
+
+    def _get(self, sql, key):
+        with self._lock:
+            row = self._db().execute(sql, (key, self.clock())).fetchone()
+        return row[0] if row else None
+
+    def _put(self, sql, key, value):
+        with self._lock:
+            self._db().execute(sql, (key, value, self.clock() + self.ttl))
+
+    def email_for(self, slack_user_id):
+        return self._get("SELECT email FROM slack_emails WHERE slack_user_id = ? AND expires_at > ?", slack_user_id)
+
+    def put_email(self, slack_user_id, email):
+        self._put("INSERT OR REPLACE INTO slack_emails VALUES (?, ?, ?)", slack_user_id, email.lower())
+
+    def member_for(self, email):
+        return self._get("SELECT member_id FROM member_ids WHERE email = ? AND expires_at > ?", email.lower())
+
+    def put_member(self, email, member_id):
+        self._put("INSERT OR REPLACE INTO member_ids VALUES (?, ?, ?)", email.lower(), int(member_id))
+
+    def forget_member(self, member_id=None, email=None):
+        with self._lock:
+            db = self._db()
+            if member_id is not None:
+                db.execute("DELETE FROM member_ids WHERE member_id = ?", (int(member_id),))
+            if email:
+                db.execute("DELETE FROM member_ids WHERE email = ?", (email.lower(),))
+
+    def purge(self):
+        """Delete expired rows."""
+        with self._lock:
+            self._purge(self._db())
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+MAP = UserMap()
+
+
+def _email_from_users_info(resp):
+    return (((resp or {}).get("user") or {}).get("profile") or {}).get("email")
+
+
+def _users_info_failed(e, slack_user_id):
+    # user_not_found / missing_scope: answer "no email" rather than fail the command
+    M.USER_MAP.inc(mapping="email", result="error")
+    slog.warning("users_info_failed", user=slack_user_id, error=e.response.get("error"))
+
+
+def _member_id(member, email):
+    """The member's id if its email is exactly `email`; members.api may answer with a near miss."""
+    if not member or str(member.get("email") or "").strip().lower() != email.strip().lower():
+        return None
+    return member.get("id") or member.get("user_id")
+
+
+# resolve() and resolve_async() share everything but the two lookups: the
+# helpers below read the cache, or take what users.info / members.api returned.
+
+def _cached_email(slack_user_id):
+    email = MAP.email_for(slack_user_id)
+    if email is not None:
+        M.USER_MAP.inc(mapping="email", result="hit")
+    return email
+
+
+def _store_email(slack_user_id, resp):
+    """The email in a users.info response (cached), or None when Slack has none."""
+    M.USER_MAP.inc(mapping="email", result="miss")
+    email = _email_from_users_info(resp)
+    if email:
+        MAP.put_email(slack_user_id, email)
+    return email
+
+
+def _cached_member(email):
+    member_id = MAP.member_for(email)
+    if member_id is not None:
+        M.USER_MAP.inc(mapping="member", result="hit")
+    return member_id
+
+
+def _store_member(email, member):
+    """The id of the members.api answer when it is exactly `email` (cached), else None."""
+    M.USER_MAP.inc(mapping="member", result="miss")
+    member_id = _member_id(member, email)
+    if member_id:
+        MAP.put_member(email, member_id)
+    return member_id
+
+
+def resolve(client, slack_user_id, get_member_by_email):
+    """
+    Slack user id -> (email, member_id). email is None when Slack has none
+    for the user, member_id None when AssetSonar has no such member.
+    """
+    email = _cached_email(slack_user_id)
+    if email is None:
+        try:
+            with M.span("slack_users_info"):
+                resp = client.users_info(user=slack_user_id)
+        except SlackApiError as e:
+            _users_info_failed(e, slack_user_id)
+            return None, None
+        email = _store_email(slack_user_id, resp)
+        if not email:
+            return None, None
+
+    member_id = _cached_member(email)
+    if member_id is None:
+        member_id = _store_member(email, get_member_by_email(email))
+    return email, member_id
+
+
+async def resolve_async(client, slack_user_id, get_member_by_email):
+    """resolve() for AsyncWebClient and the async AssetSonar client (sqlite stays sync; it is local)."""
+    email = _cached_email(slack_user_id)
+    if email is None:
+        try:
+            with M.span("slack_users_info"):
+                resp = await client.users_info(user=slack_user_id)
+        except SlackApiError as e:
+            _users_info_failed(e, slack_user_id)
+            return None, None
+        email = _store_email(slack_user_id, resp)
+        if not email:
+            return None, None
+
+    member_id = _cached_member(email)
+    if member_id is None:
+        member_id = _store_member(email, await get_member_by_email(email))
+    return email, member_id
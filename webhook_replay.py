@@ -0,0 +1,69 @@
+"""
+Replay AssetSonar webhook fixtures against a running bot.
+
+    python webhook_replay.py [--url http://127.0.0.1:3000/assetsonar/webhook]
+                             [--secret S] [--delay 0] [fixtures/webhooks ...]
+
+Arguments are fixture files or directories of *.json (sorted by name); each
+file holds one event, or a JSON list of events. Every event is signed the way
+webhooks.verify expects, with AS_WEBHOOK_SECRET unless --secret is given.
+The fixtures under fixtures/webhooks use ids from fake_services.py's catalog.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import requests
+
+import config
+import webhooks as WH
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_events(paths):
+    files = []
+    for p in paths:
+        files.extend(sorted(glob.glob(os.path.join(p, "*.json"))) if os.path.isdir(p) else [p])
+    for path in files:
+        with open(path) as f:
+            data = json.load(f)
+        for event in data if isinstance(data, list) else [data]:
+            yield path, event
+
+
+def send(url, secret, event):
+    body = json.dumps(event)
+    ts = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        WH.TIMESTAMP_HEADER: ts,
+        WH.SIGNATURE_HEADER: WH.sign(secret, ts, body),
+    }
+    return requests.post(url, data=body, headers=headers, timeout=30)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=f"http://127.0.0.1:{config.PORT}/assetsonar/webhook")
+    ap.add_argument("--secret", default=config.AS_WEBHOOK_SECRET)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds between events")
+    ap.add_argument("paths", nargs="*", default=[os.path.join(HERE, "fixtures", "webhooks")])
+    args = ap.parse_args()
+    if not args.secret:
+        raise SystemExit("no secret: set AS_WEBHOOK_SECRET or pass --secret")
+
+    failed = 0
+    for path, event in load_events(args.paths):
+        r = send(args.url, args.secret, event)
+        print(f"{r.status_code} {event.get('event'):<18} {os.path.basename(path)}  {r.text.strip()}")
+        failed += r.status_code != 200
+        time.sleep(args.delay)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
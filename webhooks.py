@@ -0,0 +1,191 @@
+"""
+AssetSonar change webhooks: POST /assetsonar/webhook.
+
+Each event is one JSON object:
+
+    {"event": "asset.updated", "id": "evt_123", "data": {"asset": {...}}}
+
+`event` is "<kind>.<action>" with kind asset / member / license and action
+created / updated / deleted. Requests are signed with AS_WEBHOOK_SECRET:
+
+    X-AssetSonar-Timestamp: <unix seconds>
+    X-AssetSonar-Signature: sha256=<hex hmac_sha256(secret, "<timestamp>.<raw body>")>
+
+and rejected when the signature is wrong or the timestamp is more than
+SIGNATURE_TOLERANCE seconds off. Without a secret every request is rejected.
+
+What an event does to the local caches:
+
+  asset    the catalog snapshot (if installed) merges the payload over the
+           record it holds, takes a full payload for an asset it lacks, fetches
+           assets/<id>.api otherwise (e.g. id-only payloads), or drops it on
+           delete; the AIN/serial lookup cache drops
+           the entries the asset affects
+  member   the payload is merged over the member's record in the built name
+           indexes (removed on delete, and from the active-only ones when
+           inactive); a partial payload for a member an index lacks drops the
+           directory for a refetch instead.
+           The member's Slack mapping (usermap.py) is forgotten
+  license  no license data is cached yet; counted only
+
+Events that were missed are caught by the periodic reconciliation in
+prewarm.py (CATALOG_REFRESH_SECONDS). Replay fixtures against a running bot
+with webhook_replay.py.
+"""
+import hashlib
+import hmac
+import json
+import sys
+import time
+
+import requests
+
+import assetsonar as AS
+import catalog
+import config
+import idcache as IDC
+import log
+import metrics as M
+import usermap as UM
+
+SIGNATURE_TOLERANCE = 300
+TIMESTAMP_HEADER = "X-AssetSonar-Timestamp"
+SIGNATURE_HEADER = "X-AssetSonar-Signature"
+
+_REMOVED = {"deleted", "destroyed", "removed", "retired"}
+# an asset payload with all of these is taken as the full record of an asset the snapshot lacks
+_ASSET_RECORD_FIELDS = ("identifier", "name", "group_name", "location_name")
+
+slog = log.get_logger("webhooks")
+
+
+class WebhookError(Exception):
+    """Rejected webhook; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def sign(secret, timestamp, body):
+    if isinstance(body, bytes):
+        body = body.decode()
+    mac = hmac.new(secret.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256)
+    return "sha256=" + mac.hexdigest()
+
+
+def verify(headers, body, secret=None, now=None):
+    """Raise WebhookError unless the request carries a fresh, valid signature."""
+    secret = config.AS_WEBHOOK_SECRET if secret is None else secret
+    if not secret:
+        raise WebhookError("webhooks are not configured", status=403)
+    timestamp = headers.get(TIMESTAMP_HEADER) or ""
+    signature = headers.get(SIGNATURE_HEADER) or ""
+    try:
+        ts = int(timestamp)
+    except ValueError:
+        raise WebhookError("missing or bad timestamp", status=401)
+    now = time.time() if now is None else now
+    if abs(now - ts) > SIGNATURE_TOLERANCE:
+        raise WebhookError("stale timestamp", status=401)
+    if not hmac.compare_digest(sign(secret, timestamp, body), signature):
+        raise WebhookError("bad signature", status=401)
+
+
+def parse(body):
+    """Raw body -> (kind, action, obj, obj_id)."""
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise WebhookError("body is not JSON")
+    if not isinstance(event, dict):
+        raise WebhookError("body is not a JSON object")
+    kind, _, action = str(event.get("event") or event.get("type") or "").partition(".")
+    if kind == "software_license":
+        kind = "license"
+    if kind not in HANDLERS or not action:
+        raise WebhookError(f"unknown event {event.get('event') or event.get('type')!r}")
+    data = event.get("data") if isinstance(event.get("data"), dict) else {}
+    obj = data.get(kind) if isinstance(data.get(kind), dict) else data
+    obj_id = obj.get("id") or data.get(f"{kind}_id") or event.get(f"{kind}_id")
+    return kind, action, obj, _as_int(obj_id)
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _apply_asset(action, obj, asset_id):
+    index = catalog.get_index()
+    old = index.assets.get(asset_id) if index is not None and asset_id is not None else None
+    identifiers = catalog.identifiers_of(obj) | (catalog.identifiers_of(old) if old else set())
+
+    if action in _REMOVED:
+        asset = None
+    elif index is None:
+        # no snapshot to update; the payload only names the identifiers to drop
+        asset = obj
+    elif old is not None and set(obj) - {"id", "asset_id"}:
+        # payloads may carry only the changed fields: merge them over the snapshot's record
+        asset = {**old, **obj}
+    elif all(obj.get(f) for f in _ASSET_RECORD_FIELDS):
+        asset = obj
+    else:
+        try:
+            asset = AS.get_asset(asset_id)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            asset = None
+        identifiers |= catalog.identifiers_of(asset) if asset else set()
+
+    if index is not None:
+        if asset is not None and catalog.asset_key(asset) is not None:
+            index.add(asset)
+            outcome = "upserted"
+        else:
+            index.remove(asset_id)
+            outcome = "removed"
+    else:
+        outcome = "invalidated"
+    IDC.CACHE.invalidate_asset(asset_id, identifiers)
+    return outcome
+
+
+def _apply_member(action, obj, member_id):
+    # only loaded by the async runtime; importing it here would pull in aiohttp
+    asa = sys.modules.get("assetsonar_async")
+    member = None if action in _REMOVED else dict(obj, id=member_id)
+    outcome = "removed" if member is None else "upserted"
+    for rt in [AS] + ([asa] if asa is not None else []):
+        # a partial payload for a member an index does not hold yet cannot be indexed by name
+        if member_id is None or not rt.update_member(member_id, member):
+            rt.refresh_member_directory()
+            outcome = "invalidated"
+    UM.MAP.forget_member(member_id if isinstance(member_id, int) else None, obj.get("email"))
+    return outcome
+
+
+def _apply_license(action, obj, license_id):
+    return "ignored"
+
+
+HANDLERS = {
+    "asset": _apply_asset,
+    "member": _apply_member,
+    "license": _apply_license,
+}
+
+
+def handle(headers, body):
+    """Verify and apply one webhook request; returns the JSON response body."""
+    verify(headers, body)
+    kind, action, obj, obj_id = parse(body)
+    with M.span("webhook", kind=kind):
+        outcome = HANDLERS[kind](action, obj, obj_id)
+    M.WEBHOOK_EVENTS.inc(kind=kind, action=action, outcome=outcome)
+    slog.info("webhook_applied", kind=kind, action=action, id=obj_id, outcome=outcome)
+    return {"ok": True, "outcome": outcome}